@@ -1,2 +1,2 @@
 from .instrument import *
-
+from .keywords import connect_to_ktl
@@ -0,0 +1,133 @@
+import threading
+import functools
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor
+
+from instruments import keywords
+
+
+##-------------------------------------------------------------------------
+## Condition Runner
+##-------------------------------------------------------------------------
+## Pre- and post- condition checks get their own thread pool, separate from
+## the one used for bulk keyword reads, so that a condition which itself does
+## a bulk read (e.g. checking all the CSU bars) can never starve the reads it
+## is waiting on.
+_pool = None
+_lock = threading.Lock()
+max_workers = 16
+
+
+def pool():
+    '''Return the thread pool used to evaluate condition functions.
+    '''
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers,
+                                       thread_name_prefix='conditions')
+        return _pool
+
+
+def evaluate(conditions, timeout=None):
+    '''Call each of the given condition functions concurrently and wait for
+    all of them to finish.  The conditions must be independent of each other
+    and take no arguments (use `functools.partial` or a lambda if arguments are
+    needed).
+
+    Returns a list of (condition, exception) tuples, in the order the
+    conditions were given, for every condition which raised.  An empty list
+    means all of the conditions passed.
+    '''
+    futures = [pool().submit(condition) for condition in conditions]
+    failures = []
+    for condition, future in zip(conditions, futures):
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            failures.append((condition, e))
+    return failures
+
+
+##-------------------------------------------------------------------------
+## Memoized Conditions
+##-------------------------------------------------------------------------
+## A passing condition is remembered for `freshness` seconds so that scripts
+## which run the same checks several times in quick succession do not re-read
+## every keyword each time.  Failures are never remembered.  To stay safe, a
+## remembered pass is forgotten as soon as anything writes to one of the
+## services the condition depends on, or (where the backend supports it) as
+## soon as one of the keywords it reads changes value.  Set `freshness` to 0
+## to turn this off.
+freshness = 5
+_memos = []
+
+
+class Memo(object):
+    '''The remembered passing results for one condition function.
+    '''
+    def __init__(self, services, watched):
+        self.services = [service.lower() for service in services]
+        self.watched = watched
+        self.subscribed = False
+        self.passed = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def invalidate(self, *args):
+        with self.lock:
+            self.generation += 1
+            self.passed.clear()
+
+    def subscribe(self):
+        if self.subscribed is False:
+            self.subscribed = True
+            for service, keyword in self.watched:
+                keywords.cache(service=service, keyword=keyword).subscribe(self.invalidate)
+
+
+def _keyword_written(keyword):
+    for memo in list(_memos):
+        if keyword.service.lower() in memo.services:
+            memo.invalidate()
+
+
+keywords.on_write(_keyword_written)
+
+
+def invalidate_all():
+    '''Forget all remembered condition results.
+    '''
+    for memo in list(_memos):
+        memo.invalidate()
+
+
+def memoize(services=[], watched=[]):
+    '''Decorator which remembers a passing result of a condition function.
+
+    `services` is the list of services the condition depends on: any write to
+    a keyword in one of them forgets the result.  `watched` is a list of
+    (service, keyword) pairs which are monitored, a change in any of them also
+    forgets the result.
+    '''
+    def decorator(function):
+        memo = Memo(services, watched)
+        _memos.append(memo)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            memo.subscribe()
+            key = (args, tuple(sorted(kwargs.items())))
+            passed_at = memo.passed.get(key)
+            if passed_at is not None and monotonic() - passed_at < freshness:
+                return None
+            generation = memo.generation
+            result = function(*args, **kwargs)
+            with memo.lock:
+                if memo.generation == generation:
+                    memo.passed[key] = monotonic()
+            return result
+
+        wrapper.invalidate = memo.invalidate
+        return wrapper
+    return decorator
@@ -0,0 +1,16 @@
+import pytest
+
+from instruments import keywords, conditions, simulated_ktl
+
+
+@pytest.fixture
+def simulator(tmp_path, monkeypatch):
+    '''Run the keyword layer against a fresh, fast simulator in its default
+    state, writing any images under tmp_path.
+    '''
+    previous = keywords.backend()
+    monkeypatch.setattr(conditions, 'freshness', 0)
+    sim = simulated_ktl.reset(speedup=50, state={('mds', 'OUTDIR'): tmp_path})
+    keywords.set_backend(simulated_ktl)
+    yield sim
+    keywords.set_backend(previous)
@@ -11,5 +11,5 @@ class cache(object):
         print(f'Reading value: {self.service}.{self.keyword}')
         return None
 
-    def write(self, input):
+    def write(self, input, wait=True, timeout=None):
         print(f'Writing value: {input}')
@@ -0,0 +1,183 @@
+import ast
+import re
+import threading
+
+from instruments import keywords
+
+
+##-------------------------------------------------------------------------
+## Keyword Expressions
+##-------------------------------------------------------------------------
+## A stand in for `ktl.Expression` and `ktl.waitFor` which works with any
+## keyword backend.  Expressions use the KTL syntax, for example:
+##
+##     ($hiccd.OBSERVIP == True) and ($hiccd.WCRATE == True)
+##
+## Each distinct expression string is parsed only once.  Waiting on an
+## expression monitors just the keywords it refers to and re-evaluates it
+## only when one of them broadcasts a new value.
+keyword_pattern = re.compile(r'\$(\w+)\.(\w+)')
+_compiled = {}
+_lock = threading.Lock()
+
+_allowed_nodes = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp,
+                  ast.Not, ast.USub, ast.UAdd, ast.Compare, ast.Eq, ast.NotEq,
+                  ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Constant, ast.Name,
+                  ast.Load, ast.Subscript, ast.BinOp, ast.Add, ast.Sub,
+                  ast.Mult, ast.Div)
+if hasattr(ast, 'Num'):
+    # Python < 3.8 wraps subscripts and literals in their own node types
+    _allowed_nodes += (ast.Index, ast.Num, ast.Str, ast.NameConstant)
+
+
+def typed(value):
+    '''Interpret an ascii keyword value as a bool or number if possible, so
+    that e.g. "true", "yes" and "on" all compare equal to True.
+    '''
+    if isinstance(value, (bool, int, float)):
+        return value
+    value = str(value)
+    if value.strip().lower() in ['true', 'yes', 'on']:
+        return True
+    if value.strip().lower() in ['false', 'no', 'off']:
+        return False
+    try:
+        return float(value)
+    except ValueError:
+        return value.strip()
+
+
+class _Literals(ast.NodeTransformer):
+    '''Turn bare words into constants and give constants the same
+    interpretation as keyword values.
+    '''
+    def visit_Name(self, node):
+        if node.id == '_v':
+            return node
+        return ast.copy_location(ast.Constant(typed(node.id)), node)
+
+    def visit_Constant(self, node):
+        return ast.copy_location(ast.Constant(typed(node.value)), node)
+
+    def visit_Subscript(self, node):
+        return node
+
+
+class Predicate(object):
+    '''A parsed expression.  `keywords` lists the (service, keyword) pairs it
+    refers to, calling it with the ascii values of those keywords (in the
+    same order) evaluates it.
+    '''
+    def __init__(self, expression):
+        self.expression = expression
+        self.keywords = []
+
+        def reference(match):
+            key = keywords._key(*match.groups())
+            if key not in self.keywords:
+                self.keywords.append(key)
+            return f'_v[{self.keywords.index(key)}]'
+
+        tree = ast.parse(keyword_pattern.sub(reference, expression).strip(),
+                         mode='eval')
+        for node in ast.walk(tree):
+            if not isinstance(node, _allowed_nodes):
+                raise SyntaxError(f'Unsupported syntax in expression: {expression}')
+        tree = ast.fix_missing_locations(_Literals().visit(tree))
+        self.code = compile(tree, '<expression>', 'eval')
+
+    def __repr__(self):
+        return f'<Predicate {self.expression}>'
+
+    def __call__(self, values):
+        return bool(eval(self.code, {'__builtins__': {}},
+                         {'_v': [typed(value) for value in values]}))
+
+
+def compile_expression(expression):
+    '''Return the `Predicate` for an expression string, parsing it only the
+    first time it is seen.
+    '''
+    predicate = _compiled.get(expression)
+    if predicate is None:
+        with _lock:
+            predicate = _compiled.get(expression)
+            if predicate is None:
+                predicate = Predicate(expression)
+                _compiled[expression] = predicate
+    return predicate
+
+
+class Expression(object):
+    '''Equivalent of `ktl.Expression` using the keyword registry.
+    '''
+    def __init__(self, expression):
+        self.predicate = compile_expression(expression)
+        self.handles = [keywords.cache(service=service, keyword=keyword)
+                        for service, keyword in self.predicate.keywords]
+
+    def __repr__(self):
+        return f'<Expression {self.predicate.expression}>'
+
+    def evaluate(self):
+        '''Read the keywords and evaluate the expression.
+        '''
+        return self.predicate([handle.read(bypass=True) for handle in self.handles])
+
+    def wait(self, timeout=None, poll=0.5):
+        '''Block until the expression is true or the timeout (in seconds)
+        expires.  Returns True if the expression became true and False on
+        timeout.
+        '''
+        lock = threading.Lock()
+        values = [None] * len(self.handles)
+        broadcast = [False] * len(self.handles)
+        woken = [False]
+
+        updaters = []
+        for i,handle in enumerate(self.handles):
+            def update(keyword, i=i):
+                with lock:
+                    values[i] = keyword.handle['ascii']
+                    broadcast[i] = True
+                    woken[0] = True
+            updaters.append(update)
+        # Subscribe before the first read, so that a value broadcast between
+        # the two is not lost
+        monitored = [handle.subscribe(update)
+                     for handle, update in zip(self.handles, updaters)]
+
+        def refresh():
+            # Read every keyword, but keep any value broadcast while reading
+            with lock:
+                broadcast[:] = [False] * len(self.handles)
+            for i,handle in enumerate(self.handles):
+                value = handle.read(bypass=True)
+                with lock:
+                    if broadcast[i] is False:
+                        values[i] = value
+
+        def condition():
+            # Unless woken by a broadcast (i.e. at a heartbeat or when
+            # polling), read the keywords again in case a broadcast was missed
+            with lock:
+                changed = woken[0]
+                woken[0] = False
+            if changed is False or not all(monitored):
+                refresh()
+            return self.predicate(values)
+
+        try:
+            refresh()
+            woken[0] = True
+            return keywords.waitfor(condition, self.handles, timeout=timeout,
+                                    poll=poll)
+        finally:
+            for handle, update in zip(self.handles, updaters):
+                handle.unsubscribe(update)
+
+
+def waitFor(expression, timeout=None):
+    '''Equivalent of `ktl.waitFor`.
+    '''
+    return Expression(expression).wait(timeout=timeout)
@@ -5,7 +5,7 @@ import sys
 from pathlib import Path
 import logging
 
-from instruments import connect_to_ktl, create_log
+from instruments import connect_to_ktl, create_log, keywords, expressions
 
 try:
     from ktl import Exceptions as ktlExceptions
@@ -52,7 +52,7 @@ services = {}
 ## Define Common Functions
 ##-------------------------------------------------------------------------
 def connect(service):
-    if type(connect) is str and connect.lower() == 'all':
+    if type(service) is str and service.lower() == 'all':
         services.update(connect_to_ktl(name, serviceNames))
     else:
         services.update(connect_to_ktl(name, [service]))
@@ -66,7 +66,7 @@ def get(service, keyword, mode=str):
     if services == {}:
         return None
     assert mode in [str, float, int, bool]
-    kwresult = services[service][keyword].read()
+    kwresult = keywords.cache(service=service, keyword=keyword).read()
     log.debug(f'  Got result: "{kwresult}"')
 
     # Handle string versions of true and false
@@ -93,5 +93,5 @@ def set(service, keyword, value, wait=True):
     log.debug(f'Setting {service}.{keyword} to "{value}" (wait={wait})')
     if services == {}:
         return None
-    services[service][keyword].write(value, wait=wait)
+    keywords.cache(service=service, keyword=keyword).write(value, wait=wait)
     log.debug(f'  Done.')
@@ -3,11 +3,6 @@ from .core import *
 import re
 from time import sleep
 
-try:
-    import ktl
-except:
-    ktl = None
-
 def binning():
     """Return the binning value, a tuple of (binX, binY).
     """
@@ -122,7 +117,7 @@ def set_obstype(myobstype):
 def wait_for_observip(timeout=300):
     if get('hiccd', 'OBSERVIP', mode=bool) is True:
         log.info(f'Waiting up to {timeout} seconds for observation to finish')
-        if not ktl.waitFor('($hiccd.OBSERVIP == False )', timeout=timeout):
+        if not expressions.waitFor('($hiccd.OBSERVIP == False )', timeout=timeout):
             raise Exception('Timed out waiting for OBSERVIP')
 
 
@@ -146,17 +141,18 @@ def goi(type=None, exptime=None, nexp=1, timeshim=True):
     else:
         set('hiccd', 'AUTOSHUT', True)
 
+    exposing = expressions.Expression("($hiccd.OBSERVIP == True) "
+                                      "and ($hiccd.EXPOSIP == True )")
+    reading = expressions.Expression("($hiccd.OBSERVIP == True) "
+                                     "and ($hiccd.WCRATE == True )")
+    obsdone = expressions.Expression("($hiccd.OBSERVIP == False)")
+
     for i in range(nexp):
         exptime = get('hiccd', 'TTIME', mode=int)
         log.info(f"Taking exposure {i+1:d} of {nexp:d}")
         log.info(f"  Exposure Time = {exptime:d} s")
         set('hiccd', 'EXPOSE', True)
         if timeshim is True: sleep(1)
-        exposing = ktl.Expression("($hiccd.OBSERVIP == True) "
-                                  "and ($hiccd.EXPOSIP == True )")
-        reading = ktl.Expression("($hiccd.OBSERVIP == True) "
-                                 "and ($hiccd.WCRATE == True )")
-        obsdone = ktl.Expression("($hiccd.OBSERVIP == False)")
 
         if not exposing.wait(timeout=30) and exptime > 2:
             raise Exception('Timed out waiting for EXPOSING to start')
@@ -29,14 +29,14 @@ def check_iodine_temps(target1=65, target2=50, range=0.05, wait=False):
         if wait is True:
             log.info('  Waiting 10 minutes for iodine cell to reach '
                           'temperature')
-            done = ktl.waitFor(f'($hires.TEMPIOD1 > {target1-range}) and '\
-                               f'($hires.TEMPIOD1 < {target1+range}) and '\
-                               f'($hires.TEMPIOD2 > {target2-range}) and '\
-                               f'($hires.TEMPIOD2 < {target2+range})',\
-                               timeout=600)
+            done = expressions.waitFor(f'($hires.TEMPIOD1 > {target1-range}) and '\
+                                       f'($hires.TEMPIOD1 < {target1+range}) and '\
+                                       f'($hires.TEMPIOD2 > {target2-range}) and '\
+                                       f'($hires.TEMPIOD2 < {target2+range})',\
+                                       timeout=600)
             if done is False:
-                logger.warning('Iodine cell did not reach temperature'
-                                    'within 10 minutes')
+                log.warning('Iodine cell did not reach temperature'
+                            'within 10 minutes')
             return done
         else:
             return False
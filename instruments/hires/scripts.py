@@ -7,9 +7,9 @@ from .dewar import *
 from .expo import *
 from .iodine import *
 from .mechs import *
+from instruments import images
 
 from time import sleep
-from astropy.io import fits
 import numpy as np
 
 
@@ -42,11 +42,9 @@ def estimate_flat_times(flattime=30, target_level=60000):
     assert last_file.exists() is True
 
     rates = []
-    hdul = fits.open(last_file)
-    for hdu in hdul:
-        if hdu.data is not None:
-            med = np.median(hdu.data)
-            rates.append(med / flattime)
+    for ext in images.extensions(last_file):
+        med = np.median(images.read_image(last_file, ext=ext))
+        rates.append(med / flattime)
     longest_exp = np.floor(target_level/min(rates)/10)*10 # rounded to nearest 10s
 
     flattimes = np.array([1, 1.5, 2, 2.5, 3, 4, 5, 6, 8, 10, 15, 20, 30])/30
@@ -177,16 +175,16 @@ def calibrate_cd():
         take_exposure()
     
         # Analyze Result
-        hdul = fits.open(Path(get('hiccd', 'outdir')).joinpath('backup.fits'))
-        assert hdul[0].data is None
-        assert hdul[1].data.shape == (160, 2140)
-        assert len(hdul) == 2
+        backup = Path(get('hiccd', 'outdir')).joinpath('backup.fits')
+        assert images.extensions(backup) == [1]
+        assert images.shape(images.header(backup, ext=1)) == (160, 2140)
     
         row = 80
         rng = 20
         xpix = [x+1 for x in range(2140)]
         fine_xpix = [(x+1)/10 for x in range(21400)]
-        y = list(np.mean(hdul[1].data[row-rng:row+rng,:], axis=0))
+        y = list(np.mean(images.read_section(backup, (slice(row-rng, row+rng),
+                                                      slice(None)), ext=1), axis=0))
         maxy = max(y[10:-10])
         maxx = y.index(maxy)
 
@@ -0,0 +1,124 @@
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+from astropy.io import fits
+
+
+##-------------------------------------------------------------------------
+## Image Access
+##-------------------------------------------------------------------------
+## Quick look analysis runs on the instrument hosts while new exposures are
+## being written, so frames are opened memory mapped and only the rows or
+## sections which are needed are read from disk.  The functions which return
+## data always return an in memory copy (float32 by default) and close the
+## file before returning, so no file handles or memory maps are left behind.
+##
+##     from instruments import images
+##     rows = images.read_rows('m000101_0001.fits', [100, 101, 102, 500])
+##     with images.open_image(filename) as hdul:
+##         data = images.data(hdul[0])
+dtype = np.float32
+
+
+@contextmanager
+def open_image(filename):
+    '''Open a FITS file memory mapped, with HDUs only loaded when they are
+    used, and close it on leaving the context.  Integer images are not scaled
+    by astropy (which would force them to be read in full), use `data` or the
+    `read_*` functions to get the scaled values.
+    '''
+    hdul = fits.open(Path(filename).expanduser(), memmap=True,
+                     lazy_load_hdus=True, do_not_scale_image_data=True)
+    try:
+        yield hdul
+    finally:
+        hdul.close()
+
+
+def scale(raw, header, dtype=dtype):
+    '''Apply the BSCALE, BZERO and BLANK keywords in a header to raw image
+    values, returning a new array of the requested dtype.
+    '''
+    result = np.array(raw, dtype=dtype)
+    blank = header.get('BLANK')
+    if blank is not None and result.dtype.kind == 'f':
+        result[raw == blank] = np.nan
+    if header.get('BSCALE', 1) != 1:
+        result *= header['BSCALE']
+    if header.get('BZERO', 0) != 0:
+        result += header['BZERO']
+    return result
+
+
+def data(hdu, dtype=dtype):
+    '''Return the data of an HDU in the requested dtype.  If it is already
+    stored that way on disk (and needs no scaling) this is a view of the
+    memory map, so it is only valid until the file is closed.
+    '''
+    if hdu.data is None:
+        return None
+    scaled = any(key in hdu.header for key in ['BSCALE', 'BZERO', 'BLANK'])
+    if not scaled and (dtype is None or hdu.data.dtype == np.dtype(dtype)):
+        return hdu.data
+    return scale(hdu.data, hdu.header, dtype=dtype)
+
+
+def shape(hdu):
+    '''Return the (numpy ordered) shape of the image in an HDU (or described
+    by a header), read from the header without touching the data.
+    '''
+    header = getattr(hdu, 'header', hdu)
+    naxis = header.get('NAXIS', 0)
+    return tuple(header[f'NAXIS{i}'] for i in range(naxis, 0, -1))
+
+
+def extensions(filename):
+    '''Return the indices of the HDUs in a file which contain image data.
+    '''
+    with open_image(filename) as hdul:
+        return [i for i,hdu in enumerate(hdul) if len(shape(hdu)) > 0]
+
+
+def header(filename, ext=0):
+    '''Read just the header of one extension.
+    '''
+    with open_image(filename) as hdul:
+        return hdul[ext].header.copy()
+
+
+def read_image(filename, ext=0, dtype=dtype):
+    '''Read the whole image in one extension.
+    '''
+    with open_image(filename) as hdul:
+        hdu = hdul[ext]
+        if len(shape(hdu)) == 0:
+            return None
+        return scale(hdu.section[tuple(slice(None) for n in shape(hdu))],
+                     hdu.header, dtype=dtype)
+
+
+def read_section(filename, section, ext=0, dtype=dtype):
+    '''Read a section (a tuple of slices in numpy order) of the image in one
+    extension without reading the rest of it.
+    '''
+    with open_image(filename) as hdul:
+        hdu = hdul[ext]
+        return scale(hdu.section[section], hdu.header, dtype=dtype)
+
+
+def read_rows(filename, rows, ext=0, dtype=dtype):
+    '''Read the given rows of a 2D image, in the order given.  Runs of
+    consecutive rows are read in a single section.
+    '''
+    rows = np.asarray(rows, dtype=int)
+    with open_image(filename) as hdul:
+        hdu = hdul[ext]
+        result = np.empty((len(rows), shape(hdu)[1]), dtype=dtype)
+        if len(rows) == 0:
+            return result
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        for first, last in zip(np.concatenate([[0], breaks]),
+                               np.concatenate([breaks, [len(rows)]])):
+            result[first:last] = scale(hdu.section[rows[first]:rows[last-1]+1, :],
+                                       hdu.header, dtype=dtype)
+        return result
@@ -0,0 +1,401 @@
+import logging
+import threading
+from time import monotonic, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+try:
+    import ktl
+except ModuleNotFoundError as e:
+    from instruments import dummy_ktl as ktl
+
+
+##-------------------------------------------------------------------------
+## Keyword Registry
+##-------------------------------------------------------------------------
+## One handle per (service, keyword) pair for the whole process.  Handles are
+## created the first time they are asked for and then shared by every module
+## which uses them, so instrument functions can call `cache` as often as they
+## like without paying for handle construction or reconnection each time.
+_registry = {}
+_services = {}
+_lock = threading.RLock()
+_pool = None
+_write_hooks = []
+max_workers = 32
+
+## Value mirror.  When `mirror_ttl` is set (in seconds), reads made through the
+## registry may be answered from the last value seen for that keyword instead
+## of going to the keyword service, as long as that value is younger than the
+## TTL.  Mirrored keywords are monitored where the backend allows it, so the
+## mirror is updated the moment a new value is broadcast.  Writes always drop
+## the mirrored value so the next read goes to the service, which means a
+## read back after a write sees what the service holds rather than what was
+## asked for.  Reads which must see the live value (e.g. safety checks) pass
+## `bypass=True`.
+mirror_ttl = None
+ttls = {}
+
+## Call recorder.  When set (see `instruments.recorder`), every read, write
+## and wait made through the registry is logged to it.
+recorder = None
+
+
+class Keyword(object):
+    '''A shared handle for a single KTL keyword.
+
+    Wraps the underlying `ktl` keyword object.  The `read` and `write` methods
+    pass through to KTL (via the value mirror, if it is enabled), anything
+    else (e.g. `monitor`, `callback`) is looked up on the wrapped object.
+    '''
+    def __init__(self, service, keyword, handle):
+        self.service = service
+        self.keyword = keyword
+        self.handle = handle
+        self.subscribers = []
+        self.monitored = False
+        self.mirrored = False
+        self.value = None
+        self.updated = None
+
+    def __repr__(self):
+        return f'<Keyword {self.service}.{self.keyword}>'
+
+    def __getattr__(self, name):
+        return getattr(self.handle, name)
+
+    def read(self, *args, bypass=False, **kwargs):
+        '''Read the keyword value.  If the value mirror is enabled and a recent
+        enough value is available, it is returned without a round trip to the
+        keyword service unless `bypass` is True.
+        '''
+        active = recorder
+        if active is None:
+            return self._read(*args, bypass=bypass, **kwargs)
+        return self._recorded_read(active, None, *args, bypass=bypass, **kwargs)
+
+    def _recorded_read(self, active, function, *args, **kwargs):
+        # `function` is the caller to record, if it was worked out elsewhere
+        # (e.g. before handing the read to the thread pool)
+        start = time()
+        begin = monotonic()
+        value = self._read(*args, **kwargs)
+        active.record('read', self.service, self.keyword, value, start,
+                      monotonic()-begin, function=function)
+        return value
+
+    def _read(self, *args, bypass=False, **kwargs):
+        if len(args) > 0 or len(kwargs) > 0:
+            return self.handle.read(*args, **kwargs)
+        if bypass is False and mirror_ttl is not None:
+            if self.mirrored is False:
+                self.mirrored = True
+                self.subscribe(self._refresh)
+            ttl = ttls.get(_key(self.service, self.keyword), mirror_ttl)
+            updated = self.updated
+            if updated is not None and monotonic() - updated < ttl:
+                return self.value
+        value = self.handle.read()
+        self.value = value
+        self.updated = monotonic()
+        return value
+
+    def write(self, value, *args, **kwargs):
+        self.updated = None
+        start = time()
+        begin = monotonic()
+        result = self.handle.write(value, *args, **kwargs)
+        self.updated = None
+        if recorder is not None:
+            recorder.record('write', self.service, self.keyword, value, start,
+                            monotonic()-begin)
+        for hook in list(_write_hooks):
+            hook(self)
+        return result
+
+    def _refresh(self, keyword):
+        try:
+            self.value = self.handle['ascii']
+            self.updated = monotonic()
+        except Exception:
+            self.updated = None
+
+    def subscribe(self, function):
+        '''Call `function(keyword)` each time KTL broadcasts a new value for
+        this keyword.  Monitoring is started the first time anyone subscribes.
+
+        Returns True if the backend supports change callbacks and False if it
+        does not (e.g. the dummy interface), in which case the subscriber
+        will never be called and the caller needs to poll instead.
+        '''
+        with _lock:
+            if function not in self.subscribers:
+                self.subscribers.append(function)
+            if self.monitored is False:
+                try:
+                    self.handle.callback(self._broadcast)
+                    self.handle.monitor()
+                except AttributeError:
+                    return False
+                self.monitored = True
+        return True
+
+    def unsubscribe(self, function):
+        '''Stop calling `function` on changes to this keyword.
+        '''
+        with _lock:
+            if function in self.subscribers:
+                self.subscribers.remove(function)
+
+    def _broadcast(self, *args):
+        for function in list(self.subscribers):
+            try:
+                function(self)
+            except Exception as e:
+                logging.getLogger(__name__).warning(
+                    f'Callback on {self.service}.{self.keyword} failed: {e}')
+
+
+class Service(object):
+    '''A lightweight stand in for a KTL service object.  Indexing the service
+    with a keyword name returns the shared `Keyword` handle from the registry.
+    '''
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f'<Service {self.name}>'
+
+    def __getitem__(self, keyword):
+        return cache(service=self.name, keyword=keyword)
+
+
+def _key(service, keyword):
+    return (service.lower(), keyword.upper())
+
+
+def cache(service=None, keyword=None):
+    '''Return the shared handle for the given service and keyword, creating it
+    if this is the first time it has been requested.  Accepts the same
+    arguments as `ktl.cache`.  If no keyword is given, a `Service` is returned
+    which can be indexed by keyword name.
+    '''
+    if service is None:
+        raise ValueError('A service name is required')
+    if keyword is None:
+        with _lock:
+            if service.lower() not in _services:
+                _services[service.lower()] = Service(service)
+            return _services[service.lower()]
+
+    key = _key(service, keyword)
+    handle = _registry.get(key)
+    if handle is None:
+        with _lock:
+            handle = _registry.get(key)
+            if handle is None:
+                handle = Keyword(service, keyword,
+                                 ktl.cache(service=service, keyword=keyword))
+                _registry[key] = handle
+    return handle
+
+
+def enable_mirror(ttl=2, keyword_ttls={}):
+    '''Turn on the keyword value mirror.  Mirrored values are used for up to
+    `ttl` seconds.  `keyword_ttls` can override that for individual keywords,
+    e.g. `{('mds', 'OUTDIR'): 60}`.
+    '''
+    global mirror_ttl
+    with _lock:
+        ttls.clear()
+        for (service, keyword), keyword_ttl in keyword_ttls.items():
+            ttls[_key(service, keyword)] = keyword_ttl
+        mirror_ttl = ttl
+
+
+def disable_mirror():
+    '''Turn off the keyword value mirror.  All reads go to the keyword service.
+    '''
+    global mirror_ttl
+    with _lock:
+        mirror_ttl = None
+        for handle in _registry.values():
+            handle.updated = None
+
+
+def on_write(function):
+    '''Call `function(keyword)` after every write made through the registry.
+    '''
+    with _lock:
+        if function not in _write_hooks:
+            _write_hooks.append(function)
+
+
+def set_backend(backend):
+    '''Use `backend` in place of the `ktl` package for every keyword handle
+    created from now on (e.g. `instruments.simulated_ktl` to run scripts
+    offline).  Existing handles are dropped from the registry.
+    '''
+    global ktl
+    with _lock:
+        _registry.clear()
+        _services.clear()
+        ktl = backend
+
+
+def backend():
+    '''Return the module currently used to create keyword handles.
+    '''
+    return ktl
+
+
+def registered():
+    '''Return a sorted list of the (service, keyword) pairs which currently
+    have a handle in the registry.
+    '''
+    with _lock:
+        return sorted(_registry.keys())
+
+
+def clear():
+    '''Drop all handles from the registry.  New handles will be created the
+    next time each keyword is requested.
+    '''
+    with _lock:
+        _registry.clear()
+        _services.clear()
+
+
+def pool():
+    '''Return the thread pool shared by all bulk keyword operations.
+    '''
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers,
+                                       thread_name_prefix='keywords')
+        return _pool
+
+
+##-------------------------------------------------------------------------
+## Bulk Reads
+##-------------------------------------------------------------------------
+class Snapshot(object):
+    '''The values of a group of keywords from one service, all read within a
+    single short window of time.
+
+    Values are held in order in the `values` array and can also be looked up
+    by keyword name (e.g. `snap['B01POS']`).  `timestamp` is the (unix) time
+    at which the reads were issued and `duration` is how long it took for all
+    of them to return.
+    '''
+    def __init__(self, service, keywords, values, timestamp, duration):
+        self.service = service
+        self.keywords = list(keywords)
+        self.values = np.empty(len(values), dtype=object)
+        self.values[:] = values
+        self.timestamp = timestamp
+        self.duration = duration
+        self.index = {keyword.upper(): i for i,keyword in enumerate(self.keywords)}
+
+    def __repr__(self):
+        return f'<Snapshot {self.service} ({len(self)} keywords)>'
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def __getitem__(self, keyword):
+        return self.values[self.index[keyword.upper()]]
+
+    def asarray(self, dtype=float):
+        '''Return the values as a numpy array of the given type.
+        '''
+        return np.array([dtype(value) for value in self.values], dtype=dtype)
+
+
+def snapshot(service, keywords, bypass=False):
+    '''Read a group of keywords from a service concurrently and return the
+    result as a `Snapshot`.  If `bypass` is True, the value mirror is not used.
+    '''
+    handles = [cache(service=service, keyword=keyword) for keyword in keywords]
+    active = recorder
+    if active is None:
+        read = lambda handle: handle.read(bypass=bypass)
+    else:
+        # The pool threads have none of the caller's frames, so find out who
+        # is asking here
+        function = active.caller()
+        read = lambda handle: handle._recorded_read(active, function,
+                                                    bypass=bypass)
+    timestamp = time()
+    start = monotonic()
+    values = list(pool().map(read, handles))
+    return Snapshot(service, keywords, values, timestamp, monotonic()-start)
+
+
+##-------------------------------------------------------------------------
+## Wait Engine
+##-------------------------------------------------------------------------
+def waitfor(condition, keywords=[], timeout=None, poll=0.5, heartbeat=5):
+    '''Block until `condition()` returns True or the timeout (in seconds)
+    expires.  Returns True if the condition was met and False on timeout.  A
+    timeout of None waits forever.
+
+    The condition is re-evaluated as soon as any of the given keywords
+    changes value.  If the backend does not support change callbacks for all
+    of the keywords, the condition is polled every `poll` seconds instead.
+    Even when monitoring, the condition is re-checked every `heartbeat`
+    seconds in case a broadcast is missed.
+
+    Any exception raised by the condition (e.g. a fatal error state) is
+    passed on to the caller.
+    '''
+    if recorder is not None:
+        start = time()
+        begin = monotonic()
+        result = _waitfor(condition, keywords, timeout, poll, heartbeat)
+        recorder.record('wait', ','.join(sorted(set([k.service for k in keywords]))),
+                        ','.join([k.keyword for k in keywords]), result, start,
+                        monotonic()-begin)
+        return result
+    return _waitfor(condition, keywords, timeout, poll, heartbeat)
+
+
+def _waitfor(condition, keywords, timeout, poll, heartbeat):
+    changed = threading.Event()
+
+    def wake(keyword):
+        changed.set()
+
+    monitored = [keyword.subscribe(wake) for keyword in keywords]
+    if len(monitored) > 0 and all(monitored):
+        interval = heartbeat
+    else:
+        interval = poll
+    endat = None if timeout is None else monotonic() + timeout
+    try:
+        while True:
+            changed.clear()
+            if condition():
+                return True
+            if endat is None:
+                changed.wait(interval)
+            else:
+                remaining = endat - monotonic()
+                if remaining <= 0:
+                    return False
+                changed.wait(min(interval, remaining))
+    finally:
+        for keyword in keywords:
+            keyword.unsubscribe(wake)
+
+
+def connect_to_ktl(instrument, serviceNames):
+    '''Return a dictionary of `Service` objects for the given service names.
+    '''
+    log = logging.getLogger(instrument)
+    services = {}
+    for serviceName in serviceNames:
+        log.debug(f'Connecting to {serviceName} service')
+        services[serviceName] = cache(service=serviceName)
+    return services
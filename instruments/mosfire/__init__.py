@@ -1,16 +1,137 @@
-from .core import *
-from .obsmode import *
-from .filter import *
-from .fcs import *
-from .metadata import *
-from .csu import *
-from .mask import *
-from .detector import *
-from .rotator import *
-from .hatch import *
-from .power import *
-from .calibration import *
-from .checkout import *
-from .analysis import *
-from .shutdown import *
-from .utilities import *
+'''MOSFIRE instrument functions and scripts.
+
+Submodules are imported the first time one of their names is used (PEP 562),
+so `from instruments.mosfire import set_exptime` only pays for the keyword
+layer and not for the analysis and astronomy libraries used elsewhere.
+`from instruments.mosfire import *` imports every submodule and provides the
+same names as before, including the modules, classes and functions (e.g.
+`fits`, `plt`, `Table` and `sleep`) which used to come with the submodules'
+own imports.
+'''
+import importlib
+import types
+
+# Submodules in the order they were star imported
+submodules = ['core', 'obsmode', 'filter', 'fcs', 'metadata', 'csu', 'mask',
+              'detector', 'rotator', 'hatch', 'power', 'calibration',
+              'domelamps', 'checkout', 'analysis', 'shutdown', 'utilities',
+              'library']
+
+# The public names of each submodule (its `__all__`), so that a name can be
+# found without importing every submodule.
+_names = {
+    'core': ['FailedCondition', 'CSUFatalError', 'name', 'modes', 'filters',
+             'csu_bar_state_file', 'mosfire_data_file_path',
+             'fitted_transforms_file', 'log', 'load_transforms',
+             'conditions_ok', 'instrument_is_MOSFIRE', 'check_connectivity',
+             'pupil_rotator_ok', 'mechanisms_ok', 'start_scriptrun',
+             'stop_scriptrun', 'reset_scriptrun', 'inspect', 'Path', 'np',
+             'socket', 'subprocess', 'sys', 'ktl', 'create_log', 'keywords',
+             'conditions', 'memoize'],
+    'obsmode': ['grating_shim_ok', 'grating_turret_ok', 'obsmode',
+                'set_obsmode'],
+    'filter': ['filter1_ok', 'filter2_ok', 'filter', 'is_dark', 'waitfordark',
+               'filter1', 'filter2', 'go_dark', 'quick_dark'],
+    'fcs': ['FCS_ok', 'FCS_in_position', 'waitfor_FCS', 'update_FCS',
+            'park_FCS'],
+    'metadata': ['outdir', 'set_outdir', 'object', 'set_object', 'observer',
+                 'set_observer', 'filename', 'lastfile'],
+    'csu': ['CSUbar_ok', 'CSUbars_ok', 'CSUready', 'setup_mask',
+            'execute_mask', 'initialize_bars', 'waitfor_CSU',
+            'get_current_mask', 'read_csu_bar_state', 'slit_to_bars',
+            'bar_to_slit', 'pad', 'unpad', 'fit_transforms', 'CSUTransform',
+            'csu_transform', 'save_transform', 'pixel_to_physical',
+            'physical_to_pixel', 'CSU_ok'],
+    'mask': ['keck', 'J2000', 'TT_minus_UTC', 'julian_date', 'sidereal_time',
+             'parallactic_angle', 'bad_drive_angles', 'bad_angle_tolerance',
+             'predicted_drive_angle', 'is_bad_angle', 'find_runs',
+             'bad_angle_intervals', 'mask_cache_directory', 'cache_version',
+             'slit_columns', 'slit_dtype', 'SlitConfiguration', 'Mask'],
+    'detector': ['waitfor_exposure', 'exptime', 'set_exptime', 'coadds',
+                 'set_coadds', 'sampmode', 'set_sampmode', 'take_exposure',
+                 'wfgo', 'goi'],
+    'rotator': ['safe_angle', 'rotpposn', 'set_rotpposn', 'drive_angle',
+                'set_drive_angle'],
+    'hatch': ['hatch_ok', 'hatch_unlocked', 'lock_hatch', 'unlock_hatch',
+              'set_hatch', 'open_hatch', 'close_hatch', 'dustcover_ok',
+              'dustcover_unlocked', 'trapdoor_ok', 'trapdoor_unlocked'],
+    'power': ['power_strip', 'glycol_power', 'csu_controller_power',
+              'csu_drive_power', 'jade2_power', 'computer_power',
+              'lantronix_power', 'Ne_lamp', 'Ar_lamp', 'guider_focus_power',
+              'varian_power', 'guider_camera_power', 'lakeshore_power',
+              'motor_box_power', 'power_supplies_power',
+              'fcs_controller_power', 'dewar_heater_power'],
+    'calibration': ['read_calibration_config', 'take_arcs', 'take_flats',
+                    'take_calibrations_for_a_mask', 'take_calibrations'],
+    'domelamps': ['dome_flat_lamps'],
+    'checkout': ['checkout', 'expect_longslit', 'expect_wideslit'],
+    'analysis': ['verify_mask_with_image', 'refit_transform',
+                 'trend_bar_positions', 'AnalysisWorker', 'slit_bands',
+                 'band_rows', 'slit_profiles', 'find_bar_positions_from_image',
+                 'downsample', 'plot_bar_positions', 'find_bar_edges',
+                 'find_all_bar_edges'],
+    'shutdown': ['stop_mosfire_software', 'end_of_night_shutdown'],
+    'utilities': ['generate_mask_starlist'],
+    'library': ['default_index_file', 'MaskLibrary', 'record_calibration'],
+}
+
+_locations = {name: submodule for submodule, names in _names.items()
+                              for name in names}
+# Loaded on first use by core's module __getattr__
+_locations['transforms'] = 'core'
+
+# Names which the submodules used to provide through their own imports, as
+# (module, attribute) with an attribute of None for the module itself
+_imports = {'fits': ('astropy.io.fits', None),
+            'stats': ('astropy.stats', None),
+            'models': ('astropy.modeling.models', None),
+            'fitting': ('astropy.modeling.fitting', None),
+            'viz': ('astropy.visualization', None),
+            'c': ('astropy.coordinates', None),
+            'u': ('astropy.units', None),
+            'Angle': ('astropy.coordinates', 'Angle'),
+            'Table': ('astropy.table', 'Table'),
+            'Column': ('astropy.table', 'Column'),
+            'Row': ('astropy.table', 'Row'),
+            'Time': ('astropy.time', 'Time'),
+            'mpl': ('matplotlib', None),
+            'plt': ('matplotlib.pyplot', None),
+            'ndimage': ('scipy.ndimage', None),
+            'yaml': ('yaml', None),
+            'ET': ('xml.etree.ElementTree', None),
+            'configparser': ('configparser', None),
+            'random': ('random', None),
+            're': ('re', None),
+            'datetime': ('datetime', 'datetime'),
+            'timedelta': ('datetime', 'timedelta'),
+            'sleep': ('time', 'sleep')}
+
+__all__ = list(_locations) + list(_imports)\
+          + [module for module in submodules if module not in _locations]
+
+
+def __getattr__(name):
+    if name in _locations:
+        module = importlib.import_module(f'{__name__}.{_locations[name]}')
+        value = getattr(module, name)
+    elif name in _imports:
+        module, attribute = _imports[name]
+        value = importlib.import_module(module)
+        if attribute is not None:
+            value = getattr(value, attribute)
+    elif name in submodules:
+        value = importlib.import_module(f'{__name__}.{name}')
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    # Importing a submodule binds it as an attribute of the package.  The
+    # `filter`, `obsmode` and `checkout` functions share a name with their
+    # module and take precedence over it, as they did with star imports.
+    for shadowed in ['filter', 'obsmode', 'checkout']:
+        if isinstance(globals().get(shadowed), types.ModuleType):
+            globals()[shadowed] = getattr(globals()[shadowed], shadowed)
+    return value
+
+
+def __dir__():
+    return sorted(set(list(globals().keys()) + __all__))
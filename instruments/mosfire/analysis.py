@@ -1,59 +1,308 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import threading
 
 import matplotlib as mpl
+
+__all__ = ['verify_mask_with_image', 'refit_transform', 'trend_bar_positions',
+           'AnalysisWorker', 'slit_bands', 'band_rows', 'slit_profiles',
+           'find_bar_positions_from_image', 'downsample',
+           'plot_bar_positions', 'find_bar_edges', 'find_all_bar_edges']
 mpl.use('Agg')
-from matplotlib import pyplot as plt
-plt.ioff()
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
 
 import numpy as np
 from scipy import ndimage
-from astropy.io import fits
-from astropy import visualization as viz
-from astropy.modeling import models, fitting
 
+from instruments import images
 from .core import *
-from .csu import slit_to_bars, physical_to_pixel, bar_to_slit
+from .mask import Mask
+from .csu import (slit_to_bars, physical_to_pixel, bar_to_slit, csu_transform,
+                  CSUTransform, save_transform)
 
 
 ## ------------------------------------------------------------------
 ##  Compare Image to Mask Design
 ## ------------------------------------------------------------------
-def verify_mask_with_image(mask, imagefile, tolerance=2, plot=False, filtersize=7):
+def verify_mask_with_image(mask, imagefile, tolerance=2, plot=False, filtersize=7,
+                           check=True):
+    '''Find the bar positions in an image of the mask and compare them with
+    the positions expected from the mask design.
+
+    Returns a structured array with the bar number, found and expected X
+    pixel positions, their difference and whether the bar is within
+    `tolerance` pixels, for each of the 92 bars.  Bars whose edge could not
+    be found have NaN for their found position.  If `check` is True,
+    FailedCondition is raised if any bar is out of tolerance.
+    '''
     log.info('Finding bar positions')
     foundbars = find_bar_positions_from_image(imagefile,
                         filtersize=filtersize, plot=plot)
     log.info('Verifying bar positions')
-    barsok = list()
-    for bar in range(1,93):
-        found = foundbars[bar]
-        if bar %2 == 0:
-            slitinfo = mask.slitpos[mask.slitpos['leftBarNumber'] == bar]
-            expected_mm = float(slitinfo['leftBarPositionMM'])
-        else:
-            slitinfo = mask.slitpos[mask.slitpos['rightBarNumber'] == bar]
-            expected_mm = float(slitinfo['rightBarPositionMM'])
-        expected = physical_to_pixel([[expected_mm, bar_to_slit(bar)]])[0][0][0]
-        diff = abs(found - expected)
-
-        if not np.isclose(found, expected, atol=tolerance):
-            log.warning(f'Bar {bar} out of tolerance: got {found:.1f} '
-                        f'expected {expected:.1f} (difference = {diff:.1f})')
-            barsok.append(False)
+    result = np.zeros(92, dtype=[('bar', int), ('found', float),
+                                 ('expected', float), ('delta', float),
+                                 ('ok', bool)])
+    result['bar'] = np.arange(1,93)
+    result['found'] = [np.nan if foundbars[bar] is None else foundbars[bar]
+                       for bar in result['bar']]
+    result['expected'] = csu_transform().bars_to_pixel(mask.bar_positions())
+    result['delta'] = result['found'] - result['expected']
+    result['ok'] = np.abs(result['delta']) <= tolerance
+
+    for bar, found, expected, delta, ok in result:
+        message = f'got {found:.1f} expected {expected:.1f} '\
+                  f'(difference = {abs(delta):.1f})'
+        if ok:
+            log.debug(f'Bar {bar} is within tolerance: {message}')
         else:
-            log.debug(f'Bar {bar} is within tolerance: got {found:.1f} '
-                      f'expected {expected:.1f} (difference = {diff:.1f})')
-            barsok.append(True)
-    if not np.all(barsok):
+            log.warning(f'Bar {bar} out of tolerance: {message}')
+    if check is True and not np.all(result['ok']):
         raise FailedCondition('Image did not match mask design')
-    else:
+    if np.all(result['ok']):
         log.info(f'Bars all verified within {tolerance} pixels')
+    return result
+
+
+## ------------------------------------------------------------------
+##  Refit the CSU Transforms
+## ------------------------------------------------------------------
+def refit_transform(frames, nsigma=4, iterations=5, filtersize=7,
+                    min_sigma=0.2, min_bars=10, write=False):
+    '''Fit new CSU coordinate transforms from checkout images.
+
+    `frames` is a list of (mask, imagefile) pairs, e.g. the open mask and
+    long slit images from a full checkout.  Use at least one mask with bars
+    at well separated positions (such as OPEN), a long slit alone barely
+    constrains the mm scale.
+
+    The found X pixel position of every bar is paired with its commanded
+    position (mm, slit) and all of them are fit with `fit_transforms` in
+    one least squares solution.  Bars more than `nsigma` (robust) standard
+    deviations from the fit are rejected and the fit repeated, up to
+    `iterations` times (0 fits once and rejects nothing).  The standard
+    deviation is never taken to be less than `min_sigma` pixels, about the
+    noise in a measured bar edge, so that good bars are not rejected when
+    the fit is very good.  At least `min_bars` bars must be found for the
+    fit to be made.  The Y pixel position of each bar is taken from the
+    current transform as the images do not measure it.
+
+    Returns the new `CSUTransform` and a structured array with the pixel
+    residual of each point, whether it was used and the shift in its
+    predicted position relative to the current transform.  If `write` is
+    True the new transform is saved and becomes the default.
+    '''
+    current = csu_transform()
+    physical = []
+    found = []
+    for mask, imagefile in frames:
+        bars = find_bar_positions_from_image(imagefile, filtersize=filtersize)
+        physical.append(np.column_stack([mask.bar_positions(),
+                                         (np.arange(1,93) + 1) // 2]))
+        found.append([np.nan if bars[bar] is None else bars[bar]
+                      for bar in range(1,93)])
+    physical = np.vstack(physical)
+    pixels = np.column_stack([np.concatenate(found),
+                              current.to_pixel(physical)[:,1]])
+
+    finite = np.all(np.isfinite(pixels), axis=1)\
+             & np.all(np.isfinite(physical), axis=1)
+    if finite.sum() < min_bars:
+        raise FailedCondition(f'Only {finite.sum()} bars were found in the '
+                              f'images, at least {min_bars} are needed to '
+                              f'fit the CSU transform')
+    use = finite.copy()
+    transform = CSUTransform.fit(pixels[use], physical[use])
+    residual = pixels[:,0] - transform.to_pixel(physical)[:,0]
+    for i in range(iterations):
+        center = np.median(residual[use])
+        sigma = max(1.4826*np.median(np.abs(residual[use] - center)),
+                    min_sigma)
+        keep = finite & (np.abs(residual - center) <= nsigma*sigma)
+        if np.array_equal(keep, use) or keep.sum() < min_bars:
+            break
+        use = keep
+        transform = CSUTransform.fit(pixels[use], physical[use])
+        residual = pixels[:,0] - transform.to_pixel(physical)[:,0]
+
+    result = np.zeros(len(physical), dtype=[('bar', int), ('mm', float),
+                                            ('residual', float),
+                                            ('used', bool), ('shift', float)])
+    result['bar'] = np.tile(np.arange(1,93), len(frames))
+    result['mm'] = physical[:,0]
+    result['residual'] = residual
+    result['used'] = use
+    result['shift'] = transform.to_pixel(physical)[:,0]\
+                      - current.to_pixel(physical)[:,0]
+    log.info(f'Fit {use.sum()} of {finite.sum()} bars, rms residual = '
+             f'{np.sqrt(np.mean(residual[use]**2)):.2f} pix')
+    log.info(f'Largest change from the current transform is '
+             f'{np.nanmax(np.abs(result["shift"])):.2f} pix')
+    for bar in result[finite & ~use]:
+        log.warning(f'Bar {bar["bar"]} at {bar["mm"]:.2f} mm rejected '
+                    f'(residual {bar["residual"]:.1f} pix)')
+    if write is True:
+        save_transform(transform)
+    return transform, result
+
+
+## ------------------------------------------------------------------
+##  Bar Position Trends
+## ------------------------------------------------------------------
+def _bar_positions_in_file(imagefile, filtersize):
+    # Run in a worker process by `trend_bar_positions`
+    header = images.header(imagefile)
+    bars = find_bar_positions_from_image(imagefile, filtersize=filtersize)
+    found = np.array([np.nan if bars[bar] is None else bars[bar]
+                      for bar in range(1,93)])
+    expected = csu_transform().bars_to_pixel(Mask(str(imagefile)).bar_positions())
+    return str(header.get('DATE-OBS', '')), found, expected
+
+
+def trend_bar_positions(imagefiles, filtersize=7, processes=None):
+    '''Find the bars in a set of (e.g. archived checkout) images using a pool
+    of `processes` worker processes and return a table with one row per bar
+    per image giving the file, observation date, bar number and the found
+    and expected (from the bar positions in the header) X pixel positions.
+    Files which can not be analyzed are logged and skipped.
+
+    The workers are spawned, so a script which calls this must guard its
+    main program with `if __name__ == '__main__'`.
+    '''
+    from astropy.table import Table
+    imagefiles = [Path(imagefile) for imagefile in imagefiles]
+    columns = {'file': [], 'date': [], 'bar': [], 'found': [], 'expected': []}
+    # Spawned, as forking a process which is running threads is not safe
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(_bar_positions_in_file, imagefile, filtersize)
+                   for imagefile in imagefiles]
+        for imagefile, future in zip(imagefiles, futures):
+            try:
+                date, found, expected = future.result()
+            except Exception as e:
+                log.warning(f'Unable to analyze {imagefile.name}: {e}')
+                continue
+            log.debug(f'Analyzed {imagefile.name}')
+            columns['file'].append(np.full(92, imagefile.name))
+            columns['date'].append(np.full(92, date))
+            columns['bar'].append(np.arange(1,93, dtype=np.int16))
+            columns['found'].append(found.astype(np.float32))
+            columns['expected'].append(expected.astype(np.float32))
+    if len(columns['bar']) == 0:
+        return Table(names=['file', 'date', 'bar', 'found', 'expected', 'delta'],
+                     dtype=[str, str, np.int16, np.float32, np.float32, np.float32])
+    table = Table({name: np.concatenate(values) for name,values in columns.items()})
+    table['delta'] = table['found'] - table['expected']
+    return table
+
+
+## ------------------------------------------------------------------
+##  Background Analysis
+## ------------------------------------------------------------------
+class AnalysisWorker(object):
+    '''Run image analysis (e.g. `verify_mask_with_image`) in a background
+    thread so that a script can carry on moving mechanisms while it runs.
+    Jobs run one at a time, in the order they were submitted.  Call `join`
+    to wait for all of them and collect the results.
+    '''
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix='analysis')
+        self.jobs = []
+
+    def submit(self, function, *args, **kwargs):
+        '''Queue a call to `function(*args, **kwargs)`.
+        '''
+        log.debug(f'Queueing {function.__name__} for background analysis')
+        self.jobs.append((function, self.executor.submit(function, *args, **kwargs)))
+
+    def join(self, timeout=None):
+        '''Wait for every queued job to finish and return their results in the
+        order they were submitted.  If any failed, raise a single
+        FailedCondition describing all of the failures (errors other than
+        FailedCondition are re-raised as is).
+        '''
+        results = []
+        failures = []
+        for function, future in self.jobs:
+            try:
+                results.append(future.result(timeout=timeout))
+            except Exception as e:
+                failures.append(e)
+                results.append(None)
+        self.jobs = []
+        for e in failures:
+            if not isinstance(e, FailedCondition):
+                raise e
+        if len(failures) > 0:
+            raise FailedCondition('; '.join([e.message for e in failures]))
+        return results
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
 
 
 ## ------------------------------------------------------------------
 ##  Analyze Image to Determine Bar Positions
 ## ------------------------------------------------------------------
+def slit_bands(pixel_shim=10):
+    '''Using the affine transformation determined by `fit_transforms`,
+    return the Y pixel range (y1, y2) over which each of the 46 slits should
+    be found as two integer arrays, indexed by slit number minus one.
+    '''
+    slits = np.arange(1,47)
+    corners = np.vstack([np.column_stack([np.full(46, 4.0), slits+0.5]),
+                         np.column_stack([np.full(46, 270.4), slits-0.5])])
+    y = csu_transform().to_pixel(corners)[:,1]
+    y1 = np.ceil(y[:46]).astype(int) + pixel_shim
+    y2 = np.floor(y[46:]).astype(int) - pixel_shim
+    return y1, y2
+
+
+def band_rows(y1, y2, ny):
+    '''Return the sorted indices of the rows in the union of the Y bands
+    [y1, y2) of an image with `ny` rows.
+    '''
+    edges = np.zeros(ny+1, dtype=int)
+    np.add.at(edges, np.clip(y1, 0, ny), 1)
+    np.add.at(edges, np.clip(y2, 0, ny), -1)
+    return np.flatnonzero(np.cumsum(edges[:-1]) > 0)
+
+
+def slit_profiles(data, y1, y2, filtersize=5):
+    '''Median filter (in X only) and take the X direction gradient of the
+    rows of the image which fall in any of the Y bands [y1, y2), then collapse
+    each band in the Y direction to form one 1D profile per band.
+
+    Rows outside the bands are never touched and the work is done in
+    float32.  Because the filter and gradient only act along X, the band rows
+    can be stacked in to one compact array and filtered in a single pass.
+    '''
+    ny, nx = data.shape
+    y1 = np.clip(np.asarray(y1), 0, ny)
+    y2 = np.clip(np.asarray(y2), 0, ny)
+    rows = band_rows(y1, y2, ny)
+    profiles = np.zeros((len(y1), nx), dtype=np.float32)
+    if len(rows) == 0:
+        return profiles
+    band = np.asarray(data[rows], dtype=np.float32)
+    gradx = np.gradient(ndimage.median_filter(band, size=(1, filtersize)), axis=1)
+    # Each band is contiguous in the compact array, so sum it with one
+    # reduceat over (start, end) pairs, discarding the end-to-start sums.
+    start = np.searchsorted(rows, y1)
+    end = np.searchsorted(rows, y2)
+    gradx = np.vstack([gradx, np.zeros((1, nx), dtype=gradx.dtype)])
+    sums = np.add.reduceat(gradx, np.column_stack([start, end]).ravel(), axis=0)
+    valid = end > start
+    profiles[valid] = sums[::2][valid]
+    return profiles
+
+
 def find_bar_positions_from_image(imagefile, filtersize=5, plot=False,
-                                  pixel_shim=10):
+                                  pixel_shim=10, background=False):
     '''Loop over all slits in the image and using the affine transformation
     determined by `fit_transforms`, select the Y pixel range over which this
     slit should be found.  Take a median filtered version of that image and
@@ -66,81 +315,215 @@ def find_bar_positions_from_image(imagefile, filtersize=5, plot=False,
     Convert those X pixel position to physical coordinates using the
     `pixel_to_physical` method and then call the `compare_to_csu_bar_state`
     method to determine the bar state.
+
+    `imagefile` may also be an image array which has already been read, so
+    that it can be re-analyzed cheaply with a different `filtersize` or
+    `pixel_shim` (no plot is made in that case).  If `background` is True
+    the plot is written by a separate process and may not exist yet when
+    this returns.
     '''
-    ## Get image from file
-    imagefile = Path(imagefile).absolute()
-    try:
-        hdul = fits.open(imagefile)
-        data = hdul[0].data
-    except Error as e:
-        log.error(e)
-        raise
-    # median X pixels only (preserve Y structure)
-    medimage = ndimage.median_filter(data, size=(1, filtersize))
-    
     bars = {}
     ypos = {}
+    y1, y2 = slit_bands(pixel_shim=pixel_shim)
     for slit in range(1,47):
         b1, b2 = slit_to_bars(slit)
-        ## Determine y pixel range
-        y1 = int(np.ceil((physical_to_pixel(np.array([(4.0, slit+0.5)])))[0][0][1])) + pixel_shim
-        y2 = int(np.floor((physical_to_pixel(np.array([(270.4, slit-0.5)])))[0][0][1])) - pixel_shim
-        ypos[b1] = [y1, y2]
-        ypos[b2] = [y1, y2]
-        gradx = np.gradient(medimage[y1:y2,:], axis=1)
-        horizontal_profile = np.sum(gradx, axis=0)
-        bars[b1], bars[b2] = find_bar_edges(horizontal_profile)
+        ypos[b1] = [y1[slit-1], y2[slit-1]]
+        ypos[b2] = [y1[slit-1], y2[slit-1]]
+
+    ## Get image from file
+    if isinstance(imagefile, np.ndarray):
+        data = imagefile
+        imagefile = None
+        profiles = slit_profiles(data, y1, y2, filtersize=filtersize)
+    else:
+        # Read only the rows in the slit bands and find the bands in them
+        imagefile = Path(imagefile).absolute()
+        try:
+            ny = images.shape(images.header(imagefile))[0]
+            rows = band_rows(y1, y2, ny)
+            data = images.read_rows(imagefile, rows)
+        except Exception as e:
+            log.error(e)
+            raise
+        profiles = slit_profiles(data, np.searchsorted(rows, y1),
+                                 np.searchsorted(rows, y2), filtersize=filtersize)
+
+    # Fit the edges in all 46 slits at once
+    x1, x2 = find_all_bar_edges(profiles)
+    for slit in range(1,47):
+        b1, b2 = slit_to_bars(slit)
+        bars[b1] = None if np.isnan(x1[slit-1]) else x1[slit-1]
+        bars[b2] = None if np.isnan(x2[slit-1]) else x2[slit-1]
 
     # Generate plot if called for
-    if plot is True:
+    if plot is True and imagefile is not None:
         plotfile = imagefile.with_name(f"{imagefile.stem}.png")
-        log.info(f'Creating PNG image {plotfile}')
-        if plotfile.exists(): plotfile.unlink()
-        plt.figure(figsize=(16,16), dpi=300)
-        norm = viz.ImageNormalize(data, interval=viz.PercentileInterval(99.9),
-                                  stretch=viz.LinearStretch())
-        plt.imshow(data, norm=norm, origin='lower', cmap='Greys')
-        for bar in bars.keys():
-#             plt.plot([0,2048], [ypos[bar][0], ypos[bar][0]], 'r-', alpha=0.1)
-#             plt.plot([0,2048], [ypos[bar][1], ypos[bar][1]], 'r-', alpha=0.1)
-            plt.plot([bars[bar],bars[bar]], ypos[bar], 'r-', alpha=0.75)
-            offset = {0: -20, 1:+20}[bar % 2]
-            plt.text(bars[bar]+offset, np.mean(ypos[bar]), bar,
-                     fontsize=8, color='r', alpha=0.75,
-                     horizontalalignment='center', verticalalignment='center')
-        plt.savefig(str(plotfile), bbox_inches='tight')
+        plot_bar_positions(images.read_image(imagefile), bars, ypos, plotfile,
+                           background=background)
 
     return bars
 
 
+## ------------------------------------------------------------------
+##  Quick Look Plot of Bar Positions
+## ------------------------------------------------------------------
+def downsample(data, block=2):
+    '''Average the image in `block` x `block` pixel blocks (trimming any
+    partial blocks at the edges).
+    '''
+    ny, nx = (np.array(data.shape) // block) * block
+    return data[:ny,:nx].reshape(ny//block, block, nx//block, block)\
+                        .mean(axis=(1,3), dtype=np.float32)
+
+
+def plot_bar_positions(data, bars, ypos, plotfile, block=2, dpi=100,
+                       sample=4, background=False):
+    '''Write a PNG quick look image with the found bar positions marked.
+
+    The image is block averaged by `block` before it is drawn and the display
+    range (the central 99.9 percent of the pixel values) is taken from every
+    `sample`th row and column of the full resolution data.  If `background`
+    is True the PNG is written by a separate thread, which is returned.
+    '''
+    plotfile = Path(plotfile)
+    log.info(f'Creating PNG image {plotfile}')
+    if plotfile.exists(): plotfile.unlink()
+    vmin, vmax = np.nanpercentile(data[::sample,::sample], [0.05, 99.95])
+    found = [bar for bar in bars.keys() if bars[bar] is not None]
+    x = np.array([bars[bar] for bar in found])
+    y = np.array([ypos[bar] for bar in found], dtype=float).reshape(-1,2)
+    offset = np.where(np.array(found) % 2 == 0, -20, +20)
+    args = (downsample(data, block=block), data.shape, vmin, vmax, x, y,
+            x+offset, found, str(plotfile), dpi)
+    if background is True:
+        # A thread rather than a forked process: forking a process which is
+        # already running threads (keyword reads, the analysis worker) can
+        # deadlock on a lock one of them holds
+        thread = threading.Thread(target=_render, args=args,
+                                  name='plot_bar_positions')
+        thread.start()
+        return thread
+    _render(*args)
+
+
+def _render(image, shape, vmin, vmax, x, y, xlabel, labels, plotfile, dpi):
+    # Uses the object oriented interface so it is safe to call from a thread
+    fig = Figure(figsize=(16,16), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1,1,1)
+    ax.imshow(image, vmin=vmin, vmax=vmax, origin='lower', cmap='Greys',
+              extent=(-0.5, shape[1]-0.5, -0.5, shape[0]-0.5),
+              interpolation='nearest')
+    segments = np.stack([np.column_stack([x, y[:,0]]),
+                         np.column_stack([x, y[:,1]])], axis=1)
+    ax.add_collection(LineCollection(segments, colors='r', alpha=0.75),
+                      autolim=False)
+    for xl, yl, label in zip(xlabel, y.mean(axis=1), labels):
+        ax.text(xl, yl, label, fontsize=8, color='r', alpha=0.75,
+                horizontalalignment='center', verticalalignment='center')
+    fig.savefig(plotfile, bbox_inches='tight')
+
+
 def find_bar_edges(horizontal_profile):
     '''Given a 1D profile, dertermime the X position of each bar that forms
     a single slit.  The slit edges are found by fitting one positive and
     one negative gaussian function to the profile.
     '''
-    fitter = fitting.LevMarLSQFitter()
-
-    amp1_est = horizontal_profile[horizontal_profile == min(horizontal_profile)]
-    mean1_est = np.argmin(horizontal_profile)
-    amp2_est = horizontal_profile[horizontal_profile == max(horizontal_profile)]
-    mean2_est = np.argmax(horizontal_profile)
-
-    g_init1 = models.Gaussian1D(amplitude=amp1_est, mean=mean1_est, stddev=2.)
-    g_init1.amplitude.max = 0
-    g_init2 = models.Gaussian1D(amplitude=amp2_est, mean=mean2_est, stddev=2.)
-    g_init2.amplitude.min = 0
-
-    model = g_init1 + g_init2
-    fit = fitter(model, range(0,horizontal_profile.shape[0]), horizontal_profile)
-
-    # Check Validity of Fit
-    if abs(fit.stddev_0.value) < 3 and abs(fit.stddev_1.value) < 3\
-       and fit.amplitude_0.value < -1 and fit.amplitude_1.value > 1\
-       and fit.mean_0.value > fit.mean_1.value:
-        x1 = fit.mean_0.value
-        x2 = fit.mean_1.value
-    else:
-        x1 = None
-        x2 = None
-    
-    return (x1, x2)
+    x1, x2 = find_all_bar_edges(np.atleast_2d(horizontal_profile))
+    if np.isnan(x1[0]):
+        return (None, None)
+    return (x1[0], x2[0])
+
+
+def find_all_bar_edges(profiles, window=20, iterations=50):
+    '''Given a 2D array with one profile per row, fit one negative and one
+    positive gaussian to every row at the same time and return the X
+    positions of the two edges (x1 from the negative gaussian and x2 from the
+    positive one) as two arrays.  Rows where the fit does not look like a pair
+    of bar edges have NaN for both.
+
+    This is the same model and the same validity checks as fitting each
+    profile with an astropy `Gaussian1D + Gaussian1D` compound model, but the
+    least squares problem for all rows is solved together with a vectorized
+    Levenberg-Marquardt iteration.  Only the pixels within `window` pixels of
+    the two initial peak positions are used, outside of that the model is
+    zero for any valid fit.
+    '''
+    profiles = np.atleast_2d(np.asarray(profiles, dtype=float))
+    nrows, npix = profiles.shape
+    rows = np.arange(nrows)[:,np.newaxis]
+
+    # Initial guesses as for the individual fits: the extreme values of each
+    # profile and a stddev of 2 pixels.
+    imin = np.argmin(profiles, axis=1)
+    imax = np.argmax(profiles, axis=1)
+    p = np.column_stack([profiles[rows[:,0],imin], imin, np.full(nrows, 2.),
+                         profiles[rows[:,0],imax], imax, np.full(nrows, 2.)])
+
+    # Pixels around each peak.  Pixels off the ends of the profile, or which
+    # are in both windows, get zero weight so each pixel is counted once.
+    offsets = np.arange(-window, window+1)
+    near_min = imin[:,np.newaxis] + offsets
+    near_max = imax[:,np.newaxis] + offsets
+    weight = np.hstack([(near_min >= 0) & (near_min < npix),
+                        (near_max >= 0) & (near_max < npix)
+                        & (np.abs(near_max - imin[:,np.newaxis]) > window)])
+    x = np.clip(np.hstack([near_min, near_max]), 0, npix-1)
+    y = profiles[rows, x]
+    x = x.astype(float)
+    weight = weight.astype(float)
+
+    def model(p):
+        dx0 = x - p[:,1,np.newaxis]
+        dx1 = x - p[:,4,np.newaxis]
+        e0 = np.exp(-0.5*(dx0/p[:,2,np.newaxis])**2)
+        e1 = np.exp(-0.5*(dx1/p[:,5,np.newaxis])**2)
+        return dx0, dx1, e0, e1
+
+    def constrain(p):
+        # amplitude_0 <= 0 and amplitude_1 >= 0 as in the single fits
+        p[:,0] = np.minimum(p[:,0], 0)
+        p[:,3] = np.maximum(p[:,3], 0)
+        p[:,2] = np.where(np.abs(p[:,2]) < 1e-3, 1e-3, p[:,2])
+        p[:,5] = np.where(np.abs(p[:,5]) < 1e-3, 1e-3, p[:,5])
+        return p
+
+    def cost(p):
+        dx0, dx1, e0, e1 = model(p)
+        residual = y - p[:,0,np.newaxis]*e0 - p[:,3,np.newaxis]*e1
+        return np.sum(weight*residual**2, axis=1)
+
+    damping = np.full(nrows, 1e-3)
+    current = cost(p)
+    for i in range(iterations):
+        dx0, dx1, e0, e1 = model(p)
+        g0 = p[:,0,np.newaxis]*e0
+        g1 = p[:,3,np.newaxis]*e1
+        residual = y - g0 - g1
+        s0 = p[:,2,np.newaxis]
+        s1 = p[:,5,np.newaxis]
+        J = np.stack([e0, g0*dx0/s0**2, g0*dx0**2/s0**3,
+                      e1, g1*dx1/s1**2, g1*dx1**2/s1**3], axis=2)
+        JTw = np.swapaxes(J*weight[:,:,np.newaxis], 1, 2)
+        JTJ = JTw @ J
+        JTr = (JTw @ residual[:,:,np.newaxis])[:,:,0]
+        diagonal = np.einsum('rii->ri', JTJ)
+        A = JTJ + damping[:,np.newaxis,np.newaxis]*np.eye(6)*diagonal[:,np.newaxis,:]\
+            + np.eye(6)*1e-12
+        try:
+            step = np.linalg.solve(A, JTr[:,:,np.newaxis])[:,:,0]
+        except np.linalg.LinAlgError:
+            break
+        trial = constrain(p + step)
+        trial_cost = cost(trial)
+        better = trial_cost < current
+        p[better] = trial[better]
+        current[better] = trial_cost[better]
+        damping = np.where(better, damping/10, np.minimum(damping*10, 1e10))
+
+    # Check validity of the fits
+    valid = (np.abs(p[:,2]) < 3) & (np.abs(p[:,5]) < 3)\
+            & (p[:,0] < -1) & (p[:,3] > 1) & (p[:,1] > p[:,4])
+    x1 = np.where(valid, p[:,1], np.nan)
+    x2 = np.where(valid, p[:,4], np.nan)
+    return x1, x2
@@ -16,6 +16,10 @@ from .hatch import open_hatch, close_hatch
 from .detector import take_exposure
 from .domelamps import dome_flat_lamps
 from .power import Ne_lamp, Ar_lamp
+from .library import record_calibration
+
+__all__ = ['read_calibration_config', 'take_arcs', 'take_flats',
+           'take_calibrations_for_a_mask', 'take_calibrations']
 
 
 ##-------------------------------------------------------------------------
@@ -168,7 +172,7 @@ def take_calibrations_for_a_mask(mask, filters, cfg, imaging=False,
     execute_mask()
 
     for filt in filters:
-        hatch_posname = ktl.cache(service='mmdcs', keyword='POSNAME')
+        hatch_posname = keywords.cache(service='mmdcs', keyword='POSNAME')
         if hatch_posname.read() == 'Closed':
             # Start with Arcs
             if imaging is False: take_arcs(filt, cfg)
@@ -181,6 +185,8 @@ def take_calibrations_for_a_mask(mask, filters, cfg, imaging=False,
             if imaging is False: take_arcs(filt, cfg)
         else:
             raise FailedCondition(f'Hatch in unknown state: "{hatch_posname}"')
+        if imaging is False:
+            record_calibration(mask.name, filt)
 
     log.info(f'Done with {", ".join(filters)} calibrations for "{mask.name}"')
 
@@ -1,10 +1,9 @@
 #!kpython3
 
 import numpy as np
-from astropy.io import fits
-from astropy import stats
 from time import sleep
 
+from instruments import images, robust
 from .core import *
 from .mask import Mask
 from .filter import is_dark, go_dark
@@ -14,9 +13,11 @@ from .detector import take_exposure
 from .csu import setup_mask, execute_mask, initialize_bars, physical_to_pixel
 from .rotator import safe_angle
 from .domelamps import dome_flat_lamps
-from .analysis import verify_mask_with_image
+from .analysis import verify_mask_with_image, AnalysisWorker
 from .hatch import unlock_hatch, open_hatch, close_hatch
 
+__all__ = ['checkout', 'expect_longslit', 'expect_wideslit']
+
 
 ##-------------------------------------------------------------------------
 ## MOSFIRE Checkout
@@ -29,7 +30,7 @@ def checkout(quick=False, safeangleoverride=False, tolerance=2):
     '''
     if safeangleoverride is not True:
         # Check if MOSFIRE is the selected instrument and if we are at a safe angle
-        INSTRUMEkw = ktl.cache(service='dcs', keyword='INSTRUME')
+        INSTRUMEkw = keywords.cache(service='dcs', keyword='INSTRUME')
         if INSTRUMEkw.read() == 'MOSFIRE':
             safe_angle()
         else:
@@ -57,13 +58,12 @@ def checkout(quick=False, safeangleoverride=False, tolerance=2):
 
     log.info('Taking dark images')
     take_exposure(exptime=2, coadds=1, sampmode='CDS', object='Test Dark')
-    hdul1 = fits.open(lastfile())
+    difference = images.read_image(lastfile())
     take_exposure(exptime=2, coadds=1, sampmode='CDS', object='Test Dark')
-    hdul2 = fits.open(lastfile())
+    difference -= images.read_image(lastfile())
     # Difference dark images and verify statistics
-    mean, med, std = stats.sigma_clipped_stats(hdul1[0].data - hdul2[0].data,
-                           sigma_lower=2, sigma_upper=2, iters=5)
-#                          sigma=2, maxiters=5) # this line works in astropy 4.X
+    mean, med, std = robust.sigma_clipped_stats(difference, sigma=2, maxiters=5)
+    channels = robust.channel_stats(difference, nchannels=32, sigma=2, maxiters=5)
     expected_mean = 0
     expected_mean_range = 3
     expected_med = 0
@@ -82,6 +82,11 @@ def checkout(quick=False, safeangleoverride=False, tolerance=2):
         log.warning(f"  mean = {mean:.1f} (expected {expected_mean:.1f} +/- {expected_mean_range:.1f})")
         log.warning(f"  median = {med:.1f} (expected {expected_med:.1f} +/- {expected_med_range:.1f})")
         log.warning(f"  stddev = {std:.1f} (expected {expected_std:.1f} +/- {expected_std_range:.1f})")
+    log.info('  channel stddevs = ' + ' '.join([f'{x:.1f}' for x in channels['std']]))
+    for channel in channels:
+        if abs(channel['std'] - expected_std) >= expected_std_range:
+            log.warning(f"  channel {channel['channel']:d} stddev = {channel['std']:.1f} "
+                        f"(expected {expected_std:.1f} +/- {expected_std_range:.1f})")
 
     log.info(f'Please verify that {lastfile()} looks normal for a dark image')
     proceed = input('Continue? [y] ')
@@ -89,70 +94,85 @@ def checkout(quick=False, safeangleoverride=False, tolerance=2):
         log.critical('Exiting script.')
         return False
 
-    # Quick checkout
-    if quick is True:
-        log.info('Setup 46x2.7 long slit mask')
-        wideslit = Mask('46x2.7')
-        setup_mask(wideslit)
-        log.info('Execute mask')
-        execute_mask(override=True)
-        log.info('Taking 2.7" wide long slit image')
-        set_obsmode('K-imaging')
-        take_exposure(exptime=6, coadds=1, sampmode='CDS', object='2.7" Long Slit')
-        wideSlitFile = lastfile()
-        log.info('Going dark')
-        go_dark()
-        verify_mask_with_image(wideslit, wideSlitFile, tolerance=tolerance, plot=True)
-
-        log.info('Setup 46x0.7 long slit mask')
-        longslit = Mask('46x0.7')
-        setup_mask(longslit)
-        log.info('Execute mask')
-        execute_mask(override=True)
-        log.info('Taking long slit image')
-        set_obsmode('K-imaging')
-        take_exposure(exptime=6, coadds=1, sampmode='CDS', object='0.7" Long Slit')
-        narrowSlitFile = lastfile()
-        log.info('Going dark')
-        go_dark()
-        verify_mask_with_image(longslit, narrowSlitFile, tolerance=tolerance, plot=True)
-
-    # Normal (long) checkout
-    if quick is False:
-        log.info('Setup OPEN mask')
-        setup_mask(Mask('OPEN'))
-        execute_mask(override=True)
-        log.info('Initializing all bars')
-        initialize_bars('all')
-
-        log.info('Taking open mask image')
-        set_obsmode('K-imaging', wait=True)
-        take_exposure(exptime=6, coadds=1, sampmode='CDS')
-        openMaskFile = lastfile()
-        go_dark()
-
-        log.info('Setup 0.7x46 long slit mask')
-        setup_mask(Mask('0.7x46'))
-        log.info('Execute mask')
-        execute_mask(override=True)
-        log.info('Taking long slit image')
-        set_obsmode('K-imaging')
-        take_exposure(exptime=6, coadds=1, sampmode='CDS')
-        narrowSlitFile = lastfile()
+    # The background analysis worker is always shut down, even if a step
+    # below fails
+    worker = None
+    try:
+        # Quick checkout
+        if quick is True:
+            log.info('Setup 46x2.7 long slit mask')
+            wideslit = Mask('46x2.7')
+            setup_mask(wideslit)
+            log.info('Execute mask')
+            execute_mask(override=True)
+            log.info('Taking 2.7" wide long slit image')
+            set_obsmode('K-imaging')
+            take_exposure(exptime=6, coadds=1, sampmode='CDS', object='2.7" Long Slit')
+            wideSlitFile = lastfile()
+            # Verify the image while the next mask is set up
+            worker = AnalysisWorker()
+            worker.submit(verify_mask_with_image, wideslit, wideSlitFile,
+                          tolerance=tolerance, plot=True)
+            log.info('Going dark')
+            go_dark()
+
+            log.info('Setup 46x0.7 long slit mask')
+            longslit = Mask('46x0.7')
+            setup_mask(longslit)
+            log.info('Execute mask')
+            execute_mask(override=True)
+            log.info('Taking long slit image')
+            set_obsmode('K-imaging')
+            take_exposure(exptime=6, coadds=1, sampmode='CDS', object='0.7" Long Slit')
+            narrowSlitFile = lastfile()
+            worker.submit(verify_mask_with_image, longslit, narrowSlitFile,
+                          tolerance=tolerance, plot=True)
+            log.info('Going dark')
+            go_dark()
+
+        # Normal (long) checkout
+        if quick is False:
+            log.info('Setup OPEN mask')
+            setup_mask(Mask('OPEN'))
+            execute_mask(override=True)
+            log.info('Initializing all bars')
+            initialize_bars('all')
+
+            log.info('Taking open mask image')
+            set_obsmode('K-imaging', wait=True)
+            take_exposure(exptime=6, coadds=1, sampmode='CDS')
+            openMaskFile = lastfile()
+            go_dark()
+
+            log.info('Setup 0.7x46 long slit mask')
+            setup_mask(Mask('0.7x46'))
+            log.info('Execute mask')
+            execute_mask(override=True)
+            log.info('Taking long slit image')
+            set_obsmode('K-imaging')
+            take_exposure(exptime=6, coadds=1, sampmode='CDS')
+            narrowSlitFile = lastfile()
+            go_dark()
+
+        # Set Imaging mode to exercise mechanisms
+        set_obsmode('J-imaging')
+        sleep(1)
         go_dark()
-
-    # Set Imaging mode to exercise mechanisms
-    set_obsmode('J-imaging')
-    sleep(1)
-    go_dark()
-    sleep(1)
-    mechanisms_ok()
+        sleep(1)
+        mechanisms_ok()
     
-    # Open and close the hatch
-    unlock_hatch()
-    open_hatch()
-    sleep(1)
-    close_hatch()
+        # Open and close the hatch
+        unlock_hatch()
+        open_hatch()
+        sleep(1)
+        close_hatch()
+
+        if quick is True:
+            log.info('Waiting for mask image verification')
+            worker.join()
+    finally:
+        if worker is not None:
+            worker.shutdown()
 
 
 ## ------------------------------------------------------------------
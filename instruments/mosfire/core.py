@@ -1,6 +1,5 @@
 import inspect
 from pathlib import Path
-import yaml
 import numpy as np
 import socket
 import subprocess
@@ -11,7 +10,19 @@ try:
 except ModuleNotFoundError as e:
     from instruments import dummy_ktl as ktl
 
-from instruments import create_log
+from instruments import create_log, keywords, conditions
+from instruments.conditions import memoize
+
+# The imported helpers at the end of the list are shared with the other
+# submodules, which all use `from .core import *`
+__all__ = ['FailedCondition', 'CSUFatalError', 'name', 'modes', 'filters',
+           'csu_bar_state_file', 'mosfire_data_file_path',
+           'fitted_transforms_file', 'log', 'load_transforms',
+           'conditions_ok', 'instrument_is_MOSFIRE', 'check_connectivity',
+           'pupil_rotator_ok', 'mechanisms_ok', 'start_scriptrun',
+           'stop_scriptrun', 'reset_scriptrun', 'inspect', 'Path', 'np',
+           'socket', 'subprocess', 'sys', 'ktl', 'create_log', 'keywords',
+           'conditions', 'memoize']
 
 
 ##-------------------------------------------------------------------------
@@ -37,26 +48,63 @@ modes = ['dark-imaging', 'dark-spectroscopy', 'imaging', 'spectroscopy']
 filters = ['Y', 'J', 'H', 'K', 'Ks', 'J2', 'J3', 'nb1061']
 csu_bar_state_file = Path('/s/sdata1300/logs/server/mcsus/csu_bar_state')
 mosfire_data_file_path = Path(__file__).parent
-# Load default CSU coordinate transformations
-with open(mosfire_data_file_path.joinpath('MOSFIRE_transforms.txt'), 'r') as FO:
-    transforms = yaml.safe_load(FO.read())
+# Transforms refit from checkout images (see `refit_transform`) are written
+# here and are used in preference to the ones shipped with the package
+fitted_transforms_file = Path('~/.mosfire/MOSFIRE_transforms.txt').expanduser()
+_transforms = None
 
 log = create_log(name, loglevel='INFO')
 
-from .fcs import FCS_ok
-from .hatch import hatch_ok
-from .filter import filter1_ok, filter2_ok
-from .obsmode import grating_shim_ok, grating_turret_ok
+
+def load_transforms(reload=False):
+    '''Return the default CSU coordinate transformations.  The file is only
+    read the first time they are needed (or if `reload` is True).
+    '''
+    global _transforms
+    if _transforms is None or reload is True:
+        import yaml
+        transforms_file = fitted_transforms_file
+        if transforms_file.exists() is False:
+            transforms_file = mosfire_data_file_path.joinpath('MOSFIRE_transforms.txt')
+        with open(transforms_file, 'r') as FO:
+            _transforms = yaml.safe_load(FO.read())
+    return _transforms
+
+
+def __getattr__(name):
+    # `transforms` used to be loaded at import time
+    if name == 'transforms':
+        return load_transforms()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+##-----------------------------------------------------------------------------
+## Evaluate Conditions
+##-----------------------------------------------------------------------------
+def conditions_ok(condition_functions):
+    '''Evaluate a set of independent pre- or post- condition functions at the
+    same time and raise a single FailedCondition describing every failure.
+    This takes as long as the slowest check rather than the sum of them all.
+
+    Errors other than FailedCondition (e.g. CSUFatalError) are re-raised as is.
+    '''
+    failures = conditions.evaluate(condition_functions)
+    for condition, e in failures:
+        if not isinstance(e, FailedCondition):
+            raise e
+    if len(failures) > 0:
+        raise FailedCondition('; '.join([e.message for condition, e in failures]))
 
 
 ##-----------------------------------------------------------------------------
 ## pre- and post- conditions
 ##-----------------------------------------------------------------------------
+@memoize(services=['dcs'], watched=[('dcs', 'INSTRUME')])
 def instrument_is_MOSFIRE():
     '''Verifies that MOSFIRE is the currently selected instrument.
     '''
-    INSTRUMEkw = ktl.cache(service='dcs', keyword='INSTRUME')
-    if INSTRUMEkw.read() != 'MOSFIRE':
+    INSTRUMEkw = keywords.cache(service='dcs', keyword='INSTRUME')
+    if INSTRUMEkw.read(bypass=True) != 'MOSFIRE':
         raise FailedCondition('MOSFIRE is not the selected instrument')
 
 
@@ -80,40 +128,42 @@ def check_connectivity():
                 raise FailedCondition(f"ping {address}: {stdout} {stderr}")
 
 
+@memoize(services=['mmprs', 'mosfire'], watched=[('mmprs', 'STATUS')])
 def pupil_rotator_ok():
     '''Commonly used pre- and post- condition to check whether there are errors
     in the pupil rotator status.
     '''
-    mmprs_statuskw = ktl.cache(keyword='STATUS', service='mmprs')
-    pupil_status = mmprs_statuskw.read()
+    mmprs_statuskw = keywords.cache(keyword='STATUS', service='mmprs')
+    pupil_status = mmprs_statuskw.read(bypass=True)
     if pupil_status not in ['OK', 'Tracking']:
         raise FailedCondition(f'Pupil rotator status is {pupil_status}')
 
 
 def mechanisms_ok():
-    '''Simple loop to check whether there are errors in the status of all
-    mechanisms.
+    '''Check whether there are errors in the status of all mechanisms.
     '''
+    # Imported here as these modules themselves import core
+    from .fcs import FCS_ok
+    from .hatch import hatch_ok
+    from .filter import filter1_ok, filter2_ok
+    from .obsmode import grating_shim_ok, grating_turret_ok
     log.debug('Checking mechanisms')
-    mechs = ['filter1', 'filter2', 'FCS', 'grating_shim', 'grating_turret',
-             'pupil_rotator', 'hatch']
-    for mech in mechs:
-        statusfn = getattr(sys.modules[__name__], f'{mech}_ok')
-        statusfn()
+    conditions_ok([filter1_ok, filter2_ok, FCS_ok, grating_shim_ok,
+                   grating_turret_ok, pupil_rotator_ok, hatch_ok])
 
 
 ##-----------------------------------------------------------------------------
 ## scriptrun functions
 ##-----------------------------------------------------------------------------
 def start_scriptrun():
-    scriptrun = ktl.cache(keyword='scriptrun', service='mosfire')
-    if int(scriptrun.read()) == 1:
+    scriptrun = keywords.cache(keyword='scriptrun', service='mosfire')
+    if int(scriptrun.read(bypass=True)) == 1:
         raise FailedCondition('SCRIPTRUN is already set')
     scriptrun.write(1, wait=True)
 
 
 def stop_scriptrun():
-    scriptrun = ktl.cache(keyword='scriptrun', service='mosfire')
+    scriptrun = keywords.cache(keyword='scriptrun', service='mosfire')
     scriptrun.write(0, wait=True)
 
 
@@ -6,9 +6,16 @@ import numpy as np
 from astropy.table import Table, Column, Row
 
 from .core import *
-from .mask import Mask
+from .mask import Mask, SlitConfiguration
 from .rotator import safe_angle
 
+__all__ = ['CSUbar_ok', 'CSUbars_ok', 'CSUready', 'setup_mask',
+           'execute_mask', 'initialize_bars', 'waitfor_CSU',
+           'get_current_mask', 'read_csu_bar_state', 'slit_to_bars',
+           'bar_to_slit', 'pad', 'unpad', 'fit_transforms', 'CSUTransform',
+           'csu_transform', 'save_transform', 'pixel_to_physical',
+           'physical_to_pixel', 'CSU_ok']
+
 
 ##-----------------------------------------------------------------------------
 ## pre- and post- conditions
@@ -17,27 +24,36 @@ def CSUbar_ok(barnum):
     '''Commonly used pre- and post- condition to check whether there are errors
     in the CSU bar status for a specified bar.
     '''
-    bstatkw = ktl.cache(keyword=f"B{int(barnum):02d}STAT", service='mcsus')
-    bar_status = bstatkw.read()
+    bstatkw = keywords.cache(keyword=f"B{int(barnum):02d}STAT", service='mcsus')
+    bar_status = bstatkw.read(bypass=True)
     if bar_status not in ['OK', 'SETUP']:
         raise FailedCondition(f'Bar {int(barnum):02d} status is {bar_status}')
 
 
+@memoize(services=['mcsus'],
+         watched=[('mcsus', f"B{barnum:02d}STAT") for barnum in range(1,93,1)])
 def CSUbars_ok():
-    '''Simple loop to check all bars in the CSU.
+    '''Check all bars in the CSU.  The 92 status keywords are read in a single
+    snapshot and every bar which is not OK is reported.
     '''
     log.debug('Checking CSU bars status')
-    for barnum in range(1,93,1):
-        CSUbar_ok(barnum)
+    bstats = keywords.snapshot('mcsus', [f"B{barnum:02d}STAT" for barnum in range(1,93,1)],
+                              bypass=True)
+    bad = [f'Bar {barnum:02d} status is {bar_status}'
+           for barnum, bar_status in enumerate(bstats.values, start=1)
+           if bar_status not in ['OK', 'SETUP']]
+    if len(bad) > 0:
+        raise FailedCondition(', '.join(bad))
 
 
+@memoize(services=['mcsus'], watched=[('mcsus', 'CSUREADY')])
 def CSUready():
     '''Commonly used pre- and post- condition to check whether the CSU is in an
     error state.
     '''
     log.debug('Checking CSU status')
-    csureadykw = ktl.cache(keyword='CSUREADY', service='mcsus')
-    csuready = int(csureadykw.read())
+    csureadykw = keywords.cache(keyword='CSUREADY', service='mcsus')
+    csuready = int(csureadykw.read(bypass=True))
     translation = {0: 'Unknown',
                    1: 'System Started',
                    2: 'Ready for Move',
@@ -67,15 +83,14 @@ def setup_mask(mask, wait=True, skipprecond=False, skippostcond=False):
         log.debug('Verifying input')
         if type(mask) != Mask:
             raise FailedCondition(f"Input {mask} is not a Mask object")
-        CSU_ok()
-        CSUbars_ok()
+        conditions_ok([CSU_ok, CSUbars_ok])
     
     ##-------------------------------------------------------------------------
     ## Script Contents
     log.info(f'Setting up mask: {mask.name}')
     log.debug('Setting bar target position keywords')
 
-    mcsus = ktl.cache(service='mcsus')
+    mcsus = keywords.cache(service='mcsus')
     for slit in mask.slitpos:
         rbn = slit['rightBarNumber']
         rbp = slit['rightBarPositionMM']
@@ -90,11 +105,12 @@ def setup_mask(mask, wait=True, skipprecond=False, skippostcond=False):
     mcsus['SETUPINIT'].write(1)
     mcsus['SETUPNAME'].write(mask.name)
 
+    csustat = keywords.cache(keyword='CSUSTAT', service='mcsus')
     if wait is True:
         log.debug('Waiting for setup to complete')
-        csustat = ktl.cache(keyword='CSUSTAT', service='mcsus')
-        while str(csustat.read()) in ['Creating Group.', 'Adding bars to Group.']:
-            sleep(0.5)
+        keywords.waitfor(lambda: str(csustat.read(bypass=True)) not in
+                         ['Creating Group.', 'Adding bars to Group.'],
+                         [csustat])
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
@@ -102,11 +118,10 @@ def setup_mask(mask, wait=True, skipprecond=False, skippostcond=False):
         log.debug('Skipping post condition checks')
     else:
         log.debug('Checking for aborted setup')
-        final_status = str(csustat.read())
+        final_status = str(csustat.read(bypass=True))
         if re.search('Setup aborted.  Collision detected at row (\d+)', final_status):
             raise FailedCondition(final_status)
-        CSU_ok()
-        CSUbars_ok()
+        conditions_ok([CSU_ok, CSUbars_ok])
     
     return None
 
@@ -125,15 +140,14 @@ def execute_mask(wait=True, override=False,
     if skipprecond is True:
         log.debug('Skipping pre condition checks')
     else:
-        CSUbars_ok()
-        CSUready()
+        conditions_ok([CSUbars_ok, CSUready])
         if override is False:
             safe_angle()
     
     ##-------------------------------------------------------------------------
     ## Script Contents
     log.info('Executing mask')
-    csugokw = ktl.cache(service='mcsus', keyword='SETUPGO')
+    csugokw = keywords.cache(service='mcsus', keyword='SETUPGO')
     csugokw.write(1)
     sleep(3) # shim needed because CSUREADY keyword doesn't update fast enough
     if wait is True:
@@ -170,8 +184,8 @@ def initialize_bars(bars, timeout=360, skipprecond=False, skippostcond=False):
 
     ##-------------------------------------------------------------------------
     ## Script Contents
-    CSUINITBARkw = ktl.cache(keyword='INITBAR', service='mcsus')
-    csureadykw = ktl.cache(keyword='CSUREADY', service='mcsus')
+    CSUINITBARkw = keywords.cache(keyword='INITBAR', service='mcsus')
+    csureadykw = keywords.cache(keyword='CSUREADY', service='mcsus')
 
     if bars == 'all':
         bars = 0
@@ -187,15 +201,19 @@ def initialize_bars(bars, timeout=360, skipprecond=False, skippostcond=False):
     if bars == [0]:
         log.info('Initializing all bars')
 
+    def csu_initialized():
+        csuready = int(csureadykw.read(bypass=True))
+        if csuready == -1:
+            raise CSUFatalError()
+        return csuready == 1
+
     endat = datetime.utcnow() + timedelta(seconds=timeout*len(bars))
     for bar in bars:
         if bar != 0: log.info(f'Initializing bar {bar}')
         CSUINITBARkw.write(bar)
         log.debug('Waiting for CSU to finish initializing')
-        while int(csureadykw.read()) != 1 and datetime.utcnow() < endat:
-            if int(csureadykw.read()) == -1:
-                raise CSUFatalError()
-            sleep(2)
+        remaining = max((endat - datetime.utcnow()).total_seconds(), 0)
+        keywords.waitfor(csu_initialized, [csureadykw], timeout=remaining)
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
@@ -224,15 +242,17 @@ def waitfor_CSU(timeout=480, noshim=False, skipprecond=False, skippostcond=False
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    csureadykw = ktl.cache(keyword='CSUREADY', service='mcsus')
+    csureadykw = keywords.cache(keyword='CSUREADY', service='mcsus')
+
+    def csu_ready_for_move():
+        csuready = int(csureadykw.read(bypass=True))
+        if csuready == -1:
+            raise CSUFatalError()
+        return csuready == 2
 
-    endat = datetime.utcnow() + timedelta(seconds=timeout)
     if noshim is False:
         sleep(1)
-    while int(csureadykw.read()) != 2 and datetime.utcnow() < endat:
-        if int(csureadykw.read()) == -1:
-            raise CSUFatalError()
-        sleep(2)
+    keywords.waitfor(csu_ready_for_move, [csureadykw], timeout=timeout)
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
@@ -240,7 +260,7 @@ def waitfor_CSU(timeout=480, noshim=False, skipprecond=False, skippostcond=False
         log.debug('Skipping post condition checks')
     else:
         CSU_ok()
-        if int(csureadykw.read()) != 2:
+        if int(csureadykw.read(bypass=True)) != 2:
             raise FailedCondition('Timeout exceeded on waitfor_CSU')
     
     return None
@@ -263,37 +283,32 @@ def get_current_mask(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    mcsus = ktl.cache(service='mcsus')
-
-    log.debug('Getting bar positions')
-    barpos = [float(mcsus[f"B{bar:02d}POS"].read()) for bar in range(1,93,1)]
-    log.debug('Getting bar target positions for comparison')
-    bartarg = [float(mcsus[f"B{bar:02d}TARG"].read()) for bar in range(1,93,1)]
+    log.debug('Getting bar positions and target positions')
+    bars = range(1,93,1)
+    csustate = keywords.snapshot('mcsus', [f"B{bar:02d}POS" for bar in bars]
+                                        + [f"B{bar:02d}TARG" for bar in bars]
+                                        + ['MASKNAME'])
+    positions = csustate.values[:184].astype(float)
+    barpos = positions[:92]
+    bartarg = positions[92:]
     log.debug('Verifying differences are small')
-    deltas = [abs(pair[0]-pair[1]) < 0.01 for pair in zip(barpos, bartarg)]
-    assert np.all(deltas)
+    assert np.all(np.abs(barpos - bartarg) < 0.01)
 
     log.debug('Building mask object from keyword data')
     current_mask = Mask(None)
-    current_mask.name = str(mcsus['MASKNAME'].read())
-    slits_list = []
-    for slitno in range(1,47,1):
-        leftbar = slitno*2
-        leftmm = barpos[leftbar-1]
-        rightbar = slitno*2-1
-        rightmm = barpos[rightbar-1]
-        centermm = (leftmm + rightmm) / 2
-        slitcent = 189.62934431020133 - 1.3801254681363402 * centermm
-        width = (leftmm - rightmm)*0.7/0.507
-        slits_list.append( {'centerPositionArcsec': slitcent,
-                            'leftBarNumber': leftbar,
-                            'leftBarPositionMM': leftmm,
-                            'rightBarNumber': rightbar,
-                            'rightBarPositionMM': rightmm,
-                            'slitNumber': slitno,
-                            'slitWidthArcsec': width,
-                            'target': ''} )
-    current_mask.slitpos = Table(slits_list)
+    current_mask.name = str(csustate['MASKNAME'])
+    slitno = np.arange(1, 47)
+    leftmm = barpos[1::2]
+    rightmm = barpos[0::2]
+    centermm = (leftmm + rightmm) / 2
+    current_mask.slitpos = SlitConfiguration.from_columns({
+                    'slitNumber': slitno,
+                    'leftBarNumber': slitno*2,
+                    'rightBarNumber': slitno*2-1,
+                    'leftBarPositionMM': leftmm,
+                    'rightBarPositionMM': rightmm,
+                    'centerPositionArcsec': 189.62934431020133 - 1.3801254681363402 * centermm,
+                    'slitWidthArcsec': (leftmm - rightmm)*0.7/0.507})
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
@@ -328,27 +343,23 @@ def read_csu_bar_state(skipprecond=False, skippostcond=False):
     mask.name = 'From csu_bar_state'
     with open(csu_bar_state_file, 'r') as cbs:
         lines = cbs.readlines()
-    t = Table(names=('slitNumber', 'leftBarNumber', 'rightBarNumber',
-                     'leftBarPositionMM', 'rightBarPositionMM',
-                     'centerPositionArcsec', 'slitWidthArcsec', 'target'),
-              dtype=('i4', 'i4', 'i4', 'f4', 'f4', 'f4', 'f4', 'a30'))
+    slitno = np.arange(1, 47)
+    columns = {'slitNumber': slitno,
+               'leftBarNumber': np.full(46, -1),
+               'rightBarNumber': np.full(46, -1),
+               'leftBarPositionMM': np.full(46, np.nan),
+               'rightBarPositionMM': np.full(46, np.nan),
+               'centerPositionArcsec': np.full(46, np.nan),
+               'slitWidthArcsec': np.full(46, np.nan)}
+    found = np.zeros(46, dtype=bool)
     for line in lines:
         barno, barpos, barstate = line.strip('\n').split(',')
         slit = bar_to_slit(int(barno))
-        if int(barno) % 2 != 0:
-            dict = {'slitNumber': slit}
-            dict['leftBarNumber'] = -1
-            dict['leftBarPositionMM'] = float('nan')
-            dict['rightBarNumber'] = int(barno)
-            dict['rightBarPositionMM'] = float(barpos)
-            dict['centerPositionArcsec'] = float('nan')
-            dict['slitWidthArcsec'] = float('nan')
-            dict['target'] = ''
-            t.add_row(dict)
-        else:
-            t[slit-1]['leftBarNumber'] = int(barno)
-            t[slit-1]['leftBarPositionMM'] = float(barpos)
-    mask.slitpos = t
+        side = 'right' if int(barno) % 2 != 0 else 'left'
+        columns[f'{side}BarNumber'][slit-1] = int(barno)
+        columns[f'{side}BarPositionMM'][slit-1] = float(barpos)
+        found[slit-1] = True
+    mask.slitpos = SlitConfiguration(SlitConfiguration.from_columns(columns)[found])
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
@@ -418,15 +429,86 @@ def fit_transforms(pixels, physical):
     return Apixel_to_physical, Aphysical_to_pixel
 
 
+class CSUTransform(object):
+    '''The affine transformations between pixel coordinates (X, Y) and
+    physical coordinates (mm, slit), held as contiguous arrays so that any
+    number of points can be converted with a single matrix multiply.
+    '''
+    def __init__(self, Apixel_to_physical, Aphysical_to_pixel):
+        self.Apixel_to_physical = np.ascontiguousarray(
+                np.reshape(Apixel_to_physical, (3,3)), dtype=float)
+        self.Aphysical_to_pixel = np.ascontiguousarray(
+                np.reshape(Aphysical_to_pixel, (3,3)), dtype=float)
+
+    @classmethod
+    def fit(cls, pixels, physical):
+        '''Fit a new transformation using `fit_transforms`.
+        '''
+        return cls(*fit_transforms(pixels, physical))
+
+    @staticmethod
+    def _apply(A, x):
+        x = np.asarray(x, dtype=float)
+        return x @ A[:2,:2] + A[2,:2]
+
+    def to_physical(self, pixels):
+        '''Convert an (n, 2) array of pixel coordinates (X, Y) to physical
+        coordinates (mm, slit).
+        '''
+        return self._apply(self.Apixel_to_physical, pixels)
+
+    def to_pixel(self, physical):
+        '''Convert an (n, 2) array of physical coordinates (mm, slit) to pixel
+        coordinates (X, Y).
+        '''
+        return self._apply(self.Aphysical_to_pixel, physical)
+
+    def bars_to_pixel(self, positions):
+        '''Convert the positions in mm of bars 1 to 92 (in that order) to the
+        X pixel position of each bar at the center of its slit.
+        '''
+        slits = (np.arange(1,93) + 1) // 2
+        return self.to_pixel(np.column_stack([positions, slits]))[:,0]
+
+    def to_dict(self):
+        '''Return the matrices in the layout of the transforms file.
+        '''
+        return {'Apixel_to_physical': [self.Apixel_to_physical.tolist()],
+                'Aphysical_to_pixel': [self.Aphysical_to_pixel.tolist()]}
+
+
+_transform = None
+
+
+def csu_transform(reload=False):
+    '''Return the default `CSUTransform`, built the first time it is needed.
+    '''
+    global _transform
+    if _transform is None or reload is True:
+        transforms = load_transforms(reload=reload)
+        _transform = CSUTransform(transforms['Apixel_to_physical'],
+                                  transforms['Aphysical_to_pixel'])
+    return _transform
+
+
+def save_transform(transform):
+    '''Write a `CSUTransform` to `fitted_transforms_file` and make it the
+    default from now on.
+    '''
+    import yaml
+    fitted_transforms_file.parent.mkdir(parents=True, exist_ok=True)
+    log.info(f'Writing CSU transforms to {fitted_transforms_file}')
+    with open(fitted_transforms_file, 'w') as FO:
+        FO.write(yaml.safe_dump(transform.to_dict()))
+    return csu_transform(reload=True)
+
+
 def pixel_to_physical(x):
     '''Using the affine transformation determined by `fit_transforms`,
     convert a set of pixel coordinates (X, Y) to physical coordinates (mm,
     slit).
     '''
-    x = np.array(x)
-    Apixel_to_physical = np.array(transforms['Apixel_to_physical'])
-    result = unpad(np.dot(pad(x), Apixel_to_physical))
-    return result
+    return csu_transform().to_physical(np.atleast_2d(x))[:,np.newaxis,:]
 
 
 def physical_to_pixel(x):
@@ -434,10 +516,7 @@ def physical_to_pixel(x):
     convert a set of physical coordinates (mm, slit) to pixel coordinates
     (X, Y).
     '''
-    x = np.array(x)
-    Aphysical_to_pixel = np.array(transforms['Aphysical_to_pixel'])
-    result = unpad(np.dot(pad(x), Aphysical_to_pixel))
-    return result
+    return csu_transform().to_pixel(np.atleast_2d(x))[:,np.newaxis,:]
 
 
 ##-----------------------------------------------------------------------------
@@ -7,6 +7,10 @@ from .core import *
 from .metadata import lastfile, set_object
 from .fcs import update_FCS, waitfor_FCS
 
+__all__ = ['waitfor_exposure', 'exptime', 'set_exptime', 'coadds',
+           'set_coadds', 'sampmode', 'set_sampmode', 'take_exposure', 'wfgo',
+           'goi']
+
 
 ##-----------------------------------------------------------------------------
 ## pre- and post- conditions
@@ -15,20 +19,18 @@ def waitfor_exposure(timeout=240, shim=False):
     '''Block and wait for the current exposure to be complete.
     '''
     log.debug('Waiting for exposure to finish')
-    endat = datetime.utcnow() + timedelta(seconds=timeout)
     if shim is True:
         sleep(1)
-    IMAGEDONEkw = ktl.cache(service='mds', keyword='IMAGEDONE')
-    READYkw = ktl.cache(service='mds', keyword='READY')
+    IMAGEDONEkw = keywords.cache(service='mds', keyword='IMAGEDONE')
+    READYkw = keywords.cache(service='mds', keyword='READY')
+
+    def image_done_and_ready():
+        imagedone = bool(int(IMAGEDONEkw.read(bypass=True)))
+        mdsready = bool(int(READYkw.read(bypass=True)))
+        return imagedone and mdsready
 
-    imagedone = bool(int(IMAGEDONEkw.read()))
-    mdsready = bool(int(READYkw.read()))
-    done_and_ready = imagedone and mdsready
-    while datetime.utcnow() < endat and not done_and_ready:
-        sleep(0.5)
-        imagedone = bool(int(IMAGEDONEkw.read()))
-        mdsready = bool(int(READYkw.read()))
-        done_and_ready = imagedone and mdsready
+    done_and_ready = keywords.waitfor(image_done_and_ready,
+                                      [IMAGEDONEkw, READYkw], timeout=timeout)
     if not done_and_ready:
         raise FailedCondition('Timeout exceeded on waitfor_exposure to finish')
 
@@ -50,7 +52,7 @@ def exptime(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    ITIMEkw = ktl.cache(service='mds', keyword='ITIME')
+    ITIMEkw = keywords.cache(service='mds', keyword='ITIME')
     ITIME = float(ITIMEkw.read())/1000
 
     ##-------------------------------------------------------------------------
@@ -80,7 +82,7 @@ def set_exptime(input, skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    ITIMEkw = ktl.cache(service='mds', keyword='ITIME')
+    ITIMEkw = keywords.cache(service='mds', keyword='ITIME')
     new_exptime = float(input)*1000
     log.debug(f'Setting exposure time to {new_exptime:.1f} ms')
     ITIMEkw.write(new_exptime)
@@ -113,7 +115,7 @@ def coadds(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    COADDSkw = ktl.cache(service='mds', keyword='COADDS')
+    COADDSkw = keywords.cache(service='mds', keyword='COADDS')
     COADDS = int(COADDSkw.read())
 
     ##-------------------------------------------------------------------------
@@ -143,7 +145,7 @@ def set_coadds(input, skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    COADDSkw = ktl.cache(service='mds', keyword='COADDS')
+    COADDSkw = keywords.cache(service='mds', keyword='COADDS')
     log.debug(f'Setting coadds to {int(input)}')
     COADDSkw.write(int(input))
     
@@ -178,8 +180,8 @@ def sampmode(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    SAMPMODEkw = ktl.cache(service='mds', keyword='SAMPMODE')
-    NUMREADSkw = ktl.cache(service='mds', keyword='NUMREADS')
+    SAMPMODEkw = keywords.cache(service='mds', keyword='SAMPMODE')
+    NUMREADSkw = keywords.cache(service='mds', keyword='NUMREADS')
     output = {2: 'CDS', 3: 'MCDS'}.get(int(SAMPMODEkw.read()), 'UNKNOWN')
     if output == 'MCDS':
         output += NUMREADSkw.read()
@@ -215,8 +217,8 @@ def set_sampmode(input, skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    SAMPMODEkw = ktl.cache(service='mds', keyword='SAMPMODE')
-    NUMREADSkw = ktl.cache(service='mds', keyword='NUMREADS')
+    SAMPMODEkw = keywords.cache(service='mds', keyword='SAMPMODE')
+    NUMREADSkw = keywords.cache(service='mds', keyword='NUMREADS')
     SAMPMODEkw.write(mode)
     if mode == 3:
         nreads = int(namematch.group(2))
@@ -271,7 +273,7 @@ def take_exposure(exptime=None, coadds=None, sampmode=None, object=None,
     if waitforFCS is True:
         waitfor_FCS()
     
-    GOkw = ktl.cache(service='mds', keyword='GO')
+    GOkw = keywords.cache(service='mds', keyword='GO')
     log.info('Taking exposure')
     GOkw.write(True)
 
@@ -2,6 +2,8 @@ import inspect
 
 from .core import *
 
+__all__ = ['dome_flat_lamps']
+
 
 ##-----------------------------------------------------------------------------
 ## Control Dome Flat Lamps
@@ -37,9 +39,9 @@ def dome_flat_lamps(power, skipprecond=False, skippostcond=False):
     else:
         raise FailedCondition(f'Expecting str, int, or float, got {type(power)}')
 
-    flamp1 = ktl.cache(service='dcs', keyword='flamp1')
-    flamp2 = ktl.cache(service='dcs', keyword='flamp2')
-    fpower = ktl.cache(service='dcs', keyword='fpower')
+    flamp1 = keywords.cache(service='dcs', keyword='flamp1')
+    flamp2 = keywords.cache(service='dcs', keyword='flamp2')
+    fpower = keywords.cache(service='dcs', keyword='fpower')
 
     if power == 'read':
         # Read status
@@ -53,7 +55,7 @@ def dome_flat_lamps(power, skipprecond=False, skippostcond=False):
             flatstate = (f'partial: {flamp1_on} {flamp2_on}', float(fpower.read()))
     else:
         # Set power level and turn both lamps on
-        mosfire_flatspec = ktl.cache(service='mosfire', keyword='flatspec')
+        mosfire_flatspec = keywords.cache(service='mosfire', keyword='flatspec')
 
         if power in [None, 'off']:
             log.info(f'Turning dome flat lamps off')
@@ -4,17 +4,21 @@ from time import sleep
 
 from .core import *
 
+__all__ = ['FCS_ok', 'FCS_in_position', 'waitfor_FCS', 'update_FCS',
+           'park_FCS']
+
 
 ##-----------------------------------------------------------------------------
 ## pre- and post- conditions
 ##-----------------------------------------------------------------------------
+@memoize(services=['mfcs'], watched=[('mfcs', 'ACTIVE'), ('mfcs', 'ENABLE')])
 def FCS_ok():
-    activekw = ktl.cache(keyword='ACTIVE', service='mfcs')
-    active = bool(activekw.read())
+    activekw = keywords.cache(keyword='ACTIVE', service='mfcs')
+    active = bool(activekw.read(bypass=True))
     if active is not True:
         raise FailedCondition(f'FCS is not active')
-    enabledkw = ktl.cache(keyword='ENABLE', service='mfcs')
-    enabled = bool(enabledkw.read())
+    enabledkw = keywords.cache(keyword='ENABLE', service='mfcs')
+    enabled = bool(enabledkw.read(bypass=True))
     if enabled is not True:
         raise FailedCondition(f'FCS is not enabled')
 
@@ -38,15 +42,15 @@ def FCS_in_position(PAthreshold=0.5, ELthreshold=0.5,
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    FCPA_ELkw = ktl.cache(keyword='PA_EL', service='mfcs')
-    FCPA_EL = FCPA_ELkw.read()
+    FCPA_ELkw = keywords.cache(keyword='PA_EL', service='mfcs')
+    FCPA_EL = FCPA_ELkw.read(bypass=True)
     FCSPA = float(FCPA_EL.split()[0])
     FCSEL = float(FCPA_EL.split()[1])
     
-    ROTPPOSNkw = ktl.cache(keyword='ROTPPOSN', service='dcs')
-    ROTPPOSN = float(ROTPPOSNkw.read())
-    ELkw = ktl.cache(keyword='EL', service='dcs')
-    EL = float(ELkw.read())
+    ROTPPOSNkw = keywords.cache(keyword='ROTPPOSN', service='dcs')
+    ROTPPOSN = float(ROTPPOSNkw.read(bypass=True))
+    ELkw = keywords.cache(keyword='EL', service='dcs')
+    EL = float(ELkw.read(bypass=True))
     done = np.isclose(FCSPA, ROTPPOSN, atol=PAthreshold)\
            and np.isclose(FCSEL, EL, atol=ELthreshold)
 
@@ -83,11 +87,14 @@ def waitfor_FCS(timeout=60, PAthreshold=0.5, ELthreshold=0.5, noshim=False,
     log.debug('Waiting for FCS to reach destination')
     if noshim is False:
         sleep(0.5)
-    done = FCS_in_position(PAthreshold=PAthreshold, ELthreshold=ELthreshold)
-    endat = datetime.utcnow() + timedelta(seconds=timeout)
-    while done is False and datetime.utcnow() < endat:
-        sleep(0.5)
-        done = check_FCS(PAthreshold=PAthreshold, ELthreshold=ELthreshold)
+    FCPA_ELkw = keywords.cache(keyword='PA_EL', service='mfcs')
+    ROTPPOSNkw = keywords.cache(keyword='ROTPPOSN', service='dcs')
+    ELkw = keywords.cache(keyword='EL', service='dcs')
+    done = keywords.waitfor(lambda: FCS_in_position(PAthreshold=PAthreshold,
+                                                    ELthreshold=ELthreshold,
+                                                    skipprecond=True,
+                                                    skippostcond=True),
+                            [FCPA_ELkw, ROTPPOSNkw, ELkw], timeout=timeout)
     if done is False:
         log.warning(f'Timeout exceeded on waitfor_FCS to finish')
     
@@ -119,12 +126,12 @@ def update_FCS(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    ROTPPOSNkw = ktl.cache(keyword='ROTPPOSN', service='dcs')
-    ROTPPOSN = float(ROTPPOSNkw.read())
-    ELkw = ktl.cache(keyword='EL', service='dcs')
-    EL = float(ELkw.read())
+    ROTPPOSNkw = keywords.cache(keyword='ROTPPOSN', service='dcs')
+    ROTPPOSN = float(ROTPPOSNkw.read(bypass=True))
+    ELkw = keywords.cache(keyword='EL', service='dcs')
+    EL = float(ELkw.read(bypass=True))
 
-    FCPA_ELkw = ktl.cache(keyword='PA_EL', service='mfcs')
+    FCPA_ELkw = keywords.cache(keyword='PA_EL', service='mfcs')
     FCPA_ELkw.write(f"{ROTPPOSN:.2f} {EL:.2f}")
 
     done = FCS_in_position()
@@ -156,12 +163,12 @@ def park_FCS(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    pa_el = ktl.cache(service='mfcs', keyword='pa_el')
+    pa_el = keywords.cache(service='mfcs', keyword='pa_el')
     pa_el.write("0.0 43.0")
     sleep(1)
     
     log.info('Disable FCS and pupil rotation')
-    fcs_enable = ktl.cache(service='mfcs', keyword='enable')
+    fcs_enable = keywords.cache(service='mfcs', keyword='enable')
     fcs_enable.write(0)
 
 
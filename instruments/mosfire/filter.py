@@ -4,35 +4,38 @@ from time import sleep
 
 from .core import *
 
+__all__ = ['filter1_ok', 'filter2_ok', 'filter', 'is_dark', 'waitfordark',
+           'filter1', 'filter2', 'go_dark', 'quick_dark']
+
 
 ##-----------------------------------------------------------------------------
 ## pre- and post- conditions
 ##-----------------------------------------------------------------------------
+@memoize(services=['mmf1s', 'mosfire'], watched=[('mmf1s', 'STATUS')])
 def filter1_ok(timeout=3):
     '''Commonly used pre- and post- condition to check whether there are errors
     in the filter wheel status.
     '''
     # Check filter wheel 1 status
-    endat = datetime.utcnow() + timedelta(seconds=timeout)
-    mmf1s_status = ktl.cache(service='mmf1s', keyword='STATUS')
-    while datetime.utcnow() < endat and mmf1s_status.read() not in ['OK', 'Moving']:
-        log.debug(f'Filter1 status is "{mmf1s_status.read()}"')
-        sleep(0.5)
-    if mmf1s_status.read() not in ['OK', 'Moving']:
+    mmf1s_status = keywords.cache(service='mmf1s', keyword='STATUS')
+    ok = keywords.waitfor(lambda: mmf1s_status.read(bypass=True) in ['OK', 'Moving'],
+                          [mmf1s_status], timeout=timeout)
+    if ok is False:
+        filter1_status = mmf1s_status.read(bypass=True)
         raise FailedCondition(f'Filter 1 status is not OK: "{filter1_status}"')
 
 
+@memoize(services=['mmf2s', 'mosfire'], watched=[('mmf2s', 'STATUS')])
 def filter2_ok(timeout=3):
     '''Commonly used pre- and post- condition to check whether there are errors
     in the filter wheel status.
     '''
     # Check filter wheel 2 status
-    endat = datetime.utcnow() + timedelta(seconds=timeout)
-    mmf2s_status = ktl.cache(service='mmf2s', keyword='STATUS')
-    while datetime.utcnow() < endat and mmf2s_status.read() not in ['OK', 'Moving']:
-        log.debug(f'Filter2 status is "{mmf2s_status.read()}"')
-        sleep(0.5)
-    if mmf2s_status.read() not in ['OK', 'Moving']:
+    mmf2s_status = keywords.cache(service='mmf2s', keyword='STATUS')
+    ok = keywords.waitfor(lambda: mmf2s_status.read(bypass=True) in ['OK', 'Moving'],
+                          [mmf2s_status], timeout=timeout)
+    if ok is False:
+        filter2_status = mmf2s_status.read(bypass=True)
         raise FailedCondition(f'Filter 2 status is not OK: "{filter2_status}"')
 
 
@@ -53,20 +56,18 @@ def filter(skipprecond=False, skippostcond=False):
     if skipprecond is True:
         log.debug('Skipping pre condition checks')
     else:
-        filter1_ok()
-        filter2_ok()
+        conditions_ok([filter1_ok, filter2_ok])
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    filterkw = ktl.cache(service='mosfire', keyword='FILTER')
+    filterkw = keywords.cache(service='mosfire', keyword='FILTER')
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
     if skippostcond is True:
         log.debug('Skipping post condition checks')
     else:
-        filter1_ok()
-        filter2_ok()
+        conditions_ok([filter1_ok, filter2_ok])
 
     return str(filterkw.read())
 
@@ -84,22 +85,20 @@ def is_dark(skipprecond=False, skippostcond=False):
     if skipprecond is True:
         log.debug('Skipping pre condition checks')
     else:
-        filter1_ok()
-        filter2_ok()
+        conditions_ok([filter1_ok, filter2_ok])
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    filterkw = ktl.cache(service='mosfire', keyword='FILTER')
+    filterkw = keywords.cache(service='mosfire', keyword='FILTER')
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
     if skippostcond is True:
         log.debug('Skipping post condition checks')
     else:
-        filter1_ok()
-        filter2_ok()
+        conditions_ok([filter1_ok, filter2_ok])
 
-    return (str(filterkw.read()) in ['Dark', 'NB1061'])
+    return (str(filterkw.read(bypass=True)) in ['Dark', 'NB1061'])
 
 
 ##-----------------------------------------------------------------------------
@@ -115,17 +114,15 @@ def waitfordark(timeout=60, skipprecond=False, skippostcond=False):
     if skipprecond is True:
         log.debug('Skipping pre condition checks')
     else:
-        filter1_ok()
-        filter2_ok()
+        conditions_ok([filter1_ok, filter2_ok])
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    endat = datetime.utcnow() + timedelta(seconds=timeout)
-    filterkw = ktl.cache(service='mosfire', keyword='FILTER')
+    filterkw = keywords.cache(service='mosfire', keyword='FILTER')
 
-    while datetime.utcnow() < endat and str(filterkw.read()) not in ['Dark', 'NB1061']:
-        sleep(1)
-    if str(filterkw.read()) not in ['Dark', 'NB1061']:
+    dark = keywords.waitfor(lambda: str(filterkw.read(bypass=True)) in ['Dark', 'NB1061'],
+                            [filterkw], timeout=timeout)
+    if dark is False:
         raise TimeoutError('Timed out waiting for instrument to be dark')
 
     ##-------------------------------------------------------------------------
@@ -133,8 +130,7 @@ def waitfordark(timeout=60, skipprecond=False, skippostcond=False):
     if skippostcond is True:
         log.debug('Skipping post condition checks')
     else:
-        filter1_ok()
-        filter2_ok()
+        conditions_ok([filter1_ok, filter2_ok])
 
     return None
 
@@ -156,7 +152,7 @@ def filter1(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    filter1kw = ktl.cache(service='mmf1s', keyword='POSNAME')
+    filter1kw = keywords.cache(service='mmf1s', keyword='POSNAME')
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
@@ -185,7 +181,7 @@ def filter2(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    filter2kw = ktl.cache(service='mmf2s', keyword='POSNAME')
+    filter2kw = keywords.cache(service='mmf2s', keyword='POSNAME')
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
@@ -221,11 +217,11 @@ def _go_dark(wait=True, timeout=30):
                         }
         f1dest, f2dest = filter_combo.get(filter())
         if filter1() != f1dest:
-            f1targkw = ktl.cache(service='mmf1s', keyword='TARGNAME')
+            f1targkw = keywords.cache(service='mmf1s', keyword='TARGNAME')
             f1targkw.write(f1dest)
 
         if filter2() != f2dest:
-            f2targkw = ktl.cache(service='mmf2s', keyword='TARGNAME')
+            f2targkw = keywords.cache(service='mmf2s', keyword='TARGNAME')
             f2targkw.write(f2dest)
 
 
@@ -241,8 +237,7 @@ def go_dark(wait=True, timeout=30,
     if skipprecond is True:
         log.debug('Skipping pre condition checks')
     else:
-        filter1_ok()
-        filter2_ok()
+        conditions_ok([filter1_ok, filter2_ok])
     
     ##-------------------------------------------------------------------------
     ## Script Contents
@@ -259,8 +254,7 @@ def go_dark(wait=True, timeout=30,
     else:
         if wait is True:
             waitfordark(timeout=timeout)
-        filter1_ok()
-        filter2_ok()
+        conditions_ok([filter1_ok, filter2_ok])
 
     return None
 
@@ -5,16 +5,21 @@ from time import sleep
 
 from .core import *
 
+__all__ = ['hatch_ok', 'hatch_unlocked', 'lock_hatch', 'unlock_hatch',
+           'set_hatch', 'open_hatch', 'close_hatch', 'dustcover_ok',
+           'dustcover_unlocked', 'trapdoor_ok', 'trapdoor_unlocked']
+
 
 ##-----------------------------------------------------------------------------
 ## pre- and post- conditions
 ##-----------------------------------------------------------------------------
+@memoize(services=['mmdcs'], watched=[('mmdcs', 'STATUS')])
 def hatch_ok():
     '''Commonly used pre- and post- condition to check whether there are errors
     in the trap door (aka dust cover) status.
     '''
-    mmdcs_statuskw = ktl.cache(keyword='STATUS', service='mmdcs')
-    hatch_status = mmdcs_statuskw.read()
+    mmdcs_statuskw = keywords.cache(keyword='STATUS', service='mmdcs')
+    hatch_status = mmdcs_statuskw.read(bypass=True)
     if hatch_status != 'OK':
         raise FailedCondition(f'Trap door status is {hatch_status}')
 
@@ -24,13 +29,18 @@ def hatch_unlocked():
     keywords are locked.
     '''
 # NOTE --> This is commented out until we fix the keyword config files to reveal the LOCKALL keyword
-#     lockedkw = bool(ktl.cache(service='mmdcs', keyword='LOCKALL'))
+#     lockedkw = bool(keywords.cache(service='mmdcs', keyword='LOCKALL'))
 #     locked = int(lockedkw.read())
 #     if locked == 1:
 #         raise FailedCondition(f'Trap door keywords are locked (LOCKALL=1)')
-    output = subprocess.run(['show', '-terse', '-s', 'mmdcs', 'lockall'], check=True,
-                            stdout=subprocess.PIPE)
-    if (output.stdout.decode().strip() == '0') is False:
+    try:
+        output = subprocess.run(['show', '-terse', '-s', 'mmdcs', 'lockall'], check=True,
+                                stdout=subprocess.PIPE)
+        lockall = output.stdout.decode().strip()
+    except FileNotFoundError:
+        # No KTL command line tools (e.g. running against the simulator)
+        lockall = str(keywords.cache(service='mmdcs', keyword='LOCKALL').read(bypass=True))
+    if (lockall == '0') is False:
         raise FailedCondition('Hatch is locked')
 
 
@@ -134,8 +144,8 @@ def set_hatch(destination, wait=True, timeout=90,
     ## Script Contents
 
     endat = datetime.utcnow() + timedelta(seconds=timeout)
-    targname = ktl.cache(service='mmdcs', keyword='TARGNAME')
-    posname = ktl.cache(service='mmdcs', keyword='POSNAME')
+    targname = keywords.cache(service='mmdcs', keyword='TARGNAME')
+    posname = keywords.cache(service='mmdcs', keyword='POSNAME')
     if posname.read() == destination:
         log.info(f'Hatch is {posname.read()}')
     else:
@@ -143,9 +153,9 @@ def set_hatch(destination, wait=True, timeout=90,
         hatch_unlocked()
         targname.write(destination)
         if wait is True:
-            sleep(10)
-            while posname.read() != destination and datetime.utcnow() < endat:
-                sleep(1)
+            remaining = max((endat - datetime.utcnow()).total_seconds(), 0)
+            keywords.waitfor(lambda: posname.read(bypass=True) == destination, [posname],
+                             timeout=remaining)
 
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
@@ -153,7 +163,7 @@ def set_hatch(destination, wait=True, timeout=90,
         log.debug('Skipping post condition checks')
     else:
         hatch_ok()
-        if posname.read() != destination:
+        if posname.read(bypass=True) != destination:
             raise FailedCondition(f"Hatch failed to reach destination")
 
     return None
@@ -0,0 +1,179 @@
+## Import General Tools
+from datetime import datetime
+from pathlib import Path
+import sqlite3
+import numpy as np
+from astropy.table import Table
+from astropy import coordinates as c
+from astropy import units as u
+
+from .core import *
+from .mask import Mask
+
+__all__ = ['default_index_file', 'MaskLibrary', 'record_calibration']
+
+
+##-------------------------------------------------------------------------
+## Mask Library
+##-------------------------------------------------------------------------
+## An index of the MAGMA mask files under one or more directories, kept in a
+## small SQLite database so that masks can be looked up without parsing every
+## XML file again.  Only new or changed files are parsed when the index is
+## updated.  For example:
+##
+##     library = MaskLibrary()
+##     library.update('/home/mosfire8/CSUmasks')
+##     library.by_name('*COSMOS*')
+##     library.near(c.SkyCoord('10h00m28s +02d12m21s'), radius=30*u.arcmin)
+##     library.needing_calibration('H')
+default_index_file = Path('~/.mosfire/mask_index.sqlite').expanduser()
+
+_schema = ['''CREATE TABLE IF NOT EXISTS masks (
+                  path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER,
+                  name TEXT, ra REAL, dec REAL, pa REAL, priority REAL,
+                  nslits INTEGER, widths BLOB, bars BLOB)''',
+           '''CREATE INDEX IF NOT EXISTS masks_name ON masks (name)''',
+           '''CREATE INDEX IF NOT EXISTS masks_dec ON masks (dec)''',
+           '''CREATE TABLE IF NOT EXISTS calibrations (
+                  name TEXT, filter TEXT, date TEXT)''']
+_columns = ['path', 'name', 'ra', 'dec', 'pa', 'priority', 'nslits']
+
+
+class MaskLibrary(object):
+    '''An index of mask files stored in the SQLite database `index_file`.
+    '''
+    def __init__(self, index_file=default_index_file):
+        self.index_file = Path(index_file).expanduser()
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.index_file))
+        for statement in _schema:
+            self.db.execute(statement)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    ##---------------------------------------------------------------------
+    ## Build the Index
+    def update(self, directory, pattern='**/*.xml'):
+        '''Add new and changed mask files under `directory` to the index and
+        remove any which no longer exist.  Returns the number of files which
+        were parsed.
+        '''
+        directory = Path(directory).expanduser().resolve()
+        prefix = f'{directory}/'
+        known = {path: (mtime, size) for path, mtime, size in self.db.execute(
+                 'SELECT path, mtime, size FROM masks WHERE substr(path, 1, ?) = ?',
+                 (len(prefix), prefix))}
+        found = set()
+        parsed = 0
+        for xmlfile in directory.glob(pattern):
+            stat = xmlfile.stat()
+            path = str(xmlfile)
+            found.add(path)
+            if known.get(path) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            try:
+                mask = Mask(None)
+                mask.read_xml(xmlfile, cache=False)
+                self._store(path, stat, mask)
+                parsed += 1
+            except Exception as e:
+                log.warning(f'Unable to index {xmlfile}: {e}')
+        removed = [(path,) for path in known if path not in found]
+        self.db.executemany('DELETE FROM masks WHERE path = ?', removed)
+        self.db.commit()
+        log.info(f'Indexed {parsed} new or changed masks in {directory}, '
+                 f'removed {len(removed)}')
+        return parsed
+
+    def _store(self, path, stat, mask):
+        widths = np.asarray(mask.slitpos['slitWidthArcsec'], dtype=np.float32)
+        nslits = 0 if mask.scienceTargets is None else len(mask.scienceTargets)
+        self.db.execute('INSERT OR REPLACE INTO masks VALUES (?,?,?,?,?,?,?,?,?,?,?)',
+                        (path, stat.st_mtime_ns, stat.st_size, mask.name,
+                         mask.center.ra.deg, mask.center.dec.deg, mask.PA,
+                         mask.priority, nslits, widths.tobytes(),
+                         mask.bar_positions().astype(np.float32).tobytes()))
+
+    ##---------------------------------------------------------------------
+    ## Queries
+    def _table(self, where='', parameters=()):
+        rows = self.db.execute(f'SELECT {", ".join(_columns)} FROM masks {where} '
+                               'ORDER BY name', parameters).fetchall()
+        return Table(rows=rows if len(rows) > 0 else None, names=_columns,
+                     dtype=[str, str, float, float, float, float, int])
+
+    def all(self):
+        '''Return a table of every mask in the index.
+        '''
+        return self._table()
+
+    def by_name(self, pattern):
+        '''Return a table of the masks whose name matches a (case insensitive)
+        glob style pattern.
+        '''
+        return self._table('WHERE lower(name) GLOB ?', (pattern.lower(),))
+
+    def near(self, coordinate, radius=10*u.arcmin):
+        '''Return a table of the masks centered within `radius` of a
+        coordinate, with their separation from it in arcminutes.
+        '''
+        radius = radius.to(u.deg).value
+        table = self._table('WHERE dec BETWEEN ? AND ?',
+                            (coordinate.dec.deg - radius,
+                             coordinate.dec.deg + radius))
+        centers = c.SkyCoord(table['ra'], table['dec'], unit=u.deg)
+        table['separation'] = coordinate.separation(centers).to(u.arcmin).value
+        table = table[table['separation'] <= radius*60]
+        table.sort('separation')
+        return table
+
+    def bar_positions(self, path):
+        '''Return the positions in mm of bars 1 to 92 for an indexed mask.
+        '''
+        row = self.db.execute('SELECT bars FROM masks WHERE path = ?',
+                              (str(Path(path).expanduser().resolve()),)).fetchone()
+        if row is None:
+            raise KeyError(f'{path} is not in the mask library')
+        return np.frombuffer(row[0], dtype=np.float32).astype(float)
+
+    def slit_widths(self, path):
+        '''Return the width in arcseconds of slits 1 to 46 for an indexed mask.
+        '''
+        row = self.db.execute('SELECT widths FROM masks WHERE path = ?',
+                              (str(Path(path).expanduser().resolve()),)).fetchone()
+        if row is None:
+            raise KeyError(f'{path} is not in the mask library')
+        return np.frombuffer(row[0], dtype=np.float32).astype(float)
+
+    ##---------------------------------------------------------------------
+    ## Calibrations
+    def record_calibration(self, name, filt, date=None):
+        '''Note that calibrations were taken for the named mask in a filter.
+        '''
+        if date is None:
+            date = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+        self.db.execute('INSERT INTO calibrations VALUES (?,?,?)',
+                        (name, filt, date))
+        self.db.commit()
+
+    def needing_calibration(self, filt, since=None):
+        '''Return a table of the masks with no calibrations recorded in a
+        filter (since the date `since`, in YYYY-MM-DD format, if given).
+        '''
+        since = '' if since is None else since
+        return self._table('WHERE name NOT IN (SELECT name FROM calibrations '
+                           'WHERE filter = ? AND date >= ?)', (filt, since))
+
+
+def record_calibration(name, filt):
+    '''Note in the default mask library that calibrations were taken for a
+    mask.  Failures are logged and otherwise ignored.
+    '''
+    try:
+        library = MaskLibrary()
+        library.record_calibration(name, filt)
+        library.close()
+    except Exception as e:
+        log.warning(f'Unable to record calibration in the mask library: {e}')
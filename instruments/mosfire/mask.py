@@ -1,21 +1,76 @@
 ## Import General Tools
 import inspect
+import os
 from datetime import datetime, timedelta
 from time import sleep
 
 from pathlib import Path
 import random
+import warnings
+import pickle
+import hashlib
 import xml.etree.ElementTree as ET
 import numpy as np
 
-from astropy.io import fits
 from astropy.table import Table, Column
 from astropy import coordinates as c
 from astropy import units as u
 from astropy.time import Time
 
+from instruments import images
 from .core import *
 
+__all__ = ['keck', 'J2000', 'TT_minus_UTC', 'julian_date', 'sidereal_time',
+           'parallactic_angle', 'bad_drive_angles', 'bad_angle_tolerance',
+           'predicted_drive_angle', 'is_bad_angle', 'find_runs',
+           'bad_angle_intervals', 'mask_cache_directory', 'cache_version',
+           'slit_columns', 'slit_dtype', 'SlitConfiguration', 'Mask']
+
+
+##-------------------------------------------------------------------------
+## Sidereal Time
+##-------------------------------------------------------------------------
+## Sidereal time is computed here from the IAU 2006 expressions for the Earth
+## rotation angle and GMST, plus the leading terms of the equation of the
+## equinoxes, rather than with `Time.sidereal_time`, which may try to download
+## IERS tables (and stall on hosts with no network).  UT1-UTC (under 0.9 s)
+## is ignored and TT-UTC is fixed, which together contribute less than 15
+## arcsec of hour angle, far below what matters for rotator planning.
+keck = c.EarthLocation.from_geodetic(lon=-155.47833333*u.deg,
+                                     lat=19.82833333*u.deg, height=4160*u.m)
+J2000 = 2451545.0
+TT_minus_UTC = 69.184 # seconds
+
+
+def julian_date(dt):
+    '''Return the (UTC) Julian date of a datetime.
+    '''
+    return J2000 + (dt - datetime(2000, 1, 1, 12)).total_seconds() / 86400
+
+
+def sidereal_time(jd, longitude=0, apparent=True):
+    '''Return the local (apparent or mean) sidereal time in radians, in the
+    range 0 to 2 pi, at the UTC Julian dates `jd` for an east `longitude` in
+    radians.  Works on arrays of dates.
+    '''
+    jd = np.asarray(jd, dtype=float)
+    days = jd - J2000
+    T = (days + TT_minus_UTC/86400) / 36525
+    ERA = 2*np.pi*np.mod(0.7790572732640 + 0.00273781191135448*days + days, 1)
+    arcsec = np.radians(1/3600)
+    GST = ERA + (0.014506 + T*(4612.156534 + T*(1.3915817 + T*(-0.00000044
+                 + T*(-0.000029956 + T*-0.0000000368)))))*arcsec
+    if apparent is True:
+        # Equation of the equinoxes from the largest nutation terms
+        node = np.radians(125.04452 - 1934.136261*T)
+        L_sun = np.radians(280.4665 + 36000.7698*T)
+        L_moon = np.radians(218.3165 + 481267.8813*T)
+        dpsi = -17.20*np.sin(node) - 1.32*np.sin(2*L_sun)\
+               - 0.23*np.sin(2*L_moon) + 0.21*np.sin(2*node)
+        epsilon = np.radians(23.43929111 - 0.013004167*T)
+        GST += dpsi*arcsec*np.cos(epsilon)
+    return np.mod(GST + longitude, 2*np.pi)
+
 
 def parallactic_angle(time, target, location):
     '''
@@ -23,16 +78,313 @@ def parallactic_angle(time, target, location):
     from https://en.wikipedia.org/wiki/Parallactic_angle
     P = arctan( sin(HA) / (cos(dec)*tan(lat) - sin(dec)*cos(HA)) )
     '''
-    HA = time.sidereal_time('apparent') - target.ra.hourangle*u.hourangle
-    tan_p_angles = np.sin(HA.to(u.radian))
+    lst = sidereal_time(time.utc.jd, longitude=location.lon.radian)
+    HA = lst - target.ra.radian
+    tan_p_angles = np.sin(HA)
     tan_p_angles /= np.cos(target.dec.radian)*np.tan(location.lat.radian)\
-                  - np.sin(target.dec.radian)*np.cos(HA.to(u.radian))
-    p_angles = c.Angle(np.arctan(tan_p_angles))
+                  - np.sin(target.dec.radian)*np.cos(HA)
+    p_angles = c.Angle(np.arctan(tan_p_angles)*u.radian)
     # Fudge factor to make it match astroplan
     p_angles -= 180*u.deg
     return p_angles
 
 
+##-------------------------------------------------------------------------
+## Bad Rotator Angles
+##-------------------------------------------------------------------------
+## The physical drive angles of the rotator which should be avoided and how
+## close to them (in degrees) counts as bad.  Angles are predicted on a grid
+## of masks by times with numpy, so a semester of masks and nights can be
+## checked at once:
+##
+##     masks = [Mask(xmlfile) for xmlfile in xmlfiles]
+##     intervals = bad_angle_intervals(masks, ['2020-02-01', '2020-02-02'])
+bad_drive_angles = np.array([0, 180])
+bad_angle_tolerance = 10
+
+
+def predicted_drive_angle(ra, dec, lst, latitude):
+    '''Return the predicted rotator drive angle in degrees (0 to 360) for a
+    target at `ra`, `dec` observed at local sidereal time `lst` from
+    `latitude` (all in radians).  The arguments are broadcast against each
+    other, so a column of targets and a row of times gives a grid of angles.
+    '''
+    HA = lst - ra
+    tan_p_angles = np.sin(HA) / (np.cos(dec)*np.tan(latitude)
+                                 - np.sin(dec)*np.cos(HA))
+    # Fudge factor of 180 to make it match astroplan (see parallactic_angle)
+    p_angles = np.degrees(np.arctan(tan_p_angles)) - 180
+    return np.mod(45 - p_angles, 360)
+
+
+def is_bad_angle(angles, tolerance=bad_angle_tolerance):
+    '''Return a boolean array which is True where a drive angle (in degrees)
+    is within `tolerance` of one of the `bad_drive_angles`.
+    '''
+    angles = np.asarray(angles)
+    distance = np.abs(angles[..., np.newaxis] - bad_drive_angles)
+    return np.any(distance < tolerance, axis=-1)
+
+
+def find_runs(flags):
+    '''Find the runs of True values along each row of a 2D boolean array.
+    Returns the row, the first index and the index after the last of each
+    run, ordered by row and then by index.
+    '''
+    flags = np.atleast_2d(flags)
+    padded = np.zeros((flags.shape[0], flags.shape[1]+2), dtype=np.int8)
+    padded[:, 1:-1] = flags
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+    return rows, starts, ends
+
+
+def _drive_angle_grid(masks, night, nhours=6, step=1):
+    '''Predict the drive angle of each mask every `step` minutes for `nhours`
+    either side of midnight HST on a UT night.  Returns the UT of midnight,
+    the offsets from it in hours and a (masks x times) array of angles.
+    '''
+    midnight = datetime.strptime(f'{night}T10:00:00', '%Y-%m-%dT%H:%M:%S')
+    offsets = np.arange(-nhours*60, nhours*60, step) / 60
+    lst = sidereal_time(julian_date(midnight) + offsets/24,
+                        longitude=keck.lon.radian)
+    ra = np.array([mask.center.ra.radian for mask in masks])
+    dec = np.array([mask.center.dec.radian for mask in masks])
+    angles = predicted_drive_angle(ra[:, np.newaxis], dec[:, np.newaxis],
+                                   lst[np.newaxis, :], keck.lat.radian)
+    return midnight, offsets, angles
+
+
+def bad_angle_intervals(masks, nights, nhours=6, step=1):
+    '''Find when the rotator would be at a bad drive angle for each of a
+    list of masks on each of a list of UT nights (in YYYY-MM-DD format).
+    Times are checked every `step` minutes for `nhours` either side of
+    midnight HST.
+
+    Returns a table with one row per interval giving the mask name, the
+    night, the start and end UT of the interval (as YYYY-MM-DD HH:MM) and its length in minutes.
+    An interval which runs past the last time checked ends at that time.
+    '''
+    usable = [mask for mask in masks if isinstance(mask.center, c.SkyCoord)]
+    for mask in masks:
+        if mask not in usable:
+            log.warning(f'No central coordinate defined for mask "{mask.name}"')
+    rows = []
+    for night in nights:
+        if len(usable) == 0:
+            break
+        midnight, offsets, angles = _drive_angle_grid(usable, night,
+                                                      nhours=nhours, step=step)
+        which, starts, ends = find_runs(is_bad_angle(angles))
+        ends = np.minimum(ends, len(offsets)-1)
+        for i, start, end in zip(which, starts, ends):
+            rows.append((usable[i].name, night,
+                         (midnight + timedelta(hours=offsets[start])).strftime('%Y-%m-%d %H:%M'),
+                         (midnight + timedelta(hours=offsets[end])).strftime('%Y-%m-%d %H:%M'),
+                         (end-start)*step))
+    return Table(rows=rows if len(rows) > 0 else None,
+                 names=['mask', 'night', 'start', 'end', 'minutes'],
+                 dtype=[str, str, str, str, float])
+
+
+##-------------------------------------------------------------------------
+## Mask XML Parsing
+##-------------------------------------------------------------------------
+# Parsed mask files are cached here, one file per mask file path.  Each cache
+# file records the modification time and size of the mask file it was made
+# from (and `cache_version`), and is only used if they still match.
+mask_cache_directory = Path('~/.mosfire/mask_cache').expanduser()
+# Increment when the cached contents change, so old cache files are ignored
+cache_version = 3
+slit_columns = {'slitNumber': int, 'leftBarNumber': int, 'rightBarNumber': int,
+                'leftBarPositionMM': float, 'rightBarPositionMM': float,
+                'centerPositionArcsec': float, 'slitWidthArcsec': float,
+                'target': np.dtype('U80')}
+
+
+def _mask_cache_file(xmlfile):
+    key = hashlib.sha1(str(Path(xmlfile).resolve()).encode()).hexdigest()
+    return mask_cache_directory.joinpath(f'{key}.pickle')
+
+
+def _mask_file_stamp(xmlfile):
+    stat = Path(xmlfile).stat()
+    return (stat.st_mtime_ns, stat.st_size, cache_version)
+
+
+def _xml_columns(element, names=None):
+    '''Collect the attributes of the children of an XML element in to one
+    string array per attribute (in the order they are first seen, unless
+    `names` is given).
+    '''
+    attribs = [child.attrib for child in element]
+    if names is None:
+        names = dict.fromkeys([name for attrib in attribs for name in attrib])
+    return {name: np.array([attrib.get(name, '') for attrib in attribs], dtype=str)
+            for name in names}
+
+
+def _join_columns(columns, names, separator=':'):
+    '''Join string columns element by element, e.g. to form sexagesimal
+    coordinates from their parts.
+    '''
+    result = columns[names[0]]
+    for name in names[1:]:
+        result = np.char.add(np.char.add(result, separator), columns[name])
+    return result
+
+
+##-------------------------------------------------------------------------
+## Slit Configuration
+##-------------------------------------------------------------------------
+slit_dtype = np.dtype([(name, 'U80' if name == 'target' else dtype)
+                       for name, dtype in slit_columns.items()])
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+class SlitConfiguration(object):
+    '''The mechanical slit configuration of a mask: one record per slit, with
+    the numbers and positions of the two bars which form it, held in a numpy
+    structured array.
+
+    Columns are read as for an astropy Table (`slitpos['leftBarPositionMM']`)
+    and indexing with an integer, slice or boolean array returns records.
+    Slits and bars are looked up by number in O(1) with `slit` and `bar`.
+    `to_table` builds (and keeps) an astropy Table for display.
+
+    The array is a read only copy, so that the lookups and the table can
+    never go stale; build a new configuration to change it.  Configurations
+    are equal when their slits are, and are not hashable.
+    '''
+    __slots__ = ['slits', '_slit_index', '_bar_index', '_table']
+    __hash__ = None
+
+    def __init__(self, slits):
+        self.slits = _read_only(np.array(slits, dtype=slit_dtype).ravel())
+        self._slit_index = None
+        self._bar_index = None
+        self._table = None
+
+    @classmethod
+    def from_columns(cls, columns):
+        '''Build from a dict of column name to array.  Columns which are not
+        given are left zero (or empty, for the target).
+        '''
+        lengths = {len(np.atleast_1d(values)) for values in columns.values()}
+        slits = np.zeros(max(lengths, default=0), dtype=slit_dtype)
+        for name, values in columns.items():
+            slits[name] = values
+        return cls(slits)
+
+    @classmethod
+    def from_rows(cls, rows):
+        '''Build from a list of dicts, one per slit.
+        '''
+        return cls(np.array([tuple(row.get(name, 0 if name != 'target' else '')
+                                   for name in slit_dtype.names)
+                             for row in rows], dtype=slit_dtype))
+
+    def __reduce__(self):
+        return (self.__class__, (self.slits,))
+
+    def __len__(self):
+        return len(self.slits)
+
+    def __iter__(self):
+        return iter(self.slits)
+
+    def __getitem__(self, key):
+        return self.slits[key]
+
+    def __eq__(self, other):
+        if not isinstance(other, SlitConfiguration):
+            return NotImplemented
+        return np.array_equal(self.slits, other.slits)
+
+    @property
+    def colnames(self):
+        return list(slit_dtype.names)
+
+    def _changed(self):
+        self._slit_index = None
+        self._bar_index = None
+        self._table = None
+
+    def sort(self, key='slitNumber'):
+        '''Sort the slits in place by a column.
+        '''
+        self.slits = _read_only(self.slits[np.argsort(self.slits[key],
+                                                      kind='stable')])
+        self._changed()
+
+    ##---------------------------------------------------------------------
+    ## Lookups by Number
+    def _build_indices(self):
+        rows = np.arange(len(self.slits))
+        self._slit_index = np.full(48, -1, dtype=int)
+        numbers = self.slits['slitNumber']
+        good = (numbers >= 0) & (numbers < 48)
+        self._slit_index[numbers[good]] = rows[good]
+        self._bar_index = np.full(93, -1, dtype=int)
+        for side in ['right', 'left']:
+            bars = self.slits[f'{side}BarNumber']
+            good = (bars > 0) & (bars <= 92)
+            self._bar_index[bars[good]] = rows[good]
+
+    def slit(self, number):
+        '''Return the record for a slit number.
+        '''
+        if self._slit_index is None:
+            self._build_indices()
+        row = self._slit_index[number] if 0 <= number < 48 else -1
+        if row < 0:
+            raise KeyError(f'Slit {number} is not in the slit configuration')
+        return self.slits[row]
+
+    def bar(self, number):
+        '''Return the record for the slit which a bar number forms.
+        '''
+        if self._bar_index is None:
+            self._build_indices()
+        row = self._bar_index[number] if 0 < number <= 92 else -1
+        if row < 0:
+            raise KeyError(f'Bar {number} is not in the slit configuration')
+        return self.slits[row]
+
+    def bar_positions(self):
+        '''Return the positions in mm of bars 1 to 92 as an array indexed by
+        bar number minus one (NaN for any bar not in the configuration).
+        '''
+        positions = np.full(92, np.nan)
+        for side in ['right', 'left']:
+            bars = self.slits[f'{side}BarNumber']
+            good = (bars > 0) & (bars <= 92)
+            positions[bars[good]-1] = self.slits[f'{side}BarPositionMM'][good]
+        return positions
+
+    ##---------------------------------------------------------------------
+    ## Display
+    def to_table(self):
+        '''Return the slit configuration as an astropy Table.  The table is
+        built the first time it is asked for and shared after that, so copy
+        it before modifying it.
+        '''
+        if self._table is None:
+            self._table = Table(self.slits)
+        return self._table
+
+    def __repr__(self):
+        return repr(self.to_table())
+
+    def __str__(self):
+        return str(self.to_table())
+
+
 ##-------------------------------------------------------------------------
 ## Define Mask Object
 ##-------------------------------------------------------------------------
@@ -107,6 +459,13 @@ class Mask(object):
             raise ValueError(f'Unable to parse "{input}"')
 
 
+    def bar_positions(self):
+        '''Return the positions in mm of bars 1 to 92 as an array indexed by
+        bar number minus one (NaN for any bar not in the mask).
+        '''
+        return self.slitpos.bar_positions()
+
+
     def find_bad_angles(self, night=None, nhours=6, plot=False):
         if self.PA is None:
             log.error("No PA defined for this mask.")
@@ -120,52 +479,37 @@ class Mask(object):
             log.debug(f'Assuming current UT date')
         log.info(f'Checking for bad angles for mask "{self.name}" on {night}')
 
-        keck = c.EarthLocation.of_site('keck')
-        time = Time(f'{night}T10:00:00', format='isot', scale='utc', location=keck) + np.arange(-nhours, nhours, 1/60)*u.hour
-
-        p_angles = parallactic_angle(time, self.center, keck)
-
-        predicted_rotpposn = c.Angle(45*u.deg) - p_angles
-        predicted_rotpposn = predicted_rotpposn.wrap_at(360*u.deg)
-
+        midnight, offsets, angles = _drive_angle_grid([self], night,
+                                                      nhours=nhours)
+        predicted_rotpposn = angles[0]
+        bad = is_bad_angle(predicted_rotpposn)
+        rows, starts, ends = find_runs(bad)
+        ends = np.minimum(ends, len(offsets)-1)
         result = []
-        danger_times = []
-        danger_angles = []
-        last_point_bad = False
-        for t,p in zip(time, predicted_rotpposn):
-            if abs(p.value-180) < 10 or abs(p.value-0) < 10:
-                if last_point_bad is False:
-                    result.append( [t, None] )
-                last_point_bad = True
-                danger_times.append(t)
-                danger_angles.append(p)
-            else:
-                if last_point_bad is True:
-                    result[-1][1] = t
-                    bad_start = result[-1][0].datetime
-                    bad_end = result[-1][1].datetime
-                    msg = (f'  Bad rotator angle for "{self.name}" from '
-                           f'{bad_start.strftime("%H:%M UT")} to '
-                           f'{bad_end.strftime("%H:%M UT")} '
-                           f'({(bad_start-timedelta(hours=10)).strftime("%H:%M HST")} to '
-                           f'{(bad_end-timedelta(hours=10)).strftime("%H:%M HST")})')
-                    log.info(msg)
-                last_point_bad = False
-        danger_times = Time(danger_times)
-        danger_angles = c.Angle(danger_angles)
-    
+        msg = f'No bad rotator angles for "{self.name}"'
+        for start, end in zip(starts, ends):
+            bad_start = midnight + timedelta(hours=offsets[start])
+            bad_end = midnight + timedelta(hours=offsets[end])
+            result.append([Time(bad_start), Time(bad_end)])
+            msg = (f'  Bad rotator angle for "{self.name}" from '
+                   f'{bad_start.strftime("%H:%M UT")} to '
+                   f'{bad_end.strftime("%H:%M UT")} '
+                   f'({(bad_start-timedelta(hours=10)).strftime("%H:%M HST")} to '
+                   f'{(bad_end-timedelta(hours=10)).strftime("%H:%M HST")})')
+            log.info(msg)
+
         if plot is True:
             from matplotlib import pyplot as plt
             from matplotlib import dates
 
+            time = Time(midnight) + offsets*u.hour
             plt.figure(figsize=(18,6))
 
             plt.title(msg)
-            plt.fill_between(danger_times.plot_date, -10, 370, color='red', alpha=0.2)
+            plt.fill_between(time.plot_date, -10, 370, where=bad, color='red', alpha=0.2)
 
-            # plt.plot_date(UTs.plot_date, ROTPPOSNs, 'go')
-            plt.plot_date(time.plot_date, predicted_rotpposn.to(u.deg), 'b-')
-            plt.plot_date(danger_times.plot_date, danger_angles.to(u.deg), 'r-', lw=8)
+            plt.plot_date(time.plot_date, predicted_rotpposn, 'b-')
+            plt.plot_date(time.plot_date, np.where(bad, predicted_rotpposn, np.nan), 'r-', lw=8)
 
             # Format the time axis
             date_formatter = dates.DateFormatter('%H:%M')
@@ -204,33 +548,37 @@ class Mask(object):
         '''Read the FITS header keywords in the first extension.
         '''
         fitsfile = Path(fitsfile).expanduser()
-        hdul = fits.open(fitsfile)
-
-        slits_list = []
-        for slitno in range(1,47,1):
-            leftbar = slitno*2
-            leftmm = float(hdul[0].header.get(f"B{leftbar:02d}POS"))
-            rightbar = slitno*2-1
-            rightmm = float(hdul[0].header.get(f"B{rightbar:02d}POS"))
-            slitcent = (slitno-23) * .490454545
-            width = (leftmm-rightmm) * 0.35795
-            slits_list.append( {'centerPositionArcsec': slitcent,
-                                'leftBarNumber': leftbar,
-                                'leftBarPositionMM': leftmm,
-                                'rightBarNumber': rightbar,
-                                'rightBarPositionMM': rightmm,
-                                'slitNumber': slitno,
-                                'slitWidthArcsec': width,
-                                'target': ''} )
-        self.slitpos = Table(slits_list)
-        self.slitpos.sort('slitNumber')
-
-
-    def read_xml(self, xml):
+        header = images.header(fitsfile)
+
+        slitno = np.arange(1, 47)
+        leftmm = np.array([float(header.get(f"B{bar:02d}POS")) for bar in slitno*2])
+        rightmm = np.array([float(header.get(f"B{bar:02d}POS")) for bar in slitno*2-1])
+        self.slitpos = SlitConfiguration.from_columns({
+                            'slitNumber': slitno,
+                            'leftBarNumber': slitno*2,
+                            'rightBarNumber': slitno*2-1,
+                            'leftBarPositionMM': leftmm,
+                            'rightBarPositionMM': rightmm,
+                            'centerPositionArcsec': (slitno-23) * .490454545,
+                            'slitWidthArcsec': (leftmm-rightmm) * 0.35795})
+
+
+    def read_xml(self, xml, cache=True):
         '''Read an XML mask file generated by MAGMA.
+
+        The parsed contents of a file are cached on disk (see
+        `mask_cache_directory`), so reading the same unchanged file again
+        skips parsing it.  `xmlroot` is not set when the cache is used.
         '''
         xmlfile = Path(xml)
+        cachefile = None
         if xmlfile.exists():
+            if cache is True:
+                cachefile = _mask_cache_file(xmlfile)
+                stamp = _mask_file_stamp(xmlfile)
+                if self._read_cache(cachefile, stamp) is True:
+                    log.debug(f'Read {xmlfile.name} from cache')
+                    return
             tree = ET.parse(xmlfile)
             self.xmlroot = tree.getroot()
         else:
@@ -260,34 +608,54 @@ class Mask(object):
                     else:
                         self.mascgenArguments[el.tag] = el.attrib
             elif child.tag == 'mechanicalSlitConfig':
-                data = [el.attrib for el in child.getchildren()]
-                self.slitpos = Table(names=('slitNumber', 'leftBarNumber',
-                                     'rightBarNumber', 'leftBarPositionMM',
-                                     'rightBarPositionMM', 'centerPositionArcsec',
-                                     'slitWidthArcsec', 'target'),
-                                     dtype=(int, int, int, float, float, float,
-                                            float, np.dtype('U80')))
-                data = [self.slitpos.add_row(el.attrib) for el in child.getchildren()]
-            elif child.tag == 'scienceSlitConfig':
-                data = [el.attrib for el in child.getchildren()]
-                self.scienceTargets = Table(data)
-                ra = [f"{star['targetRaH']}:{star['targetRaM']}:{star['targetRaS']}"
-                      for star in self.scienceTargets]
-                dec = [f"{star['targetDecD']}:{star['targetDecM']}:{star['targetDecS']}"
-                       for star in self.scienceTargets]
-                self.scienceTargets.add_columns([Column(ra, name='RA'),
-                                                 Column(dec, name='DEC')])
-            elif child.tag == 'alignment':
-                data = [el.attrib for el in child.getchildren()]
-                self.alignmentStars = Table(data)
-                ra = [f"{star['targetRaH']}:{star['targetRaM']}:{star['targetRaS']}"
-                      for star in self.alignmentStars]
-                dec = [f"{star['targetDecD']}:{star['targetDecM']}:{star['targetDecS']}"
-                       for star in self.alignmentStars]
-                self.alignmentStars.add_columns([Column(ra, name='RA'),
-                                                 Column(dec, name='DEC')])
+                columns = _xml_columns(child, names=slit_columns.keys())
+                self.slitpos = SlitConfiguration.from_columns(columns)
+            elif child.tag in ['scienceSlitConfig', 'alignment']:
+                columns = _xml_columns(child)
+                if len(columns) > 0:
+                    columns['RA'] = _join_columns(columns, ['targetRaH',
+                                                  'targetRaM', 'targetRaS'])
+                    columns['DEC'] = _join_columns(columns, ['targetDecD',
+                                                   'targetDecM', 'targetDecS'])
+                table = Table(list(columns.values()), names=list(columns.keys()))
+                if child.tag == 'scienceSlitConfig':
+                    self.scienceTargets = table
+                else:
+                    self.alignmentStars = table
             else:
-                mask[child.tag] = [el.attrib for el in child.getchildren()]
+                log.debug(f'Ignoring {child.tag} section of mask XML')
+        if cachefile is not None:
+            self._write_cache(cachefile, stamp)
+
+
+    def _read_cache(self, cachefile, stamp):
+        try:
+            with open(cachefile, 'rb') as FO:
+                cached_stamp, contents = pickle.load(FO)
+        except Exception:
+            return False
+        if cached_stamp != stamp:
+            return False
+        for attribute, value in contents.items():
+            setattr(self, attribute, value)
+        return True
+
+
+    def _write_cache(self, cachefile, stamp):
+        contents = {attribute: getattr(self, attribute) for attribute in
+                    ['name', 'priority', 'PA', 'center_str', 'center',
+                     'mascgenArguments', 'slitpos', 'scienceTargets',
+                     'alignmentStars']}
+        try:
+            cachefile.parent.mkdir(parents=True, exist_ok=True)
+            # Replaces the entry for an older version of the file in one step
+            partial = cachefile.with_suffix(f'.{os.getpid()}.partial')
+            with open(partial, 'wb') as FO:
+                pickle.dump((stamp, contents), FO,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(partial, cachefile)
+        except Exception as e:
+            log.debug(f'Unable to write mask cache {cachefile}: {e}')
 
 
     def build_longslit(self, input):
@@ -320,11 +688,11 @@ class Mask(object):
                                 'slitNumber': slitno,
                                 'slitWidthArcsec': width,
                                 'target': ''} )
-        self.slitpos = Table(slits_list)
+        self.slitpos = SlitConfiguration.from_rows(slits_list)
         self.slitpos.sort('slitNumber')
 
         # Alignment Box
-        slit23 = self.slitpos[self.slitpos['slitNumber'] == 23][0]
+        slit23 = self.slitpos.slit(23)
         leftmm = slit23['leftBarPositionMM'] - 1.65*0.507/0.7
         rightmm = slit23['rightBarPositionMM'] + 1.65*0.507/0.7
         as_dict = {'centerPositionArcsec': 0.0,
@@ -360,21 +728,32 @@ class Mask(object):
                                 'slitNumber': slitno,
                                 'slitWidthArcsec': width,
                                 'target': ''} )
-        self.slitpos = Table(slits_list)
+        self.slitpos = SlitConfiguration.from_rows(slits_list)
 
 
-    def build_random_mask(self, slitwidth=0.7, range=[54,220]):
+    def build_random_mask(self, slitwidth=0.7, limits=[54,220], **kwargs):
         '''Build a Mask with randomly placed, non contiguous slits
+
+        The `range` keyword is a deprecated alias for `limits` (it hid the
+        builtin `range` this function needs).
         '''
+        if 'range' in kwargs:
+            warnings.warn('The range argument of build_random_mask is '
+                          'deprecated, use limits instead',
+                          DeprecationWarning, stacklevel=2)
+            limits = kwargs.pop('range')
+        if len(kwargs) > 0:
+            raise TypeError(f'build_random_mask() got unexpected keyword '
+                            f'arguments {list(kwargs)}')
         self.name = 'RANDOM'
         slits_list = []
         for i in range(46):
             slitno = i+1
-            cent = random.randrange(range[0], range[1])
+            cent = random.randrange(limits[0], limits[1])
             # check if it is the same as the previous slit
             if i > 0:
                 while cent == slits_list[i-1]['centerPositionArcsec']:
-                    cent = random.randrange(54,220)
+                    cent = random.randrange(limits[0], limits[1])
             leftbar = slitno*2
             leftmm = cent + slitwidth*0.507/0.7
             rightbar = slitno*2-1
@@ -388,5 +767,5 @@ class Mask(object):
                                 'slitNumber': slitno,
                                 'slitWidthArcsec': width,
                                 'target': ''} )
-        self.slitpos = Table(slits_list)
+        self.slitpos = SlitConfiguration.from_rows(slits_list)
         
@@ -5,6 +5,9 @@ from pathlib import Path
 
 from .core import *
 
+__all__ = ['outdir', 'set_outdir', 'object', 'set_object', 'observer',
+           'set_observer', 'filename', 'lastfile']
+
 
 ##-----------------------------------------------------------------------------
 ## OUTDIR
@@ -23,7 +26,7 @@ def outdir(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    OUTDIRkw = ktl.cache(service='mds', keyword='OUTDIR')
+    OUTDIRkw = keywords.cache(service='mds', keyword='OUTDIR')
     OUTDIRp = Path(OUTDIRkw.read())
 
     ##-------------------------------------------------------------------------
@@ -59,7 +62,7 @@ def set_outdir(input, skipprecond=False, skippostcond=False):
 
     ##-------------------------------------------------------------------------
     ## Script Contents
-    OUTDIRkw = ktl.cache(service='mds', keyword='OUTDIR')
+    OUTDIRkw = keywords.cache(service='mds', keyword='OUTDIR')
     OUTDIRkw.write(input)
     
     ##-------------------------------------------------------------------------
@@ -90,7 +93,7 @@ def object(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    objectkw = ktl.cache(service='mds', keyword='OBJECT')
+    objectkw = keywords.cache(service='mds', keyword='OBJECT')
     object_str = objectkw.read()
 
     ##-------------------------------------------------------------------------
@@ -120,7 +123,7 @@ def set_object(input, skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    objectkw = ktl.cache(service='mds', keyword='OBJECT')
+    objectkw = keywords.cache(service='mds', keyword='OBJECT')
     objectkw.write(input)
     
     ##-------------------------------------------------------------------------
@@ -151,7 +154,7 @@ def observer(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    observerkw = ktl.cache(service='mosfire', keyword='OBSERVER')
+    observerkw = keywords.cache(service='mosfire', keyword='OBSERVER')
     observer_str = observerkw.read()
 
     ##-------------------------------------------------------------------------
@@ -181,7 +184,7 @@ def set_observer(input, skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    observerkw = ktl.cache(service='mosfire', keyword='OBSERVER')
+    observerkw = keywords.cache(service='mosfire', keyword='OBSERVER')
     observerkw.write(input)
     
     ##-------------------------------------------------------------------------
@@ -213,7 +216,7 @@ def filename(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    filenamekw = ktl.cache(service='mds', keyword='FILENAME')
+    filenamekw = keywords.cache(service='mds', keyword='FILENAME')
     filename_path = Path(filenamekw.read())
     
     ##-------------------------------------------------------------------------
@@ -247,7 +250,7 @@ def lastfile(skipprecond=False, skippostcond=False):
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    lastfilekw = ktl.cache(service='mds', keyword='LASTFILE')
+    lastfilekw = keywords.cache(service='mds', keyword='LASTFILE')
     lastfile_path = Path(lastfilekw.read())
     
     ##-------------------------------------------------------------------------
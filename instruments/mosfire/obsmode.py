@@ -4,26 +4,30 @@ from time import sleep
 
 from .core import *
 
+__all__ = ['grating_shim_ok', 'grating_turret_ok', 'obsmode', 'set_obsmode']
+
 
 ##-----------------------------------------------------------------------------
 ## pre- and post- conditions
 ##-----------------------------------------------------------------------------
+@memoize(services=['mmgss', 'mosfire'], watched=[('mmgss', 'STATUS')])
 def grating_shim_ok():
     '''Commonly used pre- and post- condition to check whether there are errors
     in the grating shim status.
     '''
-    mmgss_statuskw = ktl.cache(service='mmgss', keyword='STATUS')
-    shim_status = mmgss_statuskw.read()
+    mmgss_statuskw = keywords.cache(service='mmgss', keyword='STATUS')
+    shim_status = mmgss_statuskw.read(bypass=True)
     if shim_status not in ['OK', 'Moving']:
         raise FailedCondition(f'Grating shim status is: "{shim_status}"')
 
 
+@memoize(services=['mmgts', 'mosfire'], watched=[('mmgts', 'STATUS')])
 def grating_turret_ok():
     '''Commonly used pre- and post- condition to check whether there are errors
     in the grating turret status.
     '''
-    mmgts_statuskw = ktl.cache(service='mmgts', keyword='STATUS')
-    turret_status = mmgts_statuskw.read()
+    mmgts_statuskw = keywords.cache(service='mmgts', keyword='STATUS')
+    turret_status = mmgts_statuskw.read(bypass=True)
     if turret_status not in ['OK', 'Moving']:
         raise FailedCondition(f'Grating turret status is: "{turret_status}"')
 
@@ -41,12 +45,11 @@ def obsmode(skipprecond=False, skippostcond=False):
     if skipprecond is True:
         log.debug('Skipping pre condition checks')
     else:
-        grating_shim_ok()
-        grating_turret_ok()
+        conditions_ok([grating_shim_ok, grating_turret_ok])
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    obsmodekw = ktl.cache(service='mosfire', keyword='OBSMODE')
+    obsmodekw = keywords.cache(service='mosfire', keyword='OBSMODE')
     obsmode_string = obsmodekw.read()
 
     ##-------------------------------------------------------------------------
@@ -54,8 +57,7 @@ def obsmode(skipprecond=False, skippostcond=False):
     if skippostcond is True:
         log.debug('Skipping post condition checks')
     else:
-        grating_shim_ok()
-        grating_turret_ok()
+        conditions_ok([grating_shim_ok, grating_turret_ok])
 
     return obsmode_string
 
@@ -80,12 +82,11 @@ def _set_obsmode(destination, wait=True, timeout=60,
             raise FailedPreCondition(f"Mode: {mode} is unknown")
         if not filter in filters and filter != 'dark':
             raise FailedCondition(f"Filter: {filter} is unknown")
-        grating_shim_ok()
-        grating_turret_ok()
+        conditions_ok([grating_shim_ok, grating_turret_ok])
     
     ##-------------------------------------------------------------------------
     ## Script Contents
-    setobsmodekw = ktl.cache(service='mosfire', keyword='SETOBSMODE')
+    setobsmodekw = keywords.cache(service='mosfire', keyword='SETOBSMODE')
     log.info(f"Setting mode to {destination}")
     setobsmodekw.write(destination, wait=True)
     
@@ -95,16 +96,12 @@ def _set_obsmode(destination, wait=True, timeout=60,
         log.debug('Skipping post condition checks')
     else:
         if wait is True:
-            endat = datetime.utcnow() + timedelta(seconds=timeout)
-            obsmodekw = ktl.cache(service='mosfire', keyword='OBSMODE')
-            done = (obsmodekw.read().lower() == destination.lower())
-            while not done and datetime.utcnow() < endat:
-                sleep(1)
-                done = (obsmodekw.read().lower() == destination.lower())
+            obsmodekw = keywords.cache(service='mosfire', keyword='OBSMODE')
+            done = keywords.waitfor(lambda: obsmodekw.read(bypass=True).lower() == destination.lower(),
+                                    [obsmodekw], timeout=timeout)
             if not done:
                 raise FailedCondition(f'Timeout exceeded on waiting for mode {destination}')
-        grating_shim_ok()
-        grating_turret_ok()
+        conditions_ok([grating_shim_ok, grating_turret_ok])
 
     return None
 
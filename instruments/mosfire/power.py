@@ -4,6 +4,13 @@ from time import sleep
 
 from .core import *
 
+__all__ = ['power_strip', 'glycol_power', 'csu_controller_power',
+           'csu_drive_power', 'jade2_power', 'computer_power',
+           'lantronix_power', 'Ne_lamp', 'Ar_lamp', 'guider_focus_power',
+           'varian_power', 'guider_camera_power', 'lakeshore_power',
+           'motor_box_power', 'power_supplies_power', 'fcs_controller_power',
+           'dewar_heater_power']
+
 
 ##-----------------------------------------------------------------------------
 ## pre- and post- conditions
@@ -35,11 +42,11 @@ def power_strip(stripno, portno, onoff, skipprecond=False, skippostcond=False):
     ##-------------------------------------------------------------------------
     ## Script Contents
 
-    pwname = ktl.cache(keyword=f'PWNAME{portno:d}', service=f'mp{stripno:d}s')
+    pwname = keywords.cache(keyword=f'PWNAME{portno:d}', service=f'mp{stripno:d}s')
     pwname = pwname.read()
     log.debug(f'Strip {stripno}, port {portno} is {pwname}')
 
-    pwstat = ktl.cache(keyword=f'PWSTAT{portno:d}', service=f'mp{stripno:d}s')
+    pwstat = keywords.cache(keyword=f'PWSTAT{portno:d}', service=f'mp{stripno:d}s')
 
     if onoff in [0, 1]:
         log.debug(f'Setting mp{stripno:d}s PWSTAT{portno:d} to {onoff}')
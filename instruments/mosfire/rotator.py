@@ -7,6 +7,9 @@ from astropy.coordinates import Angle
 
 from .core import *
 
+__all__ = ['safe_angle', 'rotpposn', 'set_rotpposn', 'drive_angle',
+           'set_drive_angle']
+
 
 ##-----------------------------------------------------------------------------
 ## pre- and post- conditions
@@ -38,10 +41,10 @@ def rotpposn(skipprecond=False, skippostcond=False):
 
     ##-------------------------------------------------------------------------
     ## Script Contents
-    ROTMODEkw = ktl.cache(service='dcs', keyword='ROTMODE')
+    ROTMODEkw = keywords.cache(service='dcs', keyword='ROTMODE')
     log.debug(f'Rotator mode is {ROTMODEkw.read()}')
-    ROTPPOSNkw = ktl.cache(service='dcs', keyword='ROTPPOSN')
-    ROTPPOSN = float(ROTPPOSNkw.read())
+    ROTPPOSNkw = keywords.cache(service='dcs', keyword='ROTPPOSN')
+    ROTPPOSN = float(ROTPPOSNkw.read(bypass=True))
     log.debug(f'Drive angle (ROTPPOSN) = {ROTPPOSN:.1f} deg')
     
     ##-------------------------------------------------------------------------
@@ -74,10 +77,10 @@ def _set_rotpposn(rotpposn, skipprecond=False, skippostcond=False):
     ## Script Contents
 
     log.info(f'Setting ROTPPOSN to {rotpposn:.1f}')
-    ROTDESTkw = ktl.cache(service='dcs', keyword='ROTDEST')
+    ROTDESTkw = keywords.cache(service='dcs', keyword='ROTDEST')
     ROTDESTkw.write(float(rotpposn))
     sleep(1)
-    ROTMODEkw = ktl.cache(service='dcs', keyword='ROTMODE')
+    ROTMODEkw = keywords.cache(service='dcs', keyword='ROTMODE')
     ROTMODEkw.write('stationary')
     sleep(1)
     
@@ -87,10 +90,9 @@ def _set_rotpposn(rotpposn, skipprecond=False, skippostcond=False):
         log.debug('Skipping post condition checks')
     else:
         log.info(f'Waiting for rotator to be "in position"')
-        ROTSTATkw = ktl.cache(service='dcs', keyword='ROTSTAT')
-        while str(ROTSTATkw.read()) != 'in position':
-            log.debug(f'ROTSTAT = "{ROTSTATkw.read()}"')
-            sleep(2)
+        ROTSTATkw = keywords.cache(service='dcs', keyword='ROTSTAT')
+        keywords.waitfor(lambda: str(ROTSTATkw.read(bypass=True)) == 'in position',
+                         [ROTSTATkw])
 
     return None
 
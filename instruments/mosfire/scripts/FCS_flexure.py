@@ -1,5 +1,8 @@
 from time import sleep
+import argparse
 
+from ..core import *
+from ..filter import go_dark
 from ..rotator import *
 from ..obsmode import *
 from ..fcs import *
@@ -0,0 +1,68 @@
+#!kpython3
+
+## Import General Tools
+from pathlib import Path
+from glob import glob
+import argparse
+import logging
+
+from ..analysis import trend_bar_positions
+
+
+description = '''Find the CSU bar positions in a set of MOSFIRE images (e.g.
+archived checkout images) and write a table of the found and expected X pixel
+position of every bar in every image, for tracking drifting bars over time.
+'''
+
+##-------------------------------------------------------------------------
+## Find Files
+##-------------------------------------------------------------------------
+def find_files(inputs, pattern='*.fits'):
+    '''Expand a list of files, directories (searched for `pattern`) and glob
+    patterns in to a sorted list of files.
+    '''
+    files = []
+    for input in inputs:
+        p = Path(input).expanduser()
+        if p.is_dir():
+            files.extend(p.glob(pattern))
+        else:
+            files.extend([Path(file) for file in glob(str(p))])
+    return sorted(set(files))
+
+
+##-------------------------------------------------------------------------
+## Main Program
+##-------------------------------------------------------------------------
+def main():
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("-v", "--verbose", dest="verbose",
+        default=False, action="store_true",
+        help="Be verbose! (default = False)")
+    p.add_argument("-o", "--output", dest="output", type=str,
+        default='bar_positions.fits',
+        help="Output table, format from the extension (default = bar_positions.fits)")
+    p.add_argument("-n", "--processes", dest="processes", type=int,
+        default=None, help="Number of worker processes (default = number of CPUs)")
+    p.add_argument("--pattern", dest="pattern", type=str, default='*.fits',
+        help="File pattern to use for directories (default = *.fits)")
+    p.add_argument("--filtersize", dest="filtersize", type=int, default=7,
+        help="Median filter size used to find the bars (default = 7)")
+    p.add_argument('inputs', type=str, nargs='+',
+        help="Image files, directories or glob patterns")
+    args = p.parse_args()
+
+    log = logging.getLogger('MOSFIRE')
+    if args.verbose:
+        log.handlers[0].setLevel(logging.DEBUG)
+
+    files = find_files(args.inputs, pattern=args.pattern)
+    log.info(f'Analyzing {len(files)} files')
+    table = trend_bar_positions(files, filtersize=args.filtersize,
+                                processes=args.processes)
+    log.info(f'Writing {len(table)} rows to {args.output}')
+    table.write(args.output, overwrite=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 
 ## Import General Tools
 import inspect
-from datetime import datetime
+from datetime import datetime, timedelta
 from time import sleep
 from pathlib import Path
 import argparse
@@ -13,7 +13,7 @@ try:
 except ModuleNotFoundError as e:
     pass
 
-from ..mask import Mask
+from ..mask import Mask, bad_angle_intervals
 
 
 description = '''
@@ -23,9 +23,10 @@ description = '''
 ## Parse Command Line Arguments
 ##-------------------------------------------------------------------------
 ## create a parser object for understanding command-line arguments
-p = argparse.ArgumentParser(description='''This script takes an xml file
-containing a mask design (generated by MAGMA) and evaluates when the rotator
-will be in one of MOSFIRE's "bad angles" (e.g. -180, 0, +180) on the rotator.
+p = argparse.ArgumentParser(description='''This script takes one or more xml
+files containing mask designs (generated by MAGMA) and evaluates when the
+rotator will be in one of MOSFIRE's "bad angles" (e.g. -180, 0, +180) on the
+rotator, for one night or for every night in a range.
 ''')
 ## add flags
 p.add_argument("-v", "--verbose", dest="verbose",
@@ -33,12 +34,16 @@ p.add_argument("-v", "--verbose", dest="verbose",
     help="Be verbose! (default = False)")
 p.add_argument("-p", "--plot", dest="plot",
     default=False, action="store_true",
-    help="Generate plot")
+    help="Generate plot (for a single mask and night)")
 ## add options
-p.add_argument('maskfile', type=str,
-               help="The XML file containing your mask")
+p.add_argument('maskfiles', type=str, nargs='+',
+               help="The XML files containing your masks")
 p.add_argument("--night", dest="night", type=str,
     help="The UT night to check (in YYYY-MM-DD format).  Defaults to today.")
+p.add_argument("--start", dest="start", type=str,
+    help="The first UT night of a range to check (in YYYY-MM-DD format).")
+p.add_argument("--end", dest="end", type=str,
+    help="The last UT night of a range to check (in YYYY-MM-DD format).")
 args = p.parse_args()
 
 
@@ -65,10 +70,23 @@ log.addHandler(LogConsoleHandler)
 # log.addHandler(LogFileHandler)
 
 
+##-------------------------------------------------------------------------
+## Nights in a Range
+##-------------------------------------------------------------------------
+def nights_between(start, end):
+    '''Return the UT nights (in YYYY-MM-DD format) from start to end
+    inclusive.
+    '''
+    first = datetime.strptime(start, '%Y-%m-%d')
+    last = datetime.strptime(end, '%Y-%m-%d')
+    return [(first + timedelta(days=i)).strftime('%Y-%m-%d')
+            for i in range((last-first).days + 1)]
+
+
 ##-------------------------------------------------------------------------
 ## Check Mask Angles
 ##-------------------------------------------------------------------------
-def check_mask_angles(maskfile, night=None, plot=False,
+def check_mask_angles(maskfiles, night=None, start=None, end=None, plot=False,
                       skipprecond=False, skippostcond=True):
     this_script_name = inspect.currentframe().f_code.co_name
     log.debug(f"Executing: {this_script_name}")
@@ -78,15 +96,30 @@ def check_mask_angles(maskfile, night=None, plot=False,
     if skipprecond is True:
         log.debug('Skipping pre condition checks')
     else:
-        if night in [None, '']:
-            now = datetime.utcnow()
-            night = now.strftime('%Y-%m-%d')
+        if start not in [None, ''] and end not in [None, ''] and end < start:
+            raise ValueError(f'End night {end} is before start night {start}')
     
     ##-------------------------------------------------------------------------
     ## Script Contents
+    if isinstance(maskfiles, (str, Path)):
+        maskfiles = [maskfiles]
+    if start not in [None, '']:
+        end = start if end in [None, ''] else end
+        nights = nights_between(start, end)
+    elif night not in [None, '']:
+        nights = [night]
+    else:
+        nights = [datetime.utcnow().strftime('%Y-%m-%d')]
 
-    mask = Mask(maskfile)
-    mask.find_bad_angles(night=night, plot=plot)
+    masks = [Mask(maskfile) for maskfile in maskfiles]
+    if plot is True and len(masks) == 1 and len(nights) == 1:
+        masks[0].find_bad_angles(night=nights[0], plot=plot)
+        intervals = None
+    else:
+        log.info(f'Checking {len(masks)} masks on {len(nights)} nights')
+        intervals = bad_angle_intervals(masks, nights)
+        log.info(f'Found {len(intervals)} bad angle intervals')
+        intervals.pprint(max_lines=-1, max_width=-1)
     
     ##-------------------------------------------------------------------------
     ## Post-Condition Checks
@@ -95,6 +128,9 @@ def check_mask_angles(maskfile, night=None, plot=False,
     else:
         pass
 
+    return intervals
+
 
 if __name__ == '__main__':
-    check_mask_angles(args.maskfile, night=args.night, plot=args.plot)
+    check_mask_angles(args.maskfiles, night=args.night, start=args.start,
+                      end=args.end, plot=args.plot)
@@ -0,0 +1,57 @@
+#!kpython3
+
+## Import General Tools
+import sys
+import subprocess
+import argparse
+from time import perf_counter
+import numpy as np
+
+
+description = '''Measure how long the MOSFIRE package takes to import in a
+fresh interpreter, the way command line wrappers pay for it every time they
+are started.
+'''
+
+statements = ['import instruments',
+              'import instruments.mosfire',
+              'from instruments.mosfire import set_exptime',
+              'from instruments.mosfire import setup_mask',
+              'from instruments.mosfire import verify_mask_with_image',
+              'from instruments.mosfire import *',
+              ]
+
+
+##-------------------------------------------------------------------------
+## Time an Import
+##-------------------------------------------------------------------------
+def time_import(statement, repeat=5):
+    '''Run the statement in `repeat` new python processes and return the
+    wall clock time of each run in seconds, less the time taken to start an
+    empty interpreter.
+    '''
+    def run(code):
+        start = perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return perf_counter() - start
+    baseline = np.median([run('pass') for i in range(repeat)])
+    return np.array([run(statement) for i in range(repeat)]) - baseline
+
+
+##-------------------------------------------------------------------------
+## Main Program
+##-------------------------------------------------------------------------
+def main():
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("-n", "--repeat", dest="repeat", type=int, default=5,
+        help="Number of times to run each import (default = 5)")
+    args = p.parse_args()
+
+    for statement in statements:
+        times = time_import(statement, repeat=args.repeat)
+        print(f'{np.median(times)*1000:8.1f} ms (min {times.min()*1000:7.1f})  {statement}')
+
+
+if __name__ == '__main__':
+    main()
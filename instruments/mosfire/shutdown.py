@@ -11,6 +11,8 @@ from .filter import go_dark
 from .domelamps import dome_flat_lamps
 from .power import Ne_lamp, Ar_lamp
 
+__all__ = ['stop_mosfire_software', 'end_of_night_shutdown']
+
 
 ##-----------------------------------------------------------------------------
 ## Stop MOSFIRE Software
@@ -102,7 +104,7 @@ def end_of_night_shutdown(skipprecond=False, skippostcond=False):
     Ne_lamp('off')
     Ar_lamp('off')
     # If MOSFIRE is the current instrument, ensure the dome lamps are off
-    INSTRUMEkw = ktl.cache(service='dcs', keyword='INSTRUME')
+    INSTRUMEkw = keywords.cache(service='dcs', keyword='INSTRUME')
     if INSTRUMEkw.read() == 'MOSFIRE':
         log.info('Turning off dome lamps')
         dome_flat_lamps('off')
@@ -0,0 +1,39 @@
+import pytest
+
+from instruments.mosfire import mask
+
+
+def mask_xml(name='test_mask', ra=('12', '30', '1.5'), dec=('20', '10', '5.0'),
+             pa=35.0):
+    '''Return the text of a small MAGMA style mask file with 46 slits.
+    '''
+    slits = '\n'.join(f'<mechanicalSlit slitNumber="{i}" leftBarNumber="{2*i}" '
+                      f'rightBarNumber="{2*i-1}" '
+                      f'leftBarPositionMM="{140+i/10:.3f}" '
+                      f'rightBarPositionMM="{138+i/10:.3f}" '
+                      f'centerPositionArcsec="{(i-23)*7.6:.2f}" '
+                      f'slitWidthArcsec="0.7" target="t{i}"/>'
+                      for i in range(1, 47))
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<slitConfiguration>
+<maskDescription maskName="{name}" totalPriority="1234.5" maskPA="{pa}" centerRaH="{ra[0]}" centerRaM="{ra[1]}" centerRaS="{ra[2]}" centerDecD="{dec[0]}" centerDecM="{dec[1]}" centerDecS="{dec[2]}"/>
+<mechanicalSlitConfig>
+{slits}
+</mechanicalSlitConfig>
+</slitConfiguration>
+'''
+
+
+@pytest.fixture(autouse=True)
+def mask_cache(tmp_path, monkeypatch):
+    '''Keep the parsed mask cache out of the user's home directory.'''
+    cache = tmp_path / 'mask_cache'
+    monkeypatch.setattr(mask, 'mask_cache_directory', cache)
+    return cache
+
+
+@pytest.fixture
+def xmlfile(tmp_path):
+    path = tmp_path / 'test_mask.xml'
+    path.write_text(mask_xml())
+    return path
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from instruments.mosfire import analysis, core, csu
+from instruments.mosfire.mask import Mask
+
+
+@pytest.fixture
+def transform(monkeypatch, tmp_path):
+    '''Use the packaged transforms rather than any fitted in ~/.mosfire.'''
+    monkeypatch.setattr(core, 'fitted_transforms_file', tmp_path / 'none.txt')
+    yield csu.csu_transform(reload=True)
+    monkeypatch.undo()
+    csu.csu_transform(reload=True)
+
+
+def fake_images(monkeypatch, transform, noise=0.15, offsets={}, missing=[]):
+    '''Make find_bar_positions_from_image return the bar positions predicted
+    by `transform` plus noise for the frames built by this function.
+    '''
+    rng = np.random.default_rng(42)
+    masks = {'open.fits': Mask('OPEN'), 'longslit.fits': Mask('46x0.7')}
+    def find(imagefile, filtersize=7):
+        x = transform.bars_to_pixel(masks[imagefile].bar_positions())
+        x = x + rng.normal(0, noise, size=92)
+        bars = {bar: float(x[bar-1]) for bar in range(1, 93)}
+        for bar, offset in offsets.get(imagefile, {}).items():
+            bars[bar] += offset
+        for bar in missing:
+            bars[bar] = None
+        return bars
+    monkeypatch.setattr(analysis, 'find_bar_positions_from_image', find)
+    return [(mask, imagefile) for imagefile, mask in masks.items()]
+
+
+def test_refit_keeps_noisy_bars(monkeypatch, transform):
+    frames = fake_images(monkeypatch, transform, noise=0.15)
+    fitted, result = analysis.refit_transform(frames)
+    assert np.all(result['used'])
+    assert np.nanmax(np.abs(result['shift'])) < 0.5
+
+
+def test_refit_keeps_bars_within_edge_noise(monkeypatch, transform):
+    # Most bars exact, a few off by less than the edge noise
+    frames = fake_images(monkeypatch, transform, noise=0,
+                         offsets={'open.fits': {3: 0.3, 20: -0.25, 71: 0.4}})
+    fitted, result = analysis.refit_transform(frames)
+    assert np.all(result['used'])
+
+
+def test_refit_rejects_outlier(monkeypatch, transform):
+    frames = fake_images(monkeypatch, transform,
+                         offsets={'longslit.fits': {45: 5.0}})
+    fitted, result = analysis.refit_transform(frames)
+    rejected = result[~result['used']]
+    assert list(rejected['bar']) == [45]
+
+
+def test_refit_without_rejection(monkeypatch, transform):
+    frames = fake_images(monkeypatch, transform,
+                         offsets={'longslit.fits': {45: 5.0}})
+    fitted, result = analysis.refit_transform(frames, iterations=0)
+    assert np.all(result['used'])
+    assert abs(result['residual'][92+44]) > 4
+
+
+def test_refit_needs_bars(monkeypatch, transform):
+    frames = fake_images(monkeypatch, transform, missing=range(1, 93))
+    with pytest.raises(core.FailedCondition):
+        analysis.refit_transform(frames)
+
+
+def write_frame(filename, mask):
+    from astropy.io import fits
+    rng = np.random.default_rng(1)
+    hdu = fits.PrimaryHDU(rng.normal(100, 7, size=(2048, 2048)).astype(np.float32))
+    for bar, position in enumerate(mask.bar_positions(), start=1):
+        hdu.header[f'B{bar:02d}POS'] = position
+    hdu.header['DATE-OBS'] = '2020-02-01'
+    hdu.writeto(filename)
+    return filename
+
+
+def test_trend_bar_positions(tmp_path):
+    files = [write_frame(tmp_path / f'm{i}.fits', Mask('OPEN')) for i in range(2)]
+    files.append(tmp_path / 'missing.fits')
+    table = analysis.trend_bar_positions(files, processes=2)
+    assert len(table) == 2*92
+    assert set(table['file']) == {'m0.fits', 'm1.fits'}
+    assert np.allclose(table['expected'][:92],
+                       csu.csu_transform().bars_to_pixel(Mask('OPEN').bar_positions()))
+
+
+def test_plot_bar_positions_background(tmp_path):
+    data = np.random.default_rng(2).normal(size=(256, 256)).astype(np.float32)
+    bars = {1: 100.0, 2: 120.0, 3: None}
+    ypos = {1: (10, 20), 2: (10, 20), 3: (30, 40)}
+    plotfile = tmp_path / 'bars.png'
+    thread = analysis.plot_bar_positions(data, bars, ypos, plotfile,
+                                         background=True)
+    thread.join(timeout=60)
+    assert plotfile.exists()
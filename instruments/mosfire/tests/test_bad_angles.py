@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from astropy import coordinates as c
+from astropy import units as u
+
+from instruments.mosfire import mask as mask_module
+from instruments.mosfire.mask import Mask
+
+from .conftest import mask_xml
+
+
+keck = c.EarthLocation.from_geodetic(lon=-155.47833333*u.deg,
+                                     lat=19.82833333*u.deg, height=4160*u.m)
+
+
+@pytest.fixture
+def offline_iers():
+    from astropy.utils import iers
+    previous = iers.conf.auto_download
+    iers.conf.auto_download = False
+    yield
+    iers.conf.auto_download = previous
+
+
+def test_find_runs():
+    flags = np.array([[0, 1, 1, 0, 1],
+                      [0, 0, 0, 0, 0],
+                      [1, 1, 1, 1, 1]], dtype=bool)
+    rows, starts, ends = mask_module.find_runs(flags)
+    assert list(zip(rows, starts, ends)) == [(0, 1, 3), (0, 4, 5), (2, 0, 5)]
+
+
+def reference_bad_angles(mask, night, nhours=6):
+    '''The original per point check, using astropy for the sidereal time.'''
+    from astropy.time import Time
+    time = Time(f'{night}T10:00:00', format='isot', scale='utc')\
+           + np.arange(-nhours, nhours, 1/60)*u.hour
+    time.delta_ut1_utc = 0
+    HA = time.sidereal_time('apparent', longitude=keck.lon).radian\
+         - mask.center.ra.radian
+    lat = keck.lat.radian
+    p = np.degrees(np.arctan(np.sin(HA) / (np.cos(mask.center.dec.radian)*np.tan(lat)
+                   - np.sin(mask.center.dec.radian)*np.cos(HA)))) - 180
+    angles = np.mod(45 - p, 360)
+    return np.array([abs(a-180) < 10 or abs(a-0) < 10 for a in angles])
+
+
+@pytest.mark.filterwarnings('ignore')
+def test_bad_angle_intervals(offline_iers, tmp_path):
+    masks = []
+    for name, ra, dec in [('north', ('12', '30', '0'), ('45', '0', '0')),
+                          ('zenith', ('12', '30', '0'), ('19', '50', '0')),
+                          ('south', ('3', '0', '0'), ('-30', '0', '0'))]:
+        path = tmp_path / f'{name}.xml'
+        path.write_text(mask_xml(name=name, ra=ra, dec=dec))
+        masks.append(Mask(str(path)))
+    nights = ['2020-02-01', '2020-05-01']
+    table = mask_module.bad_angle_intervals(masks, nights)
+    assert len(table) > 0
+    for mask in masks:
+        for night in nights:
+            flags = reference_bad_angles(mask, night)
+            rows = table[(table['mask'] == mask.name) & (table['night'] == night)]
+            starts = mask_module.find_runs(flags)[1]
+            midnight = datetime(*map(int, night.split('-')), 10)
+            assert list(rows['start']) == [
+                   (midnight + timedelta(minutes=int(start) - 360)).strftime('%Y-%m-%d %H:%M')
+                   for start in starts]
+            assert sum(rows['minutes']) == pytest.approx(flags.sum(), abs=len(rows))
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from instruments.mosfire import analysis
+
+
+def old_find_bar_edges(horizontal_profile):
+    '''The original single profile fit with an astropy compound model.'''
+    from astropy.modeling import models, fitting
+    fitter = fitting.LevMarLSQFitter()
+    amp1_est = horizontal_profile[horizontal_profile == min(horizontal_profile)][0]
+    mean1_est = np.argmin(horizontal_profile)
+    amp2_est = horizontal_profile[horizontal_profile == max(horizontal_profile)][0]
+    mean2_est = np.argmax(horizontal_profile)
+    g_init1 = models.Gaussian1D(amplitude=amp1_est, mean=mean1_est, stddev=2.)
+    g_init1.amplitude.max = 0
+    g_init2 = models.Gaussian1D(amplitude=amp2_est, mean=mean2_est, stddev=2.)
+    g_init2.amplitude.min = 0
+    fit = fitter(g_init1 + g_init2, range(0, len(horizontal_profile)),
+                 horizontal_profile)
+    if abs(fit.stddev_0.value) < 3 and abs(fit.stddev_1.value) < 3\
+            and fit.amplitude_0.value < -1 and fit.amplitude_1.value > 1\
+            and fit.mean_0.value > fit.mean_1.value:
+        return fit.mean_0.value, fit.mean_1.value
+    return None, None
+
+
+@pytest.fixture
+def profiles():
+    rng = np.random.default_rng(7)
+    x = np.arange(2048)
+    rows = []
+    for i in range(24):
+        x1 = rng.uniform(400, 1800)
+        x2 = x1 - rng.uniform(8, 300)
+        rows.append(-rng.uniform(20, 80)*np.exp(-0.5*((x-x1)/rng.uniform(1, 2))**2)
+                    + rng.uniform(20, 80)*np.exp(-0.5*((x-x2)/rng.uniform(1, 2))**2)
+                    + rng.normal(0, 0.5, len(x)))
+    # Rows which are not a pair of edges: blurred edges, and edges the wrong
+    # way round
+    rows.append(-50*np.exp(-0.5*((x-1000)/6)**2) + 50*np.exp(-0.5*((x-900)/6)**2)
+                + rng.normal(0, 0.5, len(x)))
+    rows.append(50*np.exp(-0.5*((x-1000)/1.5)**2) - 50*np.exp(-0.5*((x-900)/1.5)**2))
+    return np.array(rows)
+
+
+@pytest.mark.filterwarnings('ignore')
+def test_find_all_bar_edges_matches_old_fit(profiles):
+    x1, x2 = analysis.find_all_bar_edges(profiles)
+    for i, profile in enumerate(profiles):
+        expected = old_find_bar_edges(profile)
+        if expected[0] is None:
+            assert np.isnan(x1[i]) and np.isnan(x2[i])
+        else:
+            assert x1[i] == pytest.approx(expected[0], abs=0.01)
+            assert x2[i] == pytest.approx(expected[1], abs=0.01)
+    assert np.isfinite(x1[:24]).all()
+    assert np.isnan(x1[24:]).all()
+
+
+def test_find_bar_edges_single(profiles):
+    x1, x2 = analysis.find_bar_edges(profiles[0])
+    all_x1, all_x2 = analysis.find_all_bar_edges(profiles[:1])
+    assert (x1, x2) == pytest.approx((all_x1[0], all_x2[0]))
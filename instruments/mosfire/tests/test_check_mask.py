@@ -0,0 +1,38 @@
+import importlib
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def check_mask(monkeypatch):
+    # The script parses its command line when it is imported
+    monkeypatch.setattr(sys, 'argv', ['check_mask.py', 'unused.xml'])
+    return importlib.import_module('instruments.mosfire.scripts.check_mask')
+
+
+def test_nights_between(check_mask):
+    assert check_mask.nights_between('2020-02-28', '2020-03-01')\
+           == ['2020-02-28', '2020-02-29', '2020-03-01']
+
+
+@pytest.mark.parametrize('skipprecond', [False, True])
+def test_check_mask_angles_single_file(check_mask, xmlfile, skipprecond):
+    intervals = check_mask.check_mask_angles(xmlfile, night='2020-02-01',
+                                             skipprecond=skipprecond)
+    assert set(intervals['mask']) <= {'test_mask'}
+    assert set(intervals['night']) <= {'2020-02-01'}
+
+
+def test_check_mask_angles_range(check_mask, xmlfile):
+    intervals = check_mask.check_mask_angles([xmlfile, xmlfile],
+                                             start='2020-02-01', end='2020-02-03',
+                                             skipprecond=True)
+    assert len(intervals) > 0
+    assert set(intervals['night']) <= {'2020-02-01', '2020-02-02', '2020-02-03'}
+
+
+def test_check_mask_angles_bad_range(check_mask, xmlfile):
+    with pytest.raises(ValueError):
+        check_mask.check_mask_angles(xmlfile, start='2020-02-03',
+                                     end='2020-02-01')
@@ -0,0 +1,28 @@
+import importlib
+import threading
+
+import pytest
+
+# The package's `checkout` is the function, not the module
+checkout = importlib.import_module('instruments.mosfire.checkout')
+
+
+def analysis_threads():
+    return [thread for thread in threading.enumerate()
+            if thread.name.startswith('analysis') and thread.is_alive()]
+
+
+def test_quick_checkout_shuts_down_worker(simulator, monkeypatch):
+    def unlock_hatch():
+        raise RuntimeError('hatch stuck')
+
+    verified = []
+    monkeypatch.setattr('builtins.input', lambda prompt='': 'y')
+    monkeypatch.setattr(checkout, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(checkout, 'verify_mask_with_image',
+                        lambda mask, imagefile, **kwargs: verified.append(mask.name))
+    monkeypatch.setattr(checkout, 'unlock_hatch', unlock_hatch)
+    with pytest.raises(RuntimeError):
+        checkout.checkout(quick=True)
+    assert len(verified) == 2
+    assert analysis_threads() == []
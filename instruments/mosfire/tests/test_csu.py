@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from instruments import keywords
+from instruments.mosfire import csu, rotator
+from instruments.mosfire.mask import Mask
+
+
+def test_safe_angle_in_default_state(simulator):
+    rotator.safe_angle()
+
+
+def test_execute_mask(simulator):
+    mask = Mask('46x0.7')
+    csu.setup_mask(mask)
+    csu.execute_mask()
+    current = csu.get_current_mask()
+    assert current.name == mask.name
+    assert np.allclose(current.bar_positions(), mask.bar_positions())
+
+
+def test_execute_mask_at_bad_angle(simulator):
+    simulator.set('dcs', 'ROTPPOSN', '0.00')
+    with pytest.raises(csu.FailedCondition):
+        csu.execute_mask()
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+from astropy import coordinates as c
+from astropy import units as u
+
+from instruments.mosfire.library import MaskLibrary
+
+from .conftest import mask_xml
+
+
+@pytest.fixture
+def masks(tmp_path):
+    directory = tmp_path / 'masks'
+    (directory / 'old').mkdir(parents=True)
+    (directory / 'cosmos_1.xml').write_text(mask_xml(name='COSMOS_1'))
+    (directory / 'old' / 'cosmos_2.xml').write_text(
+        mask_xml(name='COSMOS_2', ra=('12', '31', '0'), dec=('20', '0', '0')))
+    (directory / 'goods.xml').write_text(
+        mask_xml(name='GOODS', ra=('3', '32', '0'), dec=('-27', '48', '0')))
+    (directory / 'broken.xml').write_text('<slitConfiguration>')
+    return directory
+
+
+@pytest.fixture
+def library(tmp_path, masks):
+    library = MaskLibrary(tmp_path / 'index' / 'masks.sqlite')
+    library.update(masks)
+    yield library
+    library.close()
+
+
+def test_update_only_parses_changes(library, masks):
+    assert list(library.all()['name']) == ['COSMOS_1', 'COSMOS_2', 'GOODS']
+    assert library.update(masks) == 0
+    changed = masks / 'goods.xml'
+    changed.write_text(mask_xml(name='GOODS_v2', ra=('3', '32', '0'),
+                                dec=('-27', '48', '0')))
+    os.utime(changed, ns=(1, 1))
+    (masks / 'old' / 'cosmos_2.xml').unlink()
+    assert library.update(masks) == 1
+    assert list(library.all()['name']) == ['COSMOS_1', 'GOODS_v2']
+
+
+def test_by_name(library):
+    assert list(library.by_name('cosmos*')['name']) == ['COSMOS_1', 'COSMOS_2']
+    assert len(library.by_name('nothing')) == 0
+
+
+def test_near(library):
+    table = library.near(c.SkyCoord('12h30m01.5s +20d10m05s'), radius=20*u.arcmin)
+    assert list(table['name']) == ['COSMOS_1', 'COSMOS_2']
+    assert table['separation'][0] == pytest.approx(0, abs=1e-3)
+    assert len(library.near(c.SkyCoord('0h0m0s +0d0m0s'))) == 0
+
+
+def test_stored_positions(library, masks):
+    path = masks / 'cosmos_1.xml'
+    bars = library.bar_positions(path)
+    assert len(bars) == 92
+    assert bars[0] == pytest.approx(138.1, abs=1e-4)
+    assert library.slit_widths(path) == pytest.approx(np.full(46, 0.7))
+    with pytest.raises(KeyError):
+        library.bar_positions(masks / 'broken.xml')
+
+
+def test_needing_calibration(library):
+    assert len(library.needing_calibration('H')) == 3
+    library.record_calibration('COSMOS_1', 'H', date='2020-01-01T00:00:00')
+    library.record_calibration('GOODS', 'H')
+    assert list(library.needing_calibration('H')['name']) == ['COSMOS_2']
+    assert list(library.needing_calibration('H', since='2020-06-01')['name'])\
+           == ['COSMOS_1', 'COSMOS_2']
+    assert len(library.needing_calibration('K')) == 3
@@ -0,0 +1,114 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from instruments.mosfire import mask as mask_module
+from instruments.mosfire.mask import Mask, SlitConfiguration
+
+from .conftest import mask_xml
+
+
+def test_read_xml(xmlfile):
+    mask = Mask(str(xmlfile))
+    assert mask.name == 'test_mask'
+    assert mask.PA == 35.0
+    assert len(mask.slitpos) == 46
+    assert mask.slitpos.slit(5)['leftBarNumber'] == 10
+    assert mask.bar_positions()[0] == pytest.approx(138.1)
+
+
+def test_cache_reused(xmlfile, mask_cache):
+    first = Mask(str(xmlfile))
+    assert len(list(mask_cache.iterdir())) == 1
+    second = Mask(str(xmlfile))
+    assert second.xmlroot is None
+    assert second.slitpos == first.slitpos
+    assert second.center.separation(first.center).arcsec < 1e-6
+
+
+def test_cache_one_file_per_mask(xmlfile, mask_cache):
+    Mask(str(xmlfile))
+    cachefile = next(mask_cache.iterdir())
+    # Edit the mask, the old cache entry must be replaced, not added to
+    xmlfile.write_text(mask_xml(name='edited_mask'))
+    stat = xmlfile.stat()
+    os.utime(xmlfile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    edited = Mask(str(xmlfile))
+    assert edited.name == 'edited_mask'
+    assert edited.xmlroot is not None
+    assert list(mask_cache.iterdir()) == [cachefile]
+    assert Mask(str(xmlfile)).name == 'edited_mask'
+
+
+def test_stale_cache_ignored(xmlfile, mask_cache):
+    Mask(str(xmlfile))
+    cachefile = next(mask_cache.iterdir())
+    with open(cachefile, 'rb') as FO:
+        stamp, contents = pickle.load(FO)
+    contents['name'] = 'stale'
+    with open(cachefile, 'wb') as FO:
+        pickle.dump(((0, 0, mask_module.cache_version), contents), FO)
+    assert Mask(str(xmlfile)).name == 'test_mask'
+
+
+def test_slit_configuration():
+    mask = Mask('3x0.7')
+    slitpos = mask.slitpos
+    assert isinstance(slitpos, SlitConfiguration)
+    assert list(slitpos['slitNumber']) == [22, 23, 24]
+    assert slitpos.bar(46)['slitNumber'] == 23
+    assert slitpos.slit(23)['leftBarNumber'] == 46
+    with pytest.raises(KeyError):
+        slitpos.slit(1)
+    with pytest.raises(KeyError):
+        slitpos.bar(93)
+    # Table style access still works
+    row = slitpos[slitpos['slitNumber'] == 23][0]
+    assert row['rightBarNumber'] == 45
+    assert [slit['slitNumber'] for slit in slitpos] == [22, 23, 24]
+    table = slitpos.to_table()
+    assert table is slitpos.to_table()
+    assert table.colnames == slitpos.colnames
+    positions = mask.bar_positions()
+    assert np.isnan(positions[0])
+    assert positions[45] == pytest.approx(slitpos.slit(23)['leftBarPositionMM'])
+    assert pickle.loads(pickle.dumps(slitpos)) == slitpos
+
+
+def test_slit_configuration_is_read_only():
+    slits = Mask('3x0.7').slitpos.slits.copy()
+    slitpos = SlitConfiguration(slits)
+    slitpos.slit(23)
+    with pytest.raises(ValueError):
+        slitpos['slitNumber'][0] = 5
+    with pytest.raises(ValueError):
+        slitpos.slit(23)['slitNumber'] = 5
+    # Changing the array it was built from does not change it
+    slits['slitNumber'][1] = 5
+    assert slitpos.slit(23)['slitNumber'] == 23
+    slitpos.sort('leftBarNumber')
+    assert not slitpos.slits.flags.writeable
+    with pytest.raises(TypeError):
+        hash(slitpos)
+
+
+def test_open_and_random_masks():
+    assert len(Mask('OPEN').slitpos) == 46
+    random = Mask('RANDOM')
+    slitpos = random.slitpos
+    assert len(slitpos) == 46
+    assert np.all(slitpos['leftBarPositionMM'] > slitpos['rightBarPositionMM'])
+    centers = slitpos['centerPositionArcsec']
+    assert np.all((centers >= 54) & (centers < 220))
+
+
+def test_random_mask_range_is_deprecated():
+    mask = Mask(None)
+    with pytest.warns(DeprecationWarning):
+        mask.build_random_mask(range=[100, 110])
+    centers = mask.slitpos['centerPositionArcsec']
+    assert np.all((centers >= 100) & (centers < 110))
+    with pytest.raises(TypeError):
+        mask.build_random_mask(width=1)
@@ -0,0 +1,51 @@
+import ast
+import importlib
+from pathlib import Path
+
+import pytest
+
+import instruments.mosfire as mosfire
+
+
+def defined_names(submodule):
+    '''The public functions, classes and constants defined in a submodule.'''
+    source = Path(mosfire.__file__).with_name(f'{submodule}.py').read_text()
+    names = []
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            names.append(node.name)
+        elif isinstance(node, ast.Assign):
+            names += [target.id for target in node.targets
+                      if isinstance(target, ast.Name)]
+    return [name for name in names if not name.startswith('_')]
+
+
+@pytest.mark.parametrize('submodule', mosfire.submodules)
+def test_all_matches_module(submodule):
+    module = importlib.import_module(f'instruments.mosfire.{submodule}')
+    assert mosfire._names[submodule] == module.__all__
+    for name in module.__all__:
+        assert hasattr(module, name)
+    missing = set(defined_names(submodule)) - set(module.__all__)
+    assert missing == set()
+
+
+def test_lazy_lookup():
+    assert mosfire._locations['band_rows'] == 'analysis'
+    assert mosfire._locations['set_exptime'] == 'detector'
+    from instruments.mosfire import band_rows, set_exptime
+    from instruments.mosfire.analysis import band_rows as analysis_band_rows
+    assert band_rows is analysis_band_rows
+
+
+def test_functions_win_over_modules():
+    from instruments.mosfire import filter1_ok, grating_shim_ok
+    assert callable(mosfire.filter)
+    assert callable(mosfire.obsmode)
+
+
+def test_libraries():
+    from instruments.mosfire import fits, models
+    from astropy.io import fits as astropy_fits
+    assert fits is astropy_fits
+    assert 'plt' in mosfire.__all__
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from instruments.mosfire import mask as mask_module
+
+
+@pytest.fixture
+def offline_iers():
+    from astropy.utils import iers
+    previous = iers.conf.auto_download
+    iers.conf.auto_download = False
+    yield
+    iers.conf.auto_download = previous
+
+
+@pytest.mark.filterwarnings('ignore')
+@pytest.mark.parametrize('kind, apparent, tolerance', [('apparent', True, 1),
+                                                       ('mean', False, 0.01)])
+def test_sidereal_time_matches_astropy(offline_iers, kind, apparent, tolerance):
+    from astropy.time import Time
+    jd = mask_module.J2000 + np.linspace(6300, 11000, 200)
+    time = Time(jd, format='jd', scale='utc')
+    # sidereal_time does not know about UT1 - UTC
+    time.delta_ut1_utc = 0
+    expected = time.sidereal_time(kind, longitude=mask_module.keck.lon).radian
+    result = mask_module.sidereal_time(jd, longitude=mask_module.keck.lon.radian,
+                                       apparent=apparent)
+    assert np.all((result >= 0) & (result < 2*np.pi))
+    difference = np.angle(np.exp(1j*(result - expected)))
+    assert np.degrees(np.abs(difference)).max()*3600 < tolerance
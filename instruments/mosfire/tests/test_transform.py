@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from instruments.mosfire import core, csu
+
+
+@pytest.fixture
+def transform():
+    rotation = np.radians(0.3)
+    Aphysical_to_pixel = np.array([[-7.3*np.cos(rotation), 7.3*np.sin(rotation), 0],
+                                   [-44.5*np.sin(rotation), -44.5*np.cos(rotation), 0],
+                                   [2070., 2070., 1]])
+    return csu.CSUTransform(np.linalg.inv(Aphysical_to_pixel), Aphysical_to_pixel)
+
+
+def test_transform_round_trip(transform):
+    rng = np.random.default_rng(3)
+    physical = np.column_stack([rng.uniform(0, 270, 50), rng.integers(1, 47, 50)])
+    pixels = transform.to_pixel(physical)
+    assert pixels.shape == (50, 2)
+    np.testing.assert_allclose(transform.to_physical(pixels), physical, atol=1e-9)
+    # Same as the homogeneous matrix multiply in the original code
+    padded = np.hstack([physical, np.ones((50, 1))])
+    np.testing.assert_allclose(pixels, (padded @ transform.Aphysical_to_pixel)[:,:2])
+
+
+def test_transform_fit(transform):
+    rng = np.random.default_rng(4)
+    physical = np.column_stack([rng.uniform(0, 270, 92), np.repeat(np.arange(1, 47), 2)])
+    pixels = transform.to_pixel(physical)
+    fitted = csu.CSUTransform.fit(pixels, physical)
+    np.testing.assert_allclose(fitted.Aphysical_to_pixel,
+                               transform.Aphysical_to_pixel, atol=1e-8)
+    np.testing.assert_allclose(fitted.to_physical(pixels), physical, atol=1e-8)
+    again = csu.CSUTransform(**fitted.to_dict())
+    np.testing.assert_array_equal(again.Apixel_to_physical, fitted.Apixel_to_physical)
+
+
+def test_bars_to_pixel(transform):
+    positions = np.linspace(100, 180, 92)
+    slits = np.repeat(np.arange(1, 47), 2)
+    expected = transform.to_pixel(np.column_stack([positions, slits]))[:,0]
+    np.testing.assert_allclose(transform.bars_to_pixel(positions), expected)
+
+
+def test_module_functions_use_default_transform(monkeypatch, tmp_path):
+    monkeypatch.setattr(core, 'fitted_transforms_file', tmp_path / 'none.txt')
+    csu.csu_transform(reload=True)
+    physical = np.array([[137.2, 12], [140.0, 30]])
+    pixels = csu.physical_to_pixel(physical)
+    assert pixels.shape == (2, 1, 2)
+    np.testing.assert_allclose(csu.pixel_to_physical(pixels[:,0,:])[:,0,:],
+                               physical, atol=1e-6)
+    monkeypatch.undo()
+    csu.csu_transform(reload=True)
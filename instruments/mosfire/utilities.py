@@ -4,6 +4,8 @@ from pathlib import Path
 from .core import *
 from .mask import Mask
 
+__all__ = ['generate_mask_starlist']
+
 
 ##-----------------------------------------------------------------------------
 ## Generate Mask Starlist
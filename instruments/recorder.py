@@ -0,0 +1,199 @@
+import sys
+import threading
+from pathlib import Path
+from time import sleep, monotonic, time
+import numpy as np
+from astropy.table import Table
+
+from instruments import keywords
+
+
+##-------------------------------------------------------------------------
+## Keyword Call Recorder
+##-------------------------------------------------------------------------
+## Every read, write and wait made through the keyword registry can be logged
+## in to a fixed size ring buffer, so that the oldest calls are dropped once
+## it is full.  Use `start()` and `stop()` to turn recording on and off:
+##
+##     from instruments import recorder
+##     rec = recorder.start()
+##     checkout()
+##     recorder.stop()
+##     print(recorder.summary(rec.records()))
+##     rec.save('checkout.npz')
+columns = [('op', 'U5'),
+           ('service', 'U16'),
+           ('keyword', 'U48'),
+           ('value', 'U64'),
+           ('start', 'f8'),
+           ('duration', 'f8'),
+           ('caller', 'U48')]
+
+# Frames from these files are skipped when working out who made a call
+_internal = [str(Path(__file__).parent.joinpath(f'{module}.py'))
+             for module in ['keywords', 'expressions', 'conditions', 'recorder']]\
+            + [threading.__file__]
+
+
+def caller():
+    '''Return the name of the function outside the keyword layer which made
+    the current call.
+    '''
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename not in _internal and 'concurrent' not in code.co_filename:
+            return code.co_name
+        frame = frame.f_back
+    return ''
+
+
+class Recorder(object):
+    '''A ring buffer of keyword calls.
+    '''
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=columns)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def caller(self):
+        '''Return the name of the function outside the keyword layer which
+        made the current call (see `caller`).
+        '''
+        return caller()
+
+    def record(self, op, service, keyword, value, start, duration, function=None):
+        if function is None:
+            function = caller()
+        with self.lock:
+            i = self.count % self.capacity
+            self.count += 1
+            self.buffer[i] = (op, service, keyword, str(value)[:64], start,
+                              duration, function)
+
+    def records(self):
+        '''Return the recorded calls, oldest first, as a numpy structured array.
+        '''
+        with self.lock:
+            if self.count <= self.capacity:
+                return self.buffer[:self.count].copy()
+            i = self.count % self.capacity
+            return np.concatenate([self.buffer[i:], self.buffer[:i]])
+
+    def save(self, filename):
+        '''Write the recorded calls to a compressed numpy file with one array
+        per column.
+        '''
+        records = self.records()
+        np.savez_compressed(filename, **{name: records[name] for name,dtype in columns})
+
+    @classmethod
+    def load(cls, filename):
+        '''Read a file written by `save` in to a new Recorder.
+        '''
+        data = np.load(filename)
+        recorder = cls(capacity=max(len(data['op']), 1))
+        for name,dtype in columns:
+            recorder.buffer[name][:len(data[name])] = data[name]
+        recorder.count = len(data['op'])
+        return recorder
+
+
+def start(capacity=100000):
+    '''Start recording all keyword calls in a new `Recorder` and return it.
+    '''
+    recorder = Recorder(capacity=capacity)
+    keywords.recorder = recorder
+    return recorder
+
+
+def stop():
+    '''Stop recording keyword calls.  Returns the recorder which was in use.
+    '''
+    recorder = keywords.recorder
+    keywords.recorder = None
+    return recorder
+
+
+##-------------------------------------------------------------------------
+## Analysis
+##-------------------------------------------------------------------------
+def latency_histogram(records, service, keyword, op='read', bins=20):
+    '''Return a histogram (counts, bin_edges) of the durations of one kind of
+    call to one keyword.
+    '''
+    match = (records['op'] == op)\
+            & (np.char.lower(records['service']) == service.lower())\
+            & (np.char.upper(records['keyword']) == keyword.upper())
+    return np.histogram(records['duration'][match], bins=bins)
+
+
+def summary(records):
+    '''Return a table with the number of calls and the total, median, 95th
+    percentile and maximum duration of each kind of call to each keyword,
+    sorted so the keywords which take the most time come first.
+    '''
+    names = np.char.add(np.char.add(records['op'], ' '),
+                        np.char.add(np.char.add(records['service'], '.'),
+                                    records['keyword']))
+    groups, index = np.unique(names, return_inverse=True)
+    rows = []
+    for i,group in enumerate(groups):
+        durations = records['duration'][index == i]
+        op, name = group.split(' ', 1)
+        service, keyword = name.split('.', 1)
+        rows.append((op, service, keyword, len(durations), durations.sum(),
+                     np.median(durations), np.percentile(durations, 95),
+                     durations.max()))
+    table = Table(rows=rows, names=['op', 'service', 'keyword', 'count', 'total',
+                                    'median', 'p95', 'max'],
+                  dtype=[str, str, str, int, float, float, float, float])
+    table.sort('total', reverse=True)
+    return table
+
+
+##-------------------------------------------------------------------------
+## Replay
+##-------------------------------------------------------------------------
+def replay(records, speedup=1, timing={}, state={}):
+    '''Replay a recorded session against a fresh keyword simulator.
+
+    Reads and writes are issued in the order and (divided by `speedup`) at
+    the times they were originally made.  The simulated mechanisms also run
+    `speedup` times faster than real time.  If `speedup` is None, calls are
+    issued back to back with no delay and the mechanisms run at the default
+    speed.  Waits are not repeated, their time is covered by the delays
+    between the recorded calls.
+
+    The backend in use before the replay is restored afterwards.  Returns a
+    `Recorder` holding the calls made during the replay.
+    '''
+    from instruments import simulated_ktl
+    records = np.sort(records, order='start')
+    previous = keywords.backend()
+    simulated_ktl.reset(speedup=1 if speedup is None else speedup,
+                        timing=timing, state=state)
+    keywords.set_backend(simulated_ktl)
+    recorder = start(capacity=max(len(records), 1))
+    try:
+        t0 = monotonic()
+        for record in records:
+            if speedup is not None:
+                delay = (record['start'] - records['start'][0])/speedup\
+                        - (monotonic() - t0)
+                if delay > 0:
+                    sleep(delay)
+            handle = keywords.cache(service=str(record['service']),
+                                    keyword=str(record['keyword']))
+            if record['op'] == 'read':
+                handle.read()
+            elif record['op'] == 'write':
+                handle.write(str(record['value']))
+    finally:
+        stop()
+        keywords.set_backend(previous)
+    return recorder
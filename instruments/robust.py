@@ -0,0 +1,83 @@
+import numpy as np
+
+
+##-------------------------------------------------------------------------
+## Robust Statistics
+##-------------------------------------------------------------------------
+## Sigma clipped statistics for quick look image checks.  The work is done in
+## float32 (sums are accumulated in float64) and medians are found with
+## `np.partition`, which is O(n), rather than by sorting the data on every
+## iteration.  For example, the MOSFIRE dark difference test:
+##
+##     mean, median, std = robust.sigma_clipped_stats(difference, sigma=2)
+##     table = robust.channel_stats(difference, nchannels=32, sigma=2)
+dtype = np.float32
+
+
+def median(values):
+    '''Return the median of a 1D array using a partial sort.  The array is
+    partitioned in place.
+    '''
+    n = len(values)
+    if n == 0:
+        return np.nan
+    k = n // 2
+    if n % 2 == 1:
+        values.partition(k)
+        return float(values[k])
+    values.partition([k-1, k])
+    return (float(values[k-1]) + float(values[k])) / 2
+
+
+def sigma_clip(data, sigma=3, sigma_lower=None, sigma_upper=None, maxiters=5,
+               sample=1):
+    '''Iteratively reject values more than `sigma_lower` standard deviations
+    below or `sigma_upper` above the median (both default to `sigma`) until
+    no more are rejected or `maxiters` iterations have been done.  Non finite
+    values are always rejected.
+
+    Only every `sample`th value of the (flattened) data is used.  Returns the
+    surviving values as a float32 array.
+    '''
+    sigma_lower = sigma if sigma_lower is None else sigma_lower
+    sigma_upper = sigma if sigma_upper is None else sigma_upper
+    values = np.asarray(data).ravel()[::sample].astype(dtype)
+    values = values[np.isfinite(values)]
+    for i in range(maxiters):
+        center = median(values)
+        std = values.std(dtype=np.float64)
+        keep = (values >= center - sigma_lower*std)\
+               & (values <= center + sigma_upper*std)
+        if np.all(keep):
+            break
+        values = values[keep]
+    return values
+
+
+def sigma_clipped_stats(data, sigma=3, sigma_lower=None, sigma_upper=None,
+                        maxiters=5, sample=1):
+    '''Return the mean, median and standard deviation of the data after sigma
+    clipping.  Arguments are as for `sigma_clip` and match those of
+    `astropy.stats.sigma_clipped_stats`.
+    '''
+    values = sigma_clip(data, sigma=sigma, sigma_lower=sigma_lower,
+                        sigma_upper=sigma_upper, maxiters=maxiters,
+                        sample=sample)
+    if len(values) == 0:
+        return np.nan, np.nan, np.nan
+    return (float(values.mean(dtype=np.float64)), median(values),
+            float(values.std(dtype=np.float64)))
+
+
+def channel_stats(data, nchannels=32, axis=1, **kwargs):
+    '''Split a 2D image in to `nchannels` equal stripes along `axis` (e.g.
+    the readout channels of an H2RG detector) and return the sigma clipped
+    mean, median and standard deviation of each as a structured array.
+    Keyword arguments are passed to `sigma_clipped_stats`.
+    '''
+    stripes = np.array_split(np.asarray(data), nchannels, axis=axis)
+    result = np.zeros(nchannels, dtype=[('channel', int), ('mean', float),
+                                        ('median', float), ('std', float)])
+    for i,stripe in enumerate(stripes):
+        result[i] = (i, *sigma_clipped_stats(stripe, **kwargs))
+    return result
@@ -0,0 +1,545 @@
+# ktl simulator package
+'''A stand in for the `ktl` package which simulates the MOSFIRE and HIRES
+keyword services well enough for the instrument scripts to run without a
+connection to the real instrument.
+
+Keywords hold their values as ascii strings, the way `ktl` returns them.
+Writes to the keywords which command a mechanism (CSU, filter wheels, hatch,
+rotator, obsmode, MDS exposures, HIRES hiccd exposures, iodine cell) start a
+model of that mechanism which updates the status keywords over time, with
+durations taken from `timing` (in seconds).  All durations are divided by
+`speedup`, so a whole script can be run faster than real time.  If `images`
+is True, MOSFIRE exposures also write a FITS file of simulated dark noise to
+the file named by LASTFILE, so scripts which open the last image can run.
+
+To use the simulator in place of KTL:
+
+    from instruments import keywords, simulated_ktl
+    simulated_ktl.reset(speedup=10)
+    keywords.set_backend(simulated_ktl)
+'''
+import re
+import threading
+from time import sleep, monotonic
+
+
+##-------------------------------------------------------------------------
+## Default Timing (seconds of simulated time)
+##-------------------------------------------------------------------------
+default_timing = {'write': 0.05,        # round trip for a keyword write
+                  'csu_setup': 4,        # SETUPNAME to setup complete
+                  'csu_overhead': 10,    # fixed part of a CSU move
+                  'csu_bar_speed': 2.0,  # bar speed in mm/s
+                  'csu_init_bar': 30,    # initialize one bar
+                  'csu_init_all': 300,   # initialize all bars
+                  'filter_move': 15,     # one filter wheel move
+                  'grating_move': 30,    # grating shim and turret move
+                  'hatch_move': 20,      # open or close the dust cover
+                  'rotator_speed': 1.0,  # rotator slew rate in deg/s
+                  'rotator_settle': 2,   # settling time after a slew
+                  'mds_overhead': 2,     # MDS setup before the first read
+                  'mds_read': 1.45,      # one read of the H2RG
+                  'hiccd_setup': 1,      # EXPOSE to EXPOSIP
+                  'hiccd_readout': 80,   # unbinned readout (scales with binning)
+                  'iodine_move': 10,     # iodine cell in or out
+                  }
+
+
+def default_state():
+    '''Return the keyword values the simulator starts with: MOSFIRE selected,
+    dark, hatch closed, OPEN mask on the CSU, the rotator at a safe drive
+    angle, and HIRES idle.
+    '''
+    state = {
+        ('dcs', 'INSTRUME'): 'MOSFIRE',
+        ('dcs', 'ROTPPOSN'): '90.00',
+        ('dcs', 'ROTDEST'): '90.00',
+        ('dcs', 'ROTMODE'): 'stationary',
+        ('dcs', 'ROTSTAT'): 'in position',
+        ('dcs', 'EL'): '45.00',
+        ('dcs', 'FLAMP1'): 'off',
+        ('dcs', 'FLAMP2'): 'off',
+        ('dcs', 'FPOWER'): '0.0',
+        ('mcsus', 'CSUREADY'): '2',
+        ('mcsus', 'CSUSTAT'): 'Move complete.',
+        ('mcsus', 'MASKNAME'): 'OPEN',
+        ('mcsus', 'SETUPNAME'): 'OPEN',
+        ('mcsus', 'SETUPINIT'): '0',
+        ('mcsus', 'SETUPGO'): '0',
+        ('mcsus', 'INITBAR'): '0',
+        ('mfcs', 'ACTIVE'): 'True',
+        ('mfcs', 'ENABLE'): 'True',
+        ('mfcs', 'PA_EL'): '0.00 45.00',
+        ('mmdcs', 'STATUS'): 'OK',
+        ('mmdcs', 'POSNAME'): 'Closed',
+        ('mmdcs', 'TARGNAME'): 'Closed',
+        ('mmdcs', 'LOCKALL'): '0',
+        ('mmf1s', 'STATUS'): 'OK',
+        ('mmf1s', 'POSNAME'): 'NB1061',
+        ('mmf1s', 'TARGNAME'): 'NB1061',
+        ('mmf2s', 'STATUS'): 'OK',
+        ('mmf2s', 'POSNAME'): 'Ks',
+        ('mmf2s', 'TARGNAME'): 'Ks',
+        ('mmgss', 'STATUS'): 'OK',
+        ('mmgts', 'STATUS'): 'OK',
+        ('mmprs', 'STATUS'): 'OK',
+        ('mosfire', 'FILTER'): 'Dark',
+        ('mosfire', 'OBSMODE'): 'dark-imaging',
+        ('mosfire', 'SETOBSMODE'): 'dark-imaging',
+        ('mosfire', 'OBSERVER'): 'Simulator',
+        ('mosfire', 'SCRIPTRUN'): '0',
+        ('mosfire', 'FLATSPEC'): '0',
+        ('mds', 'ITIME'): '2000',
+        ('mds', 'COADDS'): '1',
+        ('mds', 'SAMPMODE'): '2',
+        ('mds', 'NUMREADS'): '16',
+        ('mds', 'OBJECT'): '',
+        ('mds', 'OUTDIR'): '/tmp/mosfire',
+        ('mds', 'FILENAME'): '/tmp/mosfire/m000101_0001.fits',
+        ('mds', 'LASTFILE'): '/tmp/mosfire/m000101_0000.fits',
+        ('mds', 'FRAMENUM'): '1',
+        ('mds', 'GO'): '0',
+        ('mds', 'IMAGEDONE'): '1',
+        ('mds', 'READY'): '1',
+        ('hiccd', 'OBSERVIP'): 'false',
+        ('hiccd', 'EXPOSIP'): 'false',
+        ('hiccd', 'WCRATE'): 'false',
+        ('hiccd', 'EXPOSE'): 'false',
+        ('hiccd', 'AUTOSHUT'): 'true',
+        ('hiccd', 'TTIME'): '1',
+        ('hiccd', 'OBSTYPE'): 'Object',
+        ('hiccd', 'BINNING'): '\n\tXbinning 1\n\tYbinning 1',
+        ('hiccd', 'WINDOW'): '\n\tchip number 0\n\txstart 0\n\tystart 0'
+                             '\n\txlen 6144\n\tylen 4096',
+        ('hiccd', 'CCDGAIN'): 'low',
+        ('hiccd', 'CCDSPEED'): 'normal',
+        ('hiccd', 'OUTDIR'): '/tmp/hires',
+        ('hiccd', 'OUTFILE'): 'hires',
+        ('hiccd', 'LFRAMENO'): '0',
+        ('hires', 'TEMPIOD1'): '65.00',
+        ('hires', 'TEMPIOD2'): '50.00',
+        ('hires', 'MONIODT'): '1',
+        ('hires', 'SETIODT'): '50',
+        ('hires', 'IODHEAT'): 'on',
+        ('hires', 'IODCELL'): 'out',
+    }
+    # CSU bars start in the OPEN mask positions
+    for barnum in range(1,93,1):
+        position = '270.400' if barnum % 2 == 0 else '4.000'
+        state[('mcsus', f'B{barnum:02d}POS')] = position
+        state[('mcsus', f'B{barnum:02d}TARG')] = position
+        state[('mcsus', f'B{barnum:02d}STAT')] = 'OK'
+    # Power strips
+    for stripno in range(1,4,1):
+        for portno in range(1,9,1):
+            state[(f'mp{stripno:d}s', f'PWNAME{portno:d}')] = f'Port {portno:d}'
+            state[(f'mp{stripno:d}s', f'PWSTAT{portno:d}')] = '0'
+    return state
+
+
+def _key(service, keyword):
+    return (service.lower(), keyword.upper())
+
+
+def _typed(value):
+    '''Interpret an ascii keyword value as a bool or number if possible, the
+    way KTL expressions compare values.
+    '''
+    if value.strip().lower() in ['true', 'yes', 'on']:
+        return True
+    if value.strip().lower() in ['false', 'no', 'off']:
+        return False
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+##-------------------------------------------------------------------------
+## Simulated Keyword
+##-------------------------------------------------------------------------
+class Keyword(object):
+    '''Simulated version of a `ktl` keyword object.
+    '''
+    def __init__(self, simulator, service, keyword):
+        self.simulator = simulator
+        self.service = service
+        self.name = keyword
+        self.callbacks = []
+        self.monitored = False
+
+    def __repr__(self):
+        return f'<simulated keyword {self.service}.{self.name}>'
+
+    def __getitem__(self, item):
+        if item == 'ascii':
+            return self.simulator.get(self.service, self.name)
+        if item == 'binary':
+            return _typed(self.simulator.get(self.service, self.name))
+        if item == 'populated':
+            return True
+        if item == 'monitored':
+            return self.monitored
+        raise KeyError(item)
+
+    def read(self, binary=False, wait=True, timeout=None):
+        value = self.simulator.get(self.service, self.name)
+        return _typed(value) if binary is True else value
+
+    def write(self, value, wait=True, timeout=None):
+        self.simulator.write(self.service, self.name, value)
+        if wait is True:
+            self.simulator.sleep(self.simulator.timing['write'])
+
+    def monitor(self, start=True, prime=True, wait=True):
+        self.monitored = start
+
+    def callback(self, function, remove=False):
+        if remove is True:
+            if function in self.callbacks:
+                self.callbacks.remove(function)
+        elif function not in self.callbacks:
+            self.callbacks.append(function)
+
+    def waitFor(self, expression, timeout=None):
+        return waitFor(f'(${self.service}.{self.name} {expression})',
+                       timeout=timeout)
+
+
+##-------------------------------------------------------------------------
+## Simulator
+##-------------------------------------------------------------------------
+class Simulator(object):
+    '''Holds the simulated keyword values and the mechanism models which
+    change them.
+    '''
+    def __init__(self, speedup=1, timing={}, state={}, images=True):
+        self.speedup = speedup
+        self.images = images
+        self.timing = dict(default_timing)
+        self.timing.update(timing)
+        self.values = default_state()
+        for (service, keyword), value in state.items():
+            self.values[_key(service, keyword)] = str(value)
+        self.keywords = {}
+        self.moves = {}
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.models = {('mcsus', 'SETUPNAME'): self.csu_setup,
+                       ('mcsus', 'SETUPGO'): self.csu_execute,
+                       ('mcsus', 'INITBAR'): self.csu_initialize,
+                       ('mmf1s', 'TARGNAME'): self.filter_move,
+                       ('mmf2s', 'TARGNAME'): self.filter_move,
+                       ('mmdcs', 'TARGNAME'): self.hatch_move,
+                       ('dcs', 'ROTDEST'): self.rotator_slew,
+                       ('mosfire', 'SETOBSMODE'): self.obsmode_move,
+                       ('mds', 'GO'): self.mds_exposure,
+                       ('hiccd', 'EXPOSE'): self.hiccd_exposure,
+                       ('hiccd', 'BINNING'): self.hiccd_binning,
+                       ('hires', 'IODCELL'): self.iodine_move,
+                       }
+
+    def cache(self, service, keyword):
+        key = _key(service, keyword)
+        with self.lock:
+            if key not in self.keywords:
+                self.keywords[key] = Keyword(self, *key)
+            return self.keywords[key]
+
+    def sleep(self, seconds):
+        sleep(seconds/self.speedup)
+
+    def get(self, service, keyword):
+        with self.lock:
+            return self.values.get(_key(service, keyword), '')
+
+    def set(self, service, keyword, value):
+        '''Change a keyword value and broadcast it to any callbacks.
+        '''
+        key = _key(service, keyword)
+        with self.lock:
+            self.values[key] = str(value)
+            handle = self.keywords.get(key)
+            self.changed.notify_all()
+        if handle is not None and handle.monitored is True:
+            for function in list(handle.callbacks):
+                function(handle)
+
+    def write(self, service, keyword, value):
+        key = _key(service, keyword)
+        self.set(*key, value)
+        model = self.models.get(key)
+        if model is not None:
+            model(*key, str(value))
+
+    def after(self, seconds, function, *args):
+        '''Call `function(*args)` after the given amount of simulated time.
+        '''
+        timer = threading.Timer(seconds/self.speedup, function, args=args)
+        timer.daemon = True
+        timer.start()
+
+    def start_move(self, mechanism):
+        '''Begin a new move of a mechanism.  Returns a function which tells
+        whether that move is still the current one, so that steps scheduled
+        for a move which has been superseded can be skipped.
+        '''
+        with self.lock:
+            move = self.moves.get(mechanism, 0) + 1
+            self.moves[mechanism] = move
+        return lambda: self.moves.get(mechanism) == move
+
+    def sequence(self, mechanism, steps):
+        '''Run a list of (delay, {keyword: value}) steps for one mechanism,
+        where each delay is relative to the previous step.  A step may also
+        be a (delay, function) pair, in which case the function is called.
+        '''
+        current = self.start_move(mechanism)
+        elapsed = 0
+        for delay, updates in steps:
+            elapsed += delay
+            def apply(updates=updates):
+                if not current():
+                    return
+                if callable(updates):
+                    updates()
+                    return
+                for (service, keyword), value in updates.items():
+                    self.set(service, keyword, value)
+            if elapsed == 0:
+                apply()
+            else:
+                self.after(elapsed, apply)
+
+    ##---------------------------------------------------------------------
+    ## MOSFIRE Models
+    ##---------------------------------------------------------------------
+    def csu_setup(self, service, keyword, value):
+        bars = [barnum for barnum in range(1,93,1)
+                if self.get('mcsus', f'B{barnum:02d}TARG') != self.get('mcsus', f'B{barnum:02d}POS')]
+        half = self.timing['csu_setup']/2
+        self.sequence('csu', [
+            (0, {('mcsus', 'CSUREADY'): '4', ('mcsus', 'CSUSTAT'): 'Creating Group.'}),
+            (half, {('mcsus', 'CSUSTAT'): 'Adding bars to Group.'}),
+            (half, {**{('mcsus', f'B{barnum:02d}STAT'): 'SETUP' for barnum in bars},
+                    ('mcsus', 'CSUREADY'): '2',
+                    ('mcsus', 'CSUSTAT'): 'Setup complete.'}),
+            ])
+
+    def csu_execute(self, service, keyword, value):
+        final = {('mcsus', 'CSUREADY'): '2',
+                 ('mcsus', 'CSUSTAT'): 'Move complete.',
+                 ('mcsus', 'MASKNAME'): self.get('mcsus', 'SETUPNAME')}
+        distance = 0
+        for barnum in range(1,93,1):
+            target = self.get('mcsus', f'B{barnum:02d}TARG')
+            position = self.get('mcsus', f'B{barnum:02d}POS')
+            distance = max(distance, abs(float(target) - float(position)))
+            final[('mcsus', f'B{barnum:02d}POS')] = target
+            final[('mcsus', f'B{barnum:02d}STAT')] = 'OK'
+        duration = self.timing['csu_overhead'] + distance/self.timing['csu_bar_speed']
+        self.sequence('csu', [
+            (0, {('mcsus', 'CSUREADY'): '3', ('mcsus', 'CSUSTAT'): 'Moving.'}),
+            (duration, final),
+            ])
+
+    def csu_initialize(self, service, keyword, value):
+        bar = int(float(value))
+        if bar == 0:
+            duration = self.timing['csu_init_all']
+        else:
+            duration = self.timing['csu_init_bar']
+        self.sequence('csu', [
+            (0, {('mcsus', 'CSUREADY'): '3', ('mcsus', 'CSUSTAT'): 'Initializing.'}),
+            (duration, {('mcsus', 'CSUREADY'): '1',
+                        ('mcsus', 'CSUSTAT'): 'Initialization complete.'}),
+            ])
+
+    def _filter(self, filter1, filter2):
+        if filter1 == 'Open':
+            return filter2
+        if filter2 == 'Open':
+            return filter1
+        return 'Dark'
+
+    def filter_move(self, service, keyword, value):
+        other = {'mmf1s': 'mmf2s', 'mmf2s': 'mmf1s'}[service]
+        filters = {service: value, other: self.get(other, 'POSNAME')}
+        self.sequence(service, [
+            (0, {(service, 'STATUS'): 'Moving'}),
+            (self.timing['filter_move'],
+             {(service, 'POSNAME'): value,
+              (service, 'STATUS'): 'OK',
+              ('mosfire', 'FILTER'): self._filter(filters['mmf1s'], filters['mmf2s'])}),
+            ])
+
+    def hatch_move(self, service, keyword, value):
+        self.sequence('hatch', [
+            (0, {('mmdcs', 'STATUS'): 'Moving', ('mmdcs', 'POSNAME'): 'Moving'}),
+            (self.timing['hatch_move'],
+             {('mmdcs', 'STATUS'): 'OK', ('mmdcs', 'POSNAME'): value}),
+            ])
+
+    def rotator_slew(self, service, keyword, value):
+        distance = abs(float(value) - float(self.get('dcs', 'ROTPPOSN')))
+        duration = distance/self.timing['rotator_speed']
+        self.sequence('rotator', [
+            (0, {('dcs', 'ROTSTAT'): 'slewing'}),
+            (duration, {('dcs', 'ROTPPOSN'): f'{float(value):.2f}',
+                        ('dcs', 'ROTSTAT'): 'settling'}),
+            (self.timing['rotator_settle'], {('dcs', 'ROTSTAT'): 'in position'}),
+            ])
+
+    def obsmode_move(self, service, keyword, value):
+        filt, mode = value.split('-')
+        if filt.lower() == 'dark':
+            filter1, filter2 = 'NB1061', self.get('mmf2s', 'POSNAME')
+            if filter2 == 'Open': filter2 = 'Ks'
+        elif filt.lower() == 'nb1061':
+            filter1, filter2 = 'NB1061', 'Open'
+        elif filt in ['J2', 'J3', 'H1', 'H2']:
+            filter1, filter2 = filt, 'Open'
+        else:
+            filter1, filter2 = 'Open', filt
+        duration = max(self.timing['filter_move'], self.timing['grating_move'])
+        self.start_move('mmf1s')
+        self.start_move('mmf2s')
+        self.sequence('obsmode', [
+            (0, {('mmf1s', 'STATUS'): 'Moving', ('mmf2s', 'STATUS'): 'Moving',
+                 ('mmgss', 'STATUS'): 'Moving', ('mmgts', 'STATUS'): 'Moving'}),
+            (duration, {('mmf1s', 'POSNAME'): filter1, ('mmf1s', 'TARGNAME'): filter1,
+                        ('mmf2s', 'POSNAME'): filter2, ('mmf2s', 'TARGNAME'): filter2,
+                        ('mmf1s', 'STATUS'): 'OK', ('mmf2s', 'STATUS'): 'OK',
+                        ('mmgss', 'STATUS'): 'OK', ('mmgts', 'STATUS'): 'OK',
+                        ('mosfire', 'FILTER'): self._filter(filter1, filter2),
+                        ('mosfire', 'OBSMODE'): value}),
+            ])
+
+    def mds_exposure(self, service, keyword, value):
+        if _typed(value) in [0, False]:
+            return
+        itime = float(self.get('mds', 'ITIME'))/1000
+        coadds = int(float(self.get('mds', 'COADDS')))
+        if int(float(self.get('mds', 'SAMPMODE'))) == 3:
+            nreads = 2*int(float(self.get('mds', 'NUMREADS')))
+        else:
+            nreads = 2
+        duration = self.timing['mds_overhead']\
+                   + coadds*(itime + nreads*self.timing['mds_read'])
+        framenum = int(self.get('mds', 'FRAMENUM'))
+        outdir = self.get('mds', 'OUTDIR')
+        filename = f'{outdir}/m000101_{framenum:04d}.fits'
+        nextname = f'{outdir}/m000101_{framenum+1:04d}.fits'
+        def finish():
+            # The file must exist before IMAGEDONE says it does
+            self.write_image(filename)
+            for (service, keyword), value in {
+                    ('mds', 'LASTFILE'): filename,
+                    ('mds', 'FILENAME'): nextname,
+                    ('mds', 'FRAMENUM'): str(framenum+1),
+                    ('mds', 'IMAGEDONE'): '1',
+                    ('mds', 'READY'): '1'}.items():
+                self.set(service, keyword, value)
+        self.sequence('mds', [
+            (0, {('mds', 'READY'): '0', ('mds', 'IMAGEDONE'): '0'}),
+            (duration, finish),
+            ])
+
+    def write_image(self, filename):
+        '''Write a simulated MOSFIRE dark frame (read noise only).
+        '''
+        if self.images is False:
+            return
+        import numpy as np
+        from astropy.io import fits
+        from pathlib import Path
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        data = np.random.normal(0, 7.4, size=(2048,2048)).astype(np.float32)
+        hdu = fits.PrimaryHDU(data)
+        hdu.header['OBJECT'] = self.get('mds', 'OBJECT')
+        hdu.header['ITIME'] = float(self.get('mds', 'ITIME'))
+        hdu.header['COADDS'] = int(float(self.get('mds', 'COADDS')))
+        hdu.header['FILTER'] = self.get('mosfire', 'FILTER')
+        hdu.header['MASKNAME'] = self.get('mcsus', 'MASKNAME')
+        hdu.writeto(filename, overwrite=True)
+
+    ##---------------------------------------------------------------------
+    ## HIRES Models
+    ##---------------------------------------------------------------------
+    def hiccd_binning(self, service, keyword, value):
+        binning = re.findall(r'\d+', value)
+        if len(binning) == 2:
+            self.set('hiccd', 'BINNING',
+                     f'\n\tXbinning {binning[0]}\n\tYbinning {binning[1]}')
+
+    def hiccd_exposure(self, service, keyword, value):
+        if _typed(value) is not True:
+            return
+        ttime = float(self.get('hiccd', 'TTIME'))
+        binning = [int(b) for b in re.findall(r'\d+', self.get('hiccd', 'BINNING'))]
+        readout = self.timing['hiccd_readout']/max(binning[0]*binning[1], 1)
+        frameno = int(self.get('hiccd', 'LFRAMENO'))
+        self.sequence('hiccd', [
+            (0, {('hiccd', 'OBSERVIP'): 'true'}),
+            (self.timing['hiccd_setup'], {('hiccd', 'EXPOSIP'): 'true'}),
+            (ttime, {('hiccd', 'EXPOSIP'): 'false', ('hiccd', 'WCRATE'): 'true'}),
+            (readout, {('hiccd', 'WCRATE'): 'false',
+                       ('hiccd', 'LFRAMENO'): str(frameno+1),
+                       ('hiccd', 'EXPOSE'): 'false',
+                       ('hiccd', 'OBSERVIP'): 'false'}),
+            ])
+
+    def iodine_move(self, service, keyword, value):
+        self.sequence('iodine', [
+            (0, {('hires', 'IODCELL'): 'moving'}),
+            (self.timing['iodine_move'], {('hires', 'IODCELL'): value}),
+            ])
+
+
+simulator = Simulator()
+
+
+def reset(speedup=1, timing={}, state={}, images=True):
+    '''Start over with a new simulator.  `timing` and `state` override
+    entries in `default_timing` and `default_state()`.
+    '''
+    global simulator
+    simulator = Simulator(speedup=speedup, timing=timing, state=state,
+                          images=images)
+    return simulator
+
+
+##-------------------------------------------------------------------------
+## ktl Interface
+##-------------------------------------------------------------------------
+def cache(service=None, keyword=None):
+    return simulator.cache(service, keyword)
+
+
+class Expression(object):
+    '''Simulated version of `ktl.Expression`.  Keyword references are written
+    as `$service.KEYWORD`, e.g. `($hiccd.OBSERVIP == False)`.
+    '''
+    def __init__(self, expression):
+        from instruments.expressions import compile_expression
+        self.predicate = compile_expression(expression)
+
+    def evaluate(self):
+        return self.predicate([simulator.get(*key) for key in self.predicate.keywords])
+
+    def wait(self, timeout=None):
+        endat = None if timeout is None else monotonic() + timeout
+        with simulator.changed:
+            while not self.evaluate():
+                if endat is None:
+                    simulator.changed.wait()
+                else:
+                    remaining = endat - monotonic()
+                    if remaining <= 0:
+                        return False
+                    simulator.changed.wait(remaining)
+        return True
+
+
+def waitFor(expression, timeout=None):
+    return Expression(expression).wait(timeout=timeout)
@@ -0,0 +1,79 @@
+import pytest
+
+from instruments import conditions, keywords
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(conditions, 'freshness', 60)
+
+
+def counting_condition(fail=False):
+    calls = []
+
+    @conditions.memoize(services=['mds'])
+    def condition(value=1):
+        calls.append(value)
+        if fail:
+            raise ValueError('nope')
+    return condition, calls
+
+
+def test_evaluate_collects_failures():
+    def good():
+        pass
+
+    def bad():
+        raise ValueError('bad')
+
+    failures = conditions.evaluate([good, bad, good])
+    assert len(failures) == 1
+    assert failures[0][0] is bad
+    assert isinstance(failures[0][1], ValueError)
+
+
+def test_pass_is_remembered(fresh):
+    condition, calls = counting_condition()
+    condition()
+    condition()
+    assert calls == [1]
+    condition(value=2)
+    assert calls == [1, 2]
+
+
+def test_failure_is_not_remembered(fresh):
+    condition, calls = counting_condition(fail=True)
+    for i in range(2):
+        with pytest.raises(ValueError):
+            condition()
+    assert calls == [1, 1]
+
+
+def test_write_forgets_pass(fresh):
+    condition, calls = counting_condition()
+    condition()
+    keywords.cache(service='mds', keyword='ITIME').write('3000')
+    condition()
+    assert calls == [1, 1]
+    # Writes to other services leave it alone
+    keywords.cache(service='mcsus', keyword='MASKNAME').write('other')
+    condition()
+    assert calls == [1, 1]
+
+
+def test_invalidate(fresh):
+    condition, calls = counting_condition()
+    condition()
+    condition.invalidate()
+    condition()
+    conditions.invalidate_all()
+    condition()
+    assert calls == [1, 1, 1]
+
+
+def test_freshness_zero_disables(monkeypatch):
+    monkeypatch.setattr(conditions, 'freshness', 0)
+    condition, calls = counting_condition()
+    condition()
+    condition()
+    assert calls == [1, 1]
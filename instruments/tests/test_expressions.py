@@ -0,0 +1,88 @@
+import functools
+import threading
+
+import pytest
+
+from instruments import expressions, keywords
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('True', True), ('yes', True), (' on ', True), ('false', False),
+    ('NO', False), ('2.5', 2.5), ('3', 3.0), ('Move complete. ', 'Move complete.'),
+])
+def test_typed(value, expected):
+    assert expressions.typed(value) == expected
+
+
+def test_predicate_keywords_and_values():
+    predicate = expressions.Predicate('($mds.ITIME > 1000) and ($mcsus.CSUREADY == 2)'
+                                      ' or ($mds.ITIME == 0)')
+    assert predicate.keywords == [('mds', 'ITIME'), ('mcsus', 'CSUREADY')]
+    assert predicate(['2000', '2']) is True
+    assert predicate(['2000', '1']) is False
+    assert predicate(['0', '1']) is True
+
+
+def test_bare_words_compare_as_literals():
+    predicate = expressions.Predicate('$hiccd.OBSERVIP == True and $dcs.ROTMODE == stationary')
+    assert predicate(['true', 'stationary']) is True
+    assert predicate(['false', 'stationary']) is False
+
+
+@pytest.mark.parametrize('expression', [
+    "__import__('os').system('true')",
+    '$mds.ITIME.__class__',
+    'len($mds.ITIME)',
+    '[x for x in $mds.ITIME]',
+    'lambda: 1',
+])
+def test_whitelist(expression):
+    with pytest.raises(SyntaxError):
+        expressions.Predicate(expression)
+
+
+def test_compile_cache():
+    expression = '$mds.ITIME >= 5'
+    assert expressions.compile_expression(expression)\
+           is expressions.compile_expression(expression)
+
+
+def test_expression_evaluate(simulator):
+    assert expressions.Expression('$mds.ITIME == 2000').evaluate() is True
+    assert expressions.Expression('$mds.ITIME == 3000').evaluate() is False
+
+
+def test_wait_for_broadcast(simulator):
+    timer = threading.Timer(0.1, simulator.set, args=('mds', 'ITIME', '3000'))
+    timer.start()
+    try:
+        assert expressions.waitFor('$mds.ITIME == 3000', timeout=5) is True
+    finally:
+        timer.cancel()
+    assert expressions.Expression('$mds.ITIME == 4000').wait(timeout=0.2) is False
+
+
+def test_wait_keeps_broadcast_during_first_read(simulator, monkeypatch):
+    expression = expressions.Expression('$mds.ITIME == 3000')
+    itime = expression.handles[0]
+    read = itime.read
+
+    def slow_read(*args, **kwargs):
+        # The value changes after the service answered but before the
+        # answer is used
+        value = read(*args, **kwargs)
+        simulator.set('mds', 'ITIME', '3000')
+        return value
+
+    monkeypatch.setattr(itime, 'read', slow_read)
+    assert expression.wait(timeout=1) is True
+
+
+def test_wait_rereads_at_heartbeat(simulator, monkeypatch):
+    monkeypatch.setattr(keywords, 'waitfor',
+                        functools.partial(keywords.waitfor, heartbeat=0.1))
+    expression = expressions.Expression('$mds.ITIME == 3000')
+    # Changed without a broadcast, so only a fresh read will see it
+    threading.Timer(0.2, simulator.values.__setitem__,
+                    args=(('mds', 'ITIME'), '3000')).start()
+    assert expression.wait(timeout=5) is True
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from instruments import images
+
+
+@pytest.fixture
+def unsigned(tmp_path):
+    '''A uint16 image, stored on disk as int16 with BZERO = 32768.'''
+    data = np.arange(20*30, dtype=np.uint16).reshape(20, 30) * 100
+    path = tmp_path / 'unsigned.fits'
+    fits.PrimaryHDU(data).writeto(path)
+    return path, data
+
+
+@pytest.fixture
+def scaled(tmp_path):
+    '''An int16 image with both BSCALE and BZERO and an extension.'''
+    raw = np.arange(10*12, dtype=np.int16).reshape(10, 12) - 60
+    hdu = fits.ImageHDU(raw)
+    hdu.header['BSCALE'] = 0.5
+    hdu.header['BZERO'] = 10.
+    path = tmp_path / 'scaled.fits'
+    fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(path)
+    return path, raw*0.5 + 10
+
+
+def test_bzero_on_disk(unsigned):
+    path, data = unsigned
+    with fits.open(path, do_not_scale_image_data=True) as hdul:
+        assert hdul[0].header['BZERO'] == 32768
+        assert hdul[0].data.dtype.kind == 'i'
+
+
+def test_read_image(unsigned, scaled):
+    path, data = unsigned
+    result = images.read_image(path)
+    assert result.dtype == np.float32
+    np.testing.assert_array_equal(result, data)
+    np.testing.assert_array_equal(images.read_image(path, dtype=np.uint16), data)
+    path, data = scaled
+    assert images.read_image(path) is None
+    np.testing.assert_allclose(images.read_image(path, ext=1), data)
+
+
+def test_read_section(unsigned, scaled):
+    path, data = unsigned
+    section = (slice(5, 8), slice(10, 25, 2))
+    np.testing.assert_array_equal(images.read_section(path, section), data[section])
+    path, data = scaled
+    np.testing.assert_allclose(images.read_section(path, section, ext=1),
+                               data[section])
+
+
+def test_read_rows(unsigned):
+    path, data = unsigned
+    rows = [19, 3, 4, 5, 0, 12, 13]
+    np.testing.assert_array_equal(images.read_rows(path, rows), data[rows])
+    assert images.read_rows(path, []).shape == (0, 30)
+
+
+def test_data_and_headers(unsigned, scaled):
+    path, data = unsigned
+    with images.open_image(path) as hdul:
+        assert images.shape(hdul[0]) == (20, 30)
+        np.testing.assert_array_equal(images.data(hdul[0]), data)
+    path, data = scaled
+    assert images.extensions(path) == [1]
+    assert images.header(path, ext=1)['BSCALE'] == 0.5
+    assert images.shape(images.header(path, ext=1)) == (10, 12)
+
+
+def test_unscaled_data_is_a_view(tmp_path):
+    data = np.ones((4, 5), dtype=np.float32)
+    path = tmp_path / 'float.fits'
+    fits.PrimaryHDU(data).writeto(path)
+    with images.open_image(path) as hdul:
+        assert images.data(hdul[0], dtype=None) is hdul[0].data
+        assert images.data(hdul[0]).dtype == np.float32
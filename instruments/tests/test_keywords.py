@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from instruments import keywords
+
+
+@pytest.fixture
+def mirror(simulator):
+    keywords.enable_mirror(ttl=60)
+    yield
+    keywords.disable_mirror()
+
+
+def test_registry_shares_handles(simulator):
+    first = keywords.cache(service='mds', keyword='ITIME')
+    assert keywords.cache(service='MDS', keyword='itime') is first
+    assert keywords.cache(service='mds')['ITIME'] is first
+    assert ('mds', 'ITIME') in keywords.registered()
+
+
+def test_mirror_serves_reads(simulator, mirror):
+    itime = keywords.cache(service='mds', keyword='ITIME')
+    assert itime.read() == '2000'
+    # Changed behind the registry's back, without a broadcast
+    simulator.values[('mds', 'ITIME')] = '3000'
+    assert itime.read() == '2000'
+    assert itime.read(bypass=True) == '3000'
+
+
+def test_mirror_follows_broadcasts(simulator, mirror):
+    itime = keywords.cache(service='mds', keyword='ITIME')
+    itime.read()
+    simulator.set('mds', 'ITIME', '4000')
+    assert itime.read() == '4000'
+
+
+def test_write_drops_mirror(simulator, mirror):
+    itime = keywords.cache(service='mds', keyword='ITIME')
+    itime.read()
+    itime.write(5000)
+    assert itime.updated is None
+    # The read back reports what the service holds, not what was asked for
+    simulator.values[('mds', 'ITIME')] = '4000'
+    assert itime.read() == '4000'
+
+
+def test_write_without_wait_drops_mirror(simulator, mirror):
+    itime = keywords.cache(service='mds', keyword='ITIME')
+    itime.read()
+    itime.write(6000, wait=False)
+    assert itime.updated is None
+    assert itime.read() == '6000'
+
+
+def test_snapshot(simulator):
+    bars = [f'B{bar:02d}POS' for bar in range(1, 93)]
+    snap = keywords.snapshot('mcsus', bars)
+    assert len(snap) == 92
+    assert snap['b01pos'] == '4.000'
+    positions = snap.asarray()
+    assert positions[1] == pytest.approx(270.4)
+
+
+def test_waitfor_wakes_on_change(simulator):
+    imagedone = keywords.cache(service='mds', keyword='IMAGEDONE')
+    simulator.set('mds', 'IMAGEDONE', '0')
+    threading.Timer(0.2, simulator.set, args=('mds', 'IMAGEDONE', '1')).start()
+    assert keywords.waitfor(lambda: imagedone.read() == '1', [imagedone],
+                            timeout=5, heartbeat=30) is True
+
+
+def test_waitfor_timeout(simulator):
+    imagedone = keywords.cache(service='mds', keyword='IMAGEDONE')
+    simulator.set('mds', 'IMAGEDONE', '0')
+    assert keywords.waitfor(lambda: imagedone.read() == '1', [imagedone],
+                            timeout=0.2) is False
@@ -0,0 +1,65 @@
+import numpy as np
+
+from instruments import keywords, recorder
+
+
+def read_bars():
+    return keywords.snapshot('mcsus', [f'B{bar:02d}POS' for bar in range(1, 93)])
+
+
+def set_itime():
+    keywords.cache(service='mds', keyword='ITIME').write(1500)
+
+
+def test_records_callers(simulator):
+    rec = recorder.start()
+    try:
+        read_bars()
+        set_itime()
+    finally:
+        recorder.stop()
+    records = rec.records()
+    reads = records[records['op'] == 'read']
+    assert len(reads) == 92
+    assert set(reads['caller']) == {'read_bars'}
+    writes = records[records['op'] == 'write']
+    assert list(writes['caller']) == ['set_itime']
+
+
+def test_ring_buffer(simulator):
+    rec = recorder.start(capacity=10)
+    try:
+        read_bars()
+    finally:
+        recorder.stop()
+    assert len(rec) == 10
+    assert len(rec.records()) == 10
+
+
+def test_save_load_summary(simulator, tmp_path):
+    rec = recorder.start()
+    try:
+        read_bars()
+        set_itime()
+    finally:
+        recorder.stop()
+    rec.save(tmp_path / 'calls.npz')
+    loaded = recorder.Recorder.load(tmp_path / 'calls.npz')
+    assert np.array_equal(loaded.records(), rec.records())
+    summary = recorder.summary(loaded.records())
+    assert summary[summary['keyword'] == 'ITIME']['count'][0] == 1
+
+
+def test_replay(simulator):
+    rec = recorder.start()
+    try:
+        set_itime()
+        read_bars()
+    finally:
+        recorder.stop()
+    backend = keywords.backend()
+    replayed = recorder.replay(rec.records(), speedup=None)
+    assert keywords.backend() is backend
+    records = replayed.records()
+    assert len(records) == len(rec.records())
+    assert list(records['op'][:1]) == ['write']
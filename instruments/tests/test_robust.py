@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from astropy import stats
+
+from instruments import robust
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(42)
+    values = rng.normal(100, 5, size=(64, 128))
+    values[rng.integers(0, 64, 40), rng.integers(0, 128, 40)] = 5000
+    values[3, 7] = np.nan
+    return values
+
+
+@pytest.mark.parametrize('values', [[3, 1, 2], [4, 1, 3, 2], [7], []])
+def test_median(values):
+    result = robust.median(np.array(values, dtype=float))
+    if len(values) == 0:
+        assert np.isnan(result)
+    else:
+        assert result == np.median(values)
+
+
+def test_sigma_clip_rejects_outliers(data):
+    values = robust.sigma_clip(data)
+    assert values.dtype == np.float32
+    assert np.all(np.isfinite(values))
+    assert values.max() < 200
+
+
+@pytest.mark.filterwarnings('ignore::astropy.utils.exceptions.AstropyUserWarning')
+def test_matches_astropy(data):
+    expected = stats.sigma_clipped_stats(data, sigma=3, maxiters=5,
+                                         cenfunc='median', stdfunc='std')
+    result = robust.sigma_clipped_stats(data, sigma=3, maxiters=5)
+    assert result == pytest.approx(expected, rel=1e-5)
+
+
+@pytest.mark.filterwarnings('ignore::astropy.utils.exceptions.AstropyUserWarning')
+def test_asymmetric_matches_astropy(data):
+    expected = stats.sigma_clipped_stats(data, sigma_lower=10, sigma_upper=2,
+                                         maxiters=5, cenfunc='median',
+                                         stdfunc='std')
+    result = robust.sigma_clipped_stats(data, sigma_lower=10, sigma_upper=2)
+    assert result == pytest.approx(expected, rel=1e-5)
+
+
+def test_sampled(data):
+    mean, median, std = robust.sigma_clipped_stats(data, sample=3)
+    assert mean == pytest.approx(100, abs=0.5)
+    assert std == pytest.approx(5, rel=0.1)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_empty():
+    assert np.all(np.isnan(robust.sigma_clipped_stats(np.full(10, np.nan))))
+
+
+def test_channel_stats(data):
+    data[:, 32:64] += 50
+    table = robust.channel_stats(data, nchannels=4, axis=1)
+    assert list(table['channel']) == [0, 1, 2, 3]
+    assert table['median'] == pytest.approx([100, 150, 100, 100], abs=1.5)
+    expected = robust.sigma_clipped_stats(data[:, 32:64])
+    assert tuple(table[1])[1:] == pytest.approx(expected)
@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from astropy.io import fits
+
+from instruments import keywords
+
+
+def test_default_state(simulator):
+    assert keywords.cache(service='dcs', keyword='INSTRUME').read() == 'MOSFIRE'
+    assert keywords.cache(service='mcsus', keyword='MASKNAME').read() == 'OPEN'
+
+
+def test_write_starts_model(simulator):
+    targname = keywords.cache(service='mmf2s', keyword='TARGNAME')
+    targname.write('H')
+    assert keywords.cache(service='mmf2s', keyword='STATUS').read() == 'Moving'
+    assert simulator.cache('mmf2s', 'POSNAME').waitFor("== 'H'", timeout=5)
+    assert keywords.cache(service='mmf2s', keyword='STATUS').read() == 'OK'
+
+
+def test_image_exists_when_done(simulator):
+    keywords.cache(service='mds', keyword='ITIME').write(0)
+    for i in range(3):
+        keywords.cache(service='mds', keyword='GO').write(1)
+        assert simulator.cache('mds', 'IMAGEDONE').waitFor('== 1', timeout=10)
+        lastfile = Path(keywords.cache(service='mds', keyword='LASTFILE').read())
+        with fits.open(lastfile) as hdul:
+            assert hdul[0].data.shape == (2048, 2048)